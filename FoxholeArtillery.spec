@@ -5,7 +5,8 @@ a = Analysis(
     ['app.py'],
     pathex=[],
     binaries=[],
-    datas=[],
+    # shipped next to the code; a weapons.json beside the executable overrides it
+    datas=[('weapons.json', '.')],
     hiddenimports=[],
     hookspath=[],
     hooksconfig={},
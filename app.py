@@ -1,59 +1,182 @@
+import sys
+import time
+
+_START = time.perf_counter()
+
+if __name__ == '__main__' and len(sys.argv) > 1 and not sys.argv[1].startswith('-'):
+    # headless subcommands (e.g. `solve`) never import tkinter or matplotlib
+    from cli import main
+    sys.exit(main(sys.argv[1:]))
+
+import argparse
+import cProfile
 import tkinter as tk
 from tkinter import ttk
-import matplotlib.pyplot as plt
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
 import numpy as np
-import matplotlib.patches as patches
+from profiling import PhaseTimer, FrameProfiler
+from solver import polar_to_xy, xy_to_polar, spread_radius, solve, solve_pairs
+from scheduler import RedrawScheduler
+from impacts import ImpactStore, ImpactStatistics
+from teams import TeamTable
+from hitprob import HitProbability, shells_to_kill
+from reach_grid import ReachGrid
+from missions import TargetQueue, Assignment
+from spatial import SpatialIndex
+from session import SessionRecorder, round_solutions
+from renderers import RENDERERS
+from catalog import load_catalog
+from netproto import INPUTS, PORT, merge
+from worker import Worker
+from viewport import Viewport, circles_visible
 
 class FoxholeArtilleryApp:
-    def __init__(self, root):
+    # how often queued network messages are applied
+    NET_POLL_MS = 15
+
+    def __init__(self, root, max_fps=60, startup=None, profile_startup=False,
+                 impact_history=None, impact_labels=20, mpi_window=None, mpi_decay=None,
+                 initial_teams=4, canvas_class=None, recorder=None,
+                 map_tiles=None, map_spotter=(0.0, 0.0), renderer='mpl',
+                 net_server=None, net_client=None, net_team=None, weapons=None,
+                 workers=2):
         self.root = root
         self.root.title("419 - Artillery Control Center")
         self.root.geometry("1400x900")
 
-        style = ttk.Style()
-        style.theme_use('clam')
-        style.configure('Control.TFrame', background='#e0e0e0')
-        style.configure('Control.TLabel', background='#e0e0e0', foreground='black')
-        style.configure('TEntry', fieldbackground='white', foreground='black')
-        style.configure('TButton', background='#5c5f61', foreground='white')
-        style.configure('Control.TLabelframe', background='#e0e0e0', foreground='black')
-        style.configure('Control.TLabelframe.Label', background='#e0e0e0', foreground='black')
+        # startup phases are always timed; --profile-startup prints them
+        self.startup = startup or PhaseTimer()
+        self.profile_startup = profile_startup
+        self.first_frame = True
+        # map backend (renderers.py); its canvas class can be overridden,
+        # e.g. by the headless harness
+        self.renderer_class = RENDERERS[renderer]
+        self.canvas_class = canvas_class
+
+        with self.startup.phase('style setup'):
+            self.setup_style()
+
+        # name → weapon (catalog.py); weapons.json or the built-in table by default
+        if weapons is None:
+            with self.startup.phase('weapon catalog'):
+                weapons = load_catalog()
+        self.artillery_ranges = weapons
 
         self.target_distance = tk.DoubleVar(value=0.0)
         self.target_azimuth = tk.DoubleVar(value=0.0)
         self.spotter_solution = tk.StringVar(value="-- / --")
         self.recommendation_text = tk.StringVar(value="")
-        self.artillery_type = tk.StringVar(value="Mortar")
-        self.temp_line = None
-        self.temp_text = None
+        # the catalog's first entry: an edited weapons.json may have no Mortar
+        self.artillery_type = tk.StringVar(value=next(iter(self.artillery_ranges)))
+        self.target_radius = tk.DoubleVar(value=5.0)
+        self.hits_to_kill = tk.DoubleVar(value=1)
+        self.show_coverage = tk.BooleanVar(value=False)
 
         self.dx_corr = 0.0
         self.dy_corr = 0.0
         self.recommendation_text.set("No impacts yet")
 
-        self.show_team_ranges = {}
-        self.artillery_ranges = {
-            "Mortar": ((45, 80), (5.5, 12)),
-            "Gunship": ((75, 100), (2.5, 14.5)),
-            "Devitt-Caine": ((45, 80), (2.5, 9.45)),
-            "Peltast": ((45, 80), (2.5, 9.45)),
-            "Skycaller": ((275, 350), (37.5, 60)),
-            "Rocket Battery": ((350, 400), (41.5, 57.7)),
-            "Wasp Nest": ((375, 450), (37.5, 60)),
-            "Hades' Net": ((300, 575), (35, 52)),
-            "O'Brien Squire": ((375, 500), (39, 51)),
-            "r-17 Skirmisher": ((375, 500), (37, 51)),
-        }
-
-        self.team_entries = {}
-        self.team_solution_labels = {}
-        self.team_colors = ['cyan', 'magenta', 'yellow', 'lime']
-        self.impact_zones = []
+        # teams: columnar arrays in self.teams, one row of widgets per team
+        self.teams = TeamTable()
+        self.team_rows = []
+        self.team_serial = 0
+        self.initial_teams = initial_teams
+        # fire mission queue: targets beyond the spotter's, each assigned a team
+        self.targets = TargetQueue()
+        self.target_rows = []
+        self.target_serial = 0
+        self.assignment = Assignment()
+        self.mission_team = ()
+        self.assignment_key = None
+        self.team_colors = ['cyan', 'magenta', 'yellow', 'lime', 'orange', 'deepskyblue',
+                            'violet', 'gold', 'springgreen', 'salmon', 'white', 'khaki']
+        # impacts: NumPy-backed, optionally a ring of the last impact_history shots
+        self.impacts = ImpactStore(history=impact_history)
+        self.impact_labels = impact_labels
+        # streaming statistics: raw mean point of impact for the map, and each
+        # shot's offset from where it was aimed, which drives the correction
+        self.mpi = ImpactStatistics(window=mpi_window, decay=mpi_decay)
+        self.bias = ImpactStatistics(window=mpi_window, decay=mpi_decay)
+        self.last_shot_corr = (0.0, 0.0)
+        # Monte Carlo P(hit) per team; built on first use (it pre-draws its samples)
+        self.hitprob = None
+        # team reach raster for the coverage overlay, cached per layout; the
+        # last finished (grid, extent, teams) is what the map shows
+        self.coverage = ReachGrid()
+        self.coverage_key = None
+        self.coverage_shown = None
+        # every map object, for hover snapping; synced lazily from the stores
+        self.index = SpatialIndex()
+        self.index.insert(('spotter', 'Spotter'), 0.0, 0.0)
+        self.indexed = {'impact': (None, 0, 1), 'team': None, 'queued': None}
+        self.hover_snap_px = 12
+        self.hover_teams = 8
         self.max_range = 100
+        # follows spotter, target and teams until the user zooms or pans
+        self.view = Viewport(default_half=self.max_range * 1.1)
+        self.pan_start = None
+        # optional tiled map background (tiles.TilePyramid) and the spotter's
+        # position on it, in map metres
+        self.map_tiles = map_tiles
+        self.map_spotter = tuple(map_spotter)
+
+        # per-phase frame timings; F3 toggles the on-map HUD
+        self.profiler = FrameProfiler()
+        # hit probability, coverage, assignments and (mpl) the Agg raster run
+        # on worker threads; workers=0 keeps them on the Tk thread
+        self.worker = Worker(self.root, workers, self.profiler)
+
+        # every input only invalidates; the scheduler renders once per frame
+        self.redraw = RedrawScheduler(self.root, self.update_plot, max_fps=max_fps)
+
+        # optional session log; attached once the initial rows exist
+        self.recorder = None
+        self.record_muted = False
+        self.solution = None
+
+        # LAN sync (netsync.py): host a session, or follow one. A client shows
+        # the host's impacts and correction and forwards its own inputs
+        self.net_server = net_server
+        self.net_client = net_client
+        self.net_team = net_team
+        self.net_state = {}
+        self.net_impacts = (None, 0)
+        self.net_peers = 0
+        self.net_link = ''
+        self.net_status = tk.StringVar(value='')
 
         self.setup_gui()
-        self.root.after(100, self.update_plot)
+        self.root.bind('<F3>', self.toggle_hud)
+        self.root.after(100, self.request_redraw)
+        if net_server or net_client:
+            self.net_status.set(f"Serving on port {net_server.port}" if net_server
+                                else f"Connecting to {net_client.host}:{net_client.port}…")
+            self.root.after(self.NET_POLL_MS, self.poll_network)
+        if recorder:
+            recorder.start(self)
+            self.recorder = recorder
+
+    def setup_style(self):
+        style = ttk.Style()
+        style.theme_use('clam')
+        style.configure('Control.TFrame', background='#e0e0e0')
+        style.configure('Control.TLabel', background='#e0e0e0', foreground='black')
+        style.configure('TEntry', fieldbackground='white', foreground='black')
+        style.configure('TButton', background='#5c5f61', foreground='white')
+        style.configure('Control.TLabelframe', background='#e0e0e0', foreground='black')
+        style.configure('Control.TLabelframe.Label', background='#e0e0e0', foreground='black')
+
+    def record(self, event, **fields):
+        # log a user input (not its knock-on effects) when recording, and
+        # forward it to the session host when following one
+        if self.record_muted:
+            return
+        if self.recorder:
+            self.recorder.write(event, **fields)
+        if self.net_client and event in INPUTS:
+            self.net_client.send(event, **fields)
+
+    def request_redraw(self, *args):
+        self.redraw.invalidate()
 
     def safe_get_double(self, var):
         try:
@@ -71,13 +194,21 @@ class FoxholeArtilleryApp:
         self.notebook.add(tab1, text='Fire Control')
         main = ttk.Frame(tab1, padding=10)
         main.pack(fill='both', expand=True)
-        self.setup_control_panel(main)
+        with self.startup.phase('control panel'):
+            self.setup_control_panel(main)
         self.setup_plot_panel(main)
 
-        # ── Tab 2: Artillery Info Browser ───────────────────────────────
-        tab2 = ttk.Frame(self.notebook)
-        self.notebook.add(tab2, text='Artillery Info')
-        self.setup_info_tab(tab2)
+        # ── Tab 2: Artillery Info Browser, built the first time it is shown ──
+        self.info_tab = ttk.Frame(self.notebook)
+        self.info_tab_built = False
+        self.notebook.add(self.info_tab, text='Artillery Info')
+        self.notebook.bind('<<NotebookTabChanged>>', self.on_tab_changed)
+
+    def on_tab_changed(self, event=None):
+        if self.info_tab_built or self.notebook.select() != str(self.info_tab):
+            return
+        self.info_tab_built = True
+        self.setup_info_tab(self.info_tab)
 
 
     def setup_info_tab(self, parent):
@@ -148,7 +279,7 @@ class FoxholeArtilleryApp:
                 )
 
             # 2d) endpoint ticks & labels
-            for d, lbl in ((0,'0m'), (min_d,f'{min_d}m'), (max_d,f'{max_d}m')):
+            for d, lbl in ((0,'0m'), (min_d,f'{min_d:g}m'), (max_d,f'{max_d:g}m')):
                 x = to_px(d)
                 diag.create_line(x, y-8, x, y+8, width=2, fill='black')
                 diag.create_text(
@@ -173,7 +304,7 @@ class FoxholeArtilleryApp:
 
             # 3) numeric info below diagram
             info = (
-                f"Range: {min_d}–{max_d} m    "
+                f"Range: {min_d:g}–{max_d:g} m    "
                 f"Spread: {min_r:.1f}–{max_r:.1f} m"
             )
             ttk.Label(
@@ -192,9 +323,11 @@ class FoxholeArtilleryApp:
         self.setup_target_section(ctrl, 0)
         # 2) Artillery teams
         self.setup_artillery_section(ctrl, 4)
-        # 3) Reset buttons
+        # 3) Fire mission queue
+        self.setup_mission_section(ctrl, 6)
+        # 4) Reset buttons
         self.setup_controls_section(ctrl, 8)
-        # 4) User instructions
+        # 5) User instructions
         self.setup_instructions_section(ctrl, 10)
 
     def setup_instructions_section(self, parent, row):
@@ -210,13 +343,12 @@ class FoxholeArtilleryApp:
             "• For each firing team, input its Distance/Azimuth from the spotter.\n"
             "• Click on the map to record each shell’s impact (yellow diamond).\n"
             "• The green ring = expected “on-target” zone; orange ring = max acceptable spread.\n"
-            "  – If a shot lands outside orange, the tool suggests a correction (Δx, Δy).\n"
-            "  – If the last two shots both land inside green, it will say “Hold fire.”\n"
             "\n"
-            "Manual Override (Why & How):\n"
-            "• Even if you see “Hold fire,” spread may be acting in your favor of the wind and your center shot could be off.\n"
-            "  – If your last 2-3 shots are baised to one side of the target in the orange zone, consider adjusting in the opposite direction.\n"
-            "  – Ideally, your shots should 'surround' the target with a simple distribution"
+            "Corrections:\n"
+            "• Every impact updates the mean point of impact (MPI, white +) relative to where the shot was aimed.\n"
+            "  – All solutions are corrected by the opposite of that bias, so one lucky or unlucky shell doesn’t swing the aim.\n"
+            "  – The dashed ellipse holds ~50% of shells; CEP is the radius containing half of them.\n"
+            "  – “Hold fire” means the correction moved less than the green ring since the last shot."
         )
         ttk.Label(
             f,
@@ -257,22 +389,42 @@ class FoxholeArtilleryApp:
             state='readonly'
         ).grid(row=2, column=1, sticky='we', padx=(10,20))
 
-        # 4) Effective‐range + inaccuracy display
+        # 4) Target size and hits needed, for the per-team P(hit)
+        ttk.Label(f, text='Target radius (m):', style='Control.TLabel')\
+            .grid(row=3, column=0, sticky='w')
+        ttk.Entry(f, textvariable=self.target_radius, width=15)\
+            .grid(row=3, column=1, sticky='we', padx=(10,20))
+        ttk.Label(f, text='Hits to kill:', style='Control.TLabel')\
+            .grid(row=4, column=0, sticky='w')
+        ttk.Entry(f, textvariable=self.hits_to_kill, width=15)\
+            .grid(row=4, column=1, sticky='we', padx=(10,20))
+
+        # 5) Effective‐range + inaccuracy display
         self.artillery_info_label = ttk.Label(
             f,
             text='',  # filled in below
             style='Control.TLabel'
         )
         self.artillery_info_label.grid(
-            row=3, column=0, columnspan=2,
+            row=5, column=0, columnspan=2,
             sticky='w', pady=(10,0)
         )
 
+        # 6) Computed correction / hold-fire advice
+        ttk.Label(
+            f,
+            textvariable=self.recommendation_text,
+            style='Control.TLabel',
+            wraplength=440
+        ).grid(row=6, column=0, columnspan=2, sticky='w', pady=(5,0))
+
         f.columnconfigure(1, weight=1)
 
         # redraw plot when distance or azimuth changes
-        self.target_distance.trace_add('write', self.update_plot)
-        self.target_azimuth.trace_add('write', self.update_plot)
+        self.target_distance.trace_add('write', self.on_target_edit)
+        self.target_azimuth.trace_add('write', self.on_target_edit)
+        self.target_radius.trace_add('write', self.on_hit_params_edit)
+        self.hits_to_kill.trace_add('write', self.on_hit_params_edit)
 
         # on type change, update info *and* clear old impacts
         self.artillery_type.trace_add('write', self.on_artillery_type_change)
@@ -281,12 +433,27 @@ class FoxholeArtilleryApp:
         self.update_artillery_info()
 
 
+    def on_target_edit(self, *args):
+        self.record('target', d=self.safe_get_double(self.target_distance),
+                    a=self.safe_get_double(self.target_azimuth))
+        self.request_redraw()
+
+    def on_hit_params_edit(self, *args):
+        self.record('hit_params', r=self.safe_get_double(self.target_radius),
+                    k=self.safe_get_double(self.hits_to_kill))
+        self.request_redraw()
+
     def on_artillery_type_change(self, *args):
+        self.record('weapon', name=self.artillery_type.get())
         # 1) refresh the range/spread label
         self.update_artillery_info()
         # 2) clear any old impacts & corrections
-        self.reset_impacts()
-        # (reset_impacts() already calls update_plot for us)
+        self.record_muted, muted = True, self.record_muted
+        try:
+            self.reset_impacts()
+        finally:
+            self.record_muted = muted
+        # (reset_impacts() already requests a redraw for us)
 
 
     def update_artillery_info(self, *args):
@@ -295,40 +462,199 @@ class FoxholeArtilleryApp:
 
         # Format the ranges neatly
         info = (
-            f"Effective Range: {min_d}–{max_d} m    "
+            f"Effective Range: {min_d:g}–{max_d:g} m    "
             f"Spread Radius: {min_r:.1f}–{max_r:.1f} m"
         )
         self.artillery_info_label.config(text=info)
 
+    def scrollable_table(self, parent, height):
+        # frame for grid rows inside a fixed-height canvas with a scrollbar,
+        # at row 0 of parent; the wheel scrolls it on every platform
+        canvas = tk.Canvas(parent, borderwidth=0, highlightthickness=0, height=height,
+                           background='#e0e0e0')
+        vsb = ttk.Scrollbar(parent, orient='vertical', command=canvas.yview)
+        canvas.configure(yscrollcommand=vsb.set)
+        canvas.grid(row=0, column=0, sticky='nsew')
+        vsb.grid(row=0, column=1, sticky='ns')
+        parent.columnconfigure(0, weight=1)
+        table = ttk.Frame(canvas, style='Control.TFrame')
+        canvas.create_window((0,0), window=table, anchor='nw')
+        table.bind('<Configure>', lambda e: canvas.configure(scrollregion=canvas.bbox('all')))
+        for w in (canvas, table):
+            w.bind('<MouseWheel>', lambda e: canvas.yview_scroll(-1 if e.delta > 0 else 1, 'units'))
+            # X11 reports the wheel as buttons 4 and 5
+            w.bind('<Button-4>', lambda e: canvas.yview_scroll(-1, 'units'))
+            w.bind('<Button-5>', lambda e: canvas.yview_scroll(1, 'units'))
+        return table
+
     def setup_artillery_section(self, parent, row):
         f = ttk.LabelFrame(parent, text='Artillery Teams', padding=10, style='Control.TLabelframe')
         f.grid(row=row, column=0, columnspan=4, sticky='we', pady=(0,10))
-        headers = ['Team', 'Distance (m)', 'Azimuth (°)', 'Firing Solution', 'Range']
+
+        # scrollable table: any number of team rows below the header/spotter rows
+        table = self.team_table_frame = self.scrollable_table(f, height=190)
+
+        headers = ['Team', 'Distance (m)', 'Azimuth (°)', 'Firing Solution', 'P(hit)', 'Range', '']
+        for c, h in enumerate(headers):
+            ttk.Label(table, text=h, font=('Arial',10,'bold'), style='Control.TLabel').grid(row=0, column=c, padx=5)
+        ttk.Label(table, text='Spotter', style='Control.TLabel').grid(row=1, column=0, sticky='w', padx=5)
+        ttk.Entry(table, textvariable=self.target_distance, width=10, state='disabled').grid(row=1, column=1)
+        ttk.Entry(table, textvariable=self.target_azimuth, width=10, state='disabled').grid(row=1, column=2)
+        ttk.Label(table, textvariable=self.spotter_solution, style='Control.TLabel').grid(row=1, column=3, padx=5)
+        self.team_grid_row = 2
+
+        ttk.Button(f, text='+ Add Team', style='Control.TButton', command=self.add_team)\
+            .grid(row=1, column=0, columnspan=2, sticky='w', pady=(5,0))
+        for _ in range(self.initial_teams):
+            self.add_team()
+
+    def add_team(self):
+        self.record('add_team')
+        self.team_serial += 1
+        name = f'Team {self.team_serial}'
+        color = self.team_colors[(self.team_serial - 1) % len(self.team_colors)]
+        table, i = self.team_table_frame, self.team_grid_row
+        self.team_grid_row += 1
+
+        lbl = ttk.Label(table, text=name, style='Control.TLabel'); lbl.grid(row=i, column=0, sticky='w', padx=5)
+        dv, av = tk.DoubleVar(), tk.DoubleVar()
+        de = ttk.Entry(table, textvariable=dv, width=10); de.grid(row=i, column=1)
+        ae = ttk.Entry(table, textvariable=av, width=10); ae.grid(row=i, column=2)
+        sol = ttk.Label(table, text='-- / --', style='Control.TLabel'); sol.grid(row=i, column=3, padx=5)
+        hit = ttk.Label(table, text='--', style='Control.TLabel'); hit.grid(row=i, column=4, padx=5)
+        show_var = tk.BooleanVar(value=True)
+        chk = tk.Checkbutton(table, variable=show_var,
+                             onvalue=True, offvalue=False,
+                             bg='#e0e0e0', activebackground='#e0e0e0', relief='flat')
+        chk.grid(row=i, column=5)
+
+        row = {'name': name, 'distance': dv, 'azimuth': av, 'show': show_var,
+               'solution': sol, 'text': '-- / --', 'hit': hit, 'hit_text': '--'}
+        rm = ttk.Button(table, text='✕', width=2, command=lambda: self.remove_team(row))
+        rm.grid(row=i, column=6, padx=(5,0))
+        row['widgets'] = (lbl, de, ae, sol, hit, chk, rm)
+
+        self.teams.add(name, color)
+        self.team_rows.append(row)
+        edit = lambda *args: self.on_team_edit(row)
+        dv.trace_add('write', edit)
+        av.trace_add('write', edit)
+        chk.configure(command=edit)
+        self.request_redraw()
+
+    def remove_team(self, row):
+        i = self.team_rows.index(row)
+        self.record('remove_team', i=i)
+        for w in row['widgets']:
+            w.destroy()
+        del self.team_rows[i]
+        self.teams.remove(i)
+        self.request_redraw()
+
+    def on_team_edit(self, row):
+        # push the row's entries into the columnar table, then redraw once per frame
+        i = self.team_rows.index(row)
+        d, a = self.safe_get_double(row['distance']), self.safe_get_double(row['azimuth'])
+        show = bool(row['show'].get())
+        self.record('team', i=i, d=d, a=a, show=show)
+        self.teams.set(i, distance=d, azimuth=a, show_range=show)
+        self.request_redraw()
+
+    def setup_mission_section(self, parent, row):
+        f = ttk.LabelFrame(parent, text='Fire Mission Queue', padding=10, style='Control.TLabelframe')
+        f.grid(row=row, column=0, columnspan=4, sticky='we', pady=(0,10))
+
+        # scrollable like the team table; each target is assigned a team
+        table = self.target_table_frame = self.scrollable_table(f, height=120)
+
+        headers = ['Target', 'Distance (m)', 'Azimuth (°)', 'Assigned Team & Solution', '']
         for c, h in enumerate(headers):
-            ttk.Label(f, text=h, font=('Arial',10,'bold'), style='Control.TLabel').grid(row=0, column=c, padx=5)
-        ttk.Label(f, text='Spotter', style='Control.TLabel').grid(row=1, column=0, sticky='w', padx=5)
-        ttk.Entry(f, textvariable=self.target_distance, width=10, state='disabled').grid(row=1, column=1)
-        ttk.Entry(f, textvariable=self.target_azimuth, width=10, state='disabled').grid(row=1, column=2)
-        ttk.Label(f, textvariable=self.spotter_solution, style='Control.TLabel').grid(row=1, column=3, padx=5)
-        teams = [f'Team {i+1}' for i in range(4)]
-        for i, name in enumerate(teams, start=2):
-            lbl = ttk.Label(f, text=name, style='Control.TLabel'); lbl.grid(row=i, column=0, sticky='w', padx=5)
-            dv, av = tk.DoubleVar(), tk.DoubleVar()
-            ttk.Entry(f, textvariable=dv, width=10).grid(row=i, column=1)
-            ttk.Entry(f, textvariable=av, width=10).grid(row=i, column=2)
-            sol = ttk.Label(f, text='-- / --', style='Control.TLabel'); sol.grid(row=i, column=3, padx=5)
-
-            show_var = tk.BooleanVar(value=True)
-            chk = tk.Checkbutton(f, variable=show_var, command=self.update_plot,
-                                 onvalue=True, offvalue=False,
-                                 bg='#e0e0e0', activebackground='#e0e0e0', relief='flat')
-            chk.grid(row=i, column=4)
-            self.show_team_ranges[name] = show_var
-
-            self.team_entries[name] = {'distance': dv, 'azimuth': av, 'label': lbl, 'firing_solution': {'distance':0.0,'azimuth':0.0}}
-            self.team_solution_labels[name] = sol
-            dv.trace_add('write', self.update_plot)
-            av.trace_add('write', self.update_plot)
+            ttk.Label(table, text=h, font=('Arial',10,'bold'), style='Control.TLabel').grid(row=0, column=c, padx=5)
+        self.target_grid_row = 1
+
+        ttk.Button(f, text='+ Queue Current Target', style='Control.TButton',
+                   command=self.queue_current_target)\
+            .grid(row=1, column=0, columnspan=2, sticky='w', pady=(5,0))
+
+    def queue_current_target(self):
+        self.add_queue_target(self.safe_get_double(self.target_distance),
+                              self.safe_get_double(self.target_azimuth))
+
+    def add_queue_target(self, distance=0.0, azimuth=0.0):
+        self.record('add_queue', d=distance, a=azimuth)
+        self.target_serial += 1
+        name = f'T{self.target_serial}'
+        table, i = self.target_table_frame, self.target_grid_row
+        self.target_grid_row += 1
+
+        lbl = ttk.Label(table, text=name, style='Control.TLabel'); lbl.grid(row=i, column=0, sticky='w', padx=5)
+        dv, av = tk.DoubleVar(value=distance), tk.DoubleVar(value=azimuth)
+        de = ttk.Entry(table, textvariable=dv, width=10); de.grid(row=i, column=1)
+        ae = ttk.Entry(table, textvariable=av, width=10); ae.grid(row=i, column=2)
+        assigned = ttk.Label(table, text='--', style='Control.TLabel'); assigned.grid(row=i, column=3, padx=5, sticky='w')
+
+        row = {'name': name, 'distance': dv, 'azimuth': av, 'assigned': assigned, 'text': '--'}
+        rm = ttk.Button(table, text='✕', width=2, command=lambda: self.remove_queue_target(row))
+        rm.grid(row=i, column=4, padx=(5,0))
+        row['widgets'] = (lbl, de, ae, assigned, rm)
+
+        self.targets.add(name, distance, azimuth)
+        self.target_rows.append(row)
+        edit = lambda *args: self.on_queue_edit(row)
+        dv.trace_add('write', edit)
+        av.trace_add('write', edit)
+        self.request_redraw()
+
+    def remove_queue_target(self, row):
+        i = self.target_rows.index(row)
+        self.record('remove_queue', i=i)
+        for w in row['widgets']:
+            w.destroy()
+        del self.target_rows[i]
+        self.targets.remove(i)
+        self.request_redraw()
+
+    def on_queue_edit(self, row):
+        i = self.target_rows.index(row)
+        d, a = self.safe_get_double(row['distance']), self.safe_get_double(row['azimuth'])
+        self.record('queue', i=i, d=d, a=a)
+        self.targets.set(i, distance=d, azimuth=a)
+        self.request_redraw()
+
+    def update_assignments(self, team_xy, active, weapon):
+        # optimal team per queued target, re-solved incrementally by Assignment
+        # in the background, when its inputs change; the map keeps the last
+        # result meanwhile
+        versions = (self.teams.version, self.targets.version)
+        if (versions, weapon) == self.assignment_key:
+            return
+        self.assignment_key = (versions, weapon)
+        self.worker.submit('assign', self.solve_assignments, team_xy, active, self.targets.xy(),
+                           self.targets.active(), weapon, list(self.teams.names),
+                           done=lambda result: self.show_assignments(result, versions),
+                           phase='assign')
+
+    def solve_assignments(self, team_xy, active, target_xy, target_on, weapon, names):
+        # 'assign' job: self.assignment is only used here
+        team, _ = self.assignment.update(team_xy, active, target_xy, target_on, weapon)
+        assigned = team >= 0
+        sol = solve_pairs(team_xy[team[assigned]], target_xy[assigned], weapon)
+        texts = iter(f"{names[t]}: {d:.1f}m / {a:.1f}°" for t, d, a in
+                     zip(team[assigned].tolist(), sol.distance.tolist(), sol.azimuth.tolist()))
+        return team, [next(texts) if ok else ('no team in range' if entered else '--')
+                      for ok, entered in zip(assigned, target_on)]
+
+    def show_assignments(self, result, versions):
+        if versions != (self.teams.version, self.targets.version):
+            return  # rows changed since; a newer job follows
+        team, texts = result
+        self.mission_team = tuple(team.tolist())
+        for row, text in zip(self.target_rows, texts):
+            if text != row['text']:
+                row['text'] = text
+                row['assigned'].config(text=text)
+        if self.worker.threads:
+            self.request_redraw()
 
     def setup_controls_section(self, parent, row):
         # Separator above
@@ -363,28 +689,51 @@ class FoxholeArtilleryApp:
         )
         btn_imp.grid(row=0, column=2, padx=10, pady=5, sticky='ew')
 
+        # Fit view: back to following spotter, target and teams
+        ttk.Button(
+            f,
+            text='Fit View',
+            style='Control.TButton',
+            command=self.fit_view
+        ).grid(row=1, column=1, columnspan=2, padx=10, pady=(0,5), sticky='ew')
+
+        # Coverage overlay: how many teams reach each point of the view
+        ttk.Checkbutton(
+            f,
+            text='Show team coverage',
+            variable=self.show_coverage,
+            command=self.on_coverage_toggle
+        ).grid(row=2, column=1, columnspan=2, padx=10, pady=(0,5))
+
     def setup_plot_panel(self, parent):
         pf = ttk.Frame(parent, padding=5)
         pf.grid(row=0, column=1, sticky='nsew')
         pf.columnconfigure(0, weight=1)
         pf.rowconfigure(0, weight=1)
-        self.fig, self.ax = plt.subplots(figsize=(8,8))
-        self.fig.patch.set_facecolor('#2b2b2b')
-        self.ax.set_facecolor('#2b2b2b')
-        self.ax.tick_params(colors='white')
-        for spine in self.ax.spines.values(): spine.set_color('white')
-        self.ax.title.set_color('white')
-        self.ax.xaxis.label.set_color('white')
-        self.ax.yaxis.label.set_color('white')
-        self.ax.grid(color='gray', linestyle='--')
-        self.canvas = FigureCanvasTkAgg(self.fig, master=pf)
-        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
-        self.canvas.mpl_connect('button_press_event', self.on_click)
-        self.canvas.mpl_connect('motion_notify_event', self.on_mouse_move)
+        # per-team readout under the map: Tk draws label text far cheaper
+        # than Agg rasterizes it on every motion event
+        self.hover_readout = tk.StringVar(value='')
+        ttk.Label(pf, textvariable=self.hover_readout, font=('Courier', 9))\
+            .pack(side='bottom', fill='x')
+        if self.net_server or self.net_client:
+            ttk.Label(pf, textvariable=self.net_status, font=('Courier', 11, 'bold'))\
+                .pack(side='bottom', fill='x')
+        self.renderer = self.renderer_class(self, pf, self.canvas_class)
+        self.scene = self.renderer.scene
+        self.pending_motion = None
+
+    def hide_hover(self, *args):
+        if not self.renderer.hover_visible:
+            return
+        self.record('leave')
+        self.hover_readout.set('')
+        self.renderer.clear_hover()
 
     def reset_impacts(self):
-        # Clear recorded impacts
-        self.impact_zones.clear()
+        self.record('reset_impacts')
+        # Clear recorded impacts and their statistics
+        self.impacts.clear()
+        self.reset_impact_stats()
 
         # Clear any persistent correction so solutions revert to original
         self.dx_corr = 0.0
@@ -394,174 +743,645 @@ class FoxholeArtilleryApp:
         self.recommendation_text.set("No impacts yet")
 
         # Redraw everything
-        self.update_plot()
+        self.request_redraw()
 
-    def total_reset(self):
-        # Reset target inputs
-        self.target_distance.set(0.0)
-        self.target_azimuth.set(0.0)
+    def reset_impact_stats(self):
+        self.mpi.reset()
+        self.bias.reset()
+        self.last_shot_corr = (0.0, 0.0)
 
-        # Reset team inputs and their last solutions
-        for entry in self.team_entries.values():
-            entry['distance'].set(0.0)
-            entry['azimuth'].set(0.0)
-            entry['firing_solution']['distance'] = 0.0
-            entry['firing_solution']['azimuth'] = 0.0
+    def total_reset(self):
+        self.record('total_reset')
+        # Reset target and team inputs (rows stay, their traces update the
+        # team table); the edits are part of the reset, not logged separately
+        self.record_muted, muted = True, self.record_muted
+        try:
+            self.target_distance.set(0.0)
+            self.target_azimuth.set(0.0)
+            for row in self.team_rows:
+                row['distance'].set(0.0)
+                row['azimuth'].set(0.0)
+        finally:
+            self.record_muted = muted
 
         # Clear impacts and corrections
-        self.impact_zones.clear()
+        self.impacts.clear()
+        self.reset_impact_stats()
         self.dx_corr = 0.0
         self.dy_corr = 0.0
 
         # Reset recommendation text
         self.recommendation_text.set("No impacts yet")
 
-        # Redraw with everything back to factory defaults
-        self.update_plot()
+        # View follows the map again
+        self.view.auto = True
+
+        # Redraw with everything back to factory defaults (one coalesced frame)
+        self.request_redraw()
 
     def on_click(self, event):
-        if event.inaxes != self.ax or event.button != 1:
+        if event.inaxes and event.button in (2, 3):
+            # middle/right drag pans the map
+            self.pan_start = (event.x, event.y, self.view.cx, self.view.cy)
+            return
+        if not event.inaxes or event.button != 1:
             return
-        self.impact_zones.append((event.xdata, event.ydata))
-        if self.temp_line:
-            try: self.temp_line.remove()
-            except: pass
-            self.temp_line = None
-        if self.temp_text:
-            try: self.temp_text.remove()
-            except: pass
-            self.temp_text = None
-        self.update_plot()
+        self.hover_readout.set('')
+        self.renderer.clear_hover(present=False)
+        self.add_impact(event.xdata, event.ydata)
+
+    def add_impact(self, x, y):
+        self.record('click', x=round(x, 3), y=round(y, 3))
+        if self.net_client:
+            # the host adds it and sends it back with its new correction
+            return
+        self.impacts.append(x, y)
+        # O(1) statistics update; the bias is relative to the aim point in
+        # effect for this shot, i.e. target + current correction
+        tx, ty = polar_to_xy(self.safe_get_double(self.target_distance),
+                             self.safe_get_double(self.target_azimuth))
+        dx, dy = self.correction()
+        self.mpi.add(x, y)
+        self.bias.add(x - (tx + dx), y - (ty + dy))
+        self.last_shot_corr = (dx, dy)
+        self.request_redraw()
+
+    def on_release(self, event):
+        self.pan_start = None
+
+    def on_scroll(self, event):
+        # wheel zoom about the cursor
+        if not event.inaxes:
+            return
+        factor = 1 / 1.25 if event.button == 'up' else 1.25
+        self.record('zoom', x=round(event.xdata, 3), y=round(event.ydata, 3), f=factor)
+        self.view.zoom(factor, event.xdata, event.ydata)
+        self.request_redraw()
+
+    def pan(self, event):
+        px, py, cx, cy = self.pan_start
+        # metres per pixel of the view (the zoom is fixed during a drag)
+        scale = 2 * self.view.half / self.renderer.width_px
+        cx, cy = cx - (event.x - px) * scale, cy - (event.y - py) * scale
+        self.record('pan', cx=round(cx, 3), cy=round(cy, 3))
+        self.view.pan_to(cx, cy)
+        self.request_redraw()
+
+    def on_coverage_toggle(self):
+        self.record('coverage', on=bool(self.show_coverage.get()))
+        self.request_redraw()
+
+    def fit_view(self):
+        self.record('fit')
+        self.view.auto = True
+        self.request_redraw()
 
     def on_mouse_move(self, event):
-        if not event.inaxes: return
-        mx, my = event.xdata, event.ydata
+        if self.pan_start is not None:
+            self.pan(event)
+            return
+        # motion storms are coalesced: only the newest pending event is drawn
+        if self.recorder and event.inaxes:
+            self.record('move', x=round(event.xdata, 3), y=round(event.ydata, 3))
+        if self.pending_motion is not None:
+            self.profiler.count('motion dropped')
+        else:
+            self.root.after_idle(self.process_motion)
+        self.pending_motion = event
+
+    def sync_index(self):
+        # bring the spatial index up to date with impacts, teams and targets;
+        # only what changed since the last call is touched
+        index = self.index
+        generation, done, first = self.indexed['impact']
+        if generation != self.impacts.generation:
+            index.remove_kind('impact')
+            generation, done, first = self.impacts.generation, 0, 1
+        total, kept = self.impacts.total, len(self.impacts)
+        if total > done:
+            xy, numbers = self.impacts.recent(min(total - done, kept))
+            for (x, y), n in zip(xy.tolist(), numbers.tolist()):
+                index.insert(('impact', n), x, y)
+            # shots the ring buffer has dropped since
+            for n in range(first, total - kept + 1):
+                if ('impact', n) in index:
+                    index.remove(('impact', n))
+            first = total - kept + 1
+        self.indexed['impact'] = (generation, total, first)
+
+        for kind, table in (('team', self.teams), ('queued', self.targets)):
+            if self.indexed[kind] == table.version:
+                continue
+            self.indexed[kind] = table.version
+            keep = set()
+            for name, (x, y), on in zip(table.names, table.xy().tolist(), table.active()):
+                if on:
+                    index.insert((kind, name), x, y)
+                    keep.add((kind, name))
+            for key in index.kinds.get(kind, set()) - keep:
+                index.remove(key)
+
         td = self.safe_get_double(self.target_distance)
-        ta = np.deg2rad(self.safe_get_double(self.target_azimuth))
-        tx, ty = td * np.sin(ta), td * np.cos(ta)
-        if self.temp_line:
-            try: self.temp_line.remove()
-            except: pass
-            self.temp_line = None
-        if self.temp_text:
-            try: self.temp_text.remove()
-            except: pass
-            self.temp_text = None
-        self.temp_line = self.ax.plot([tx, mx], [ty, my], linestyle=':', color='yellow')[0]
-        dist = np.hypot(mx - tx, my - ty)
-        self.temp_text = self.ax.text(mx, my, f"{dist:.1f} m", color='yellow', fontsize=8, ha='left', va='bottom')
-        self.canvas.draw()
+        ta = self.safe_get_double(self.target_azimuth)
+        if td or ta:
+            index.insert(('target', 'Target'), *polar_to_xy(td, ta))
+        elif ('target', 'Target') in index:
+            index.remove(('target', 'Target'))
+
+    def describe(self, key):
+        kind, name = key
+        if kind == 'impact':
+            return f"Impact #{name}"
+        if kind == 'queued':
+            return f"Queued target {name}"
+        return name
+
+    def process_motion(self):
+        event, self.pending_motion = self.pending_motion, None
+        if event is None or not event.inaxes: return
+        t0 = time.perf_counter()
+        mx, my = event.xdata, event.ydata
+        tx, ty = polar_to_xy(self.safe_get_double(self.target_distance),
+                             self.safe_get_double(self.target_azimuth))
+
+        # snap to the nearest map object within a few pixels of the cursor
+        self.sync_index()
+        snap = self.hover_snap_px * 2 * self.view.half / self.renderer.width_px
+        hit = self.index.nearest(mx, my, snap)
+        label = f"{np.hypot(mx - tx, my - ty):.1f} m"
+        if hit:
+            key, _ = hit
+            mx, my = self.index.position(key)
+            label = f"{self.describe(key)} · {np.hypot(mx - tx, my - ty):.1f} m"
+
+        # distance/azimuth from each team, nearest first, with lines to the
+        # nearest few on the map
+        active = self.teams.active()
+        readout, segments, colors = [], [], []
+        if active.any():
+            team_xy = self.teams.xy()[active]
+            names = [n for n, a in zip(self.teams.names, active) if a]
+            team_colors = [c for c, a in zip(self.teams.colors, active) if a]
+            dist, az = xy_to_polar(mx - team_xy[:, 0], my - team_xy[:, 1])
+            order = np.argsort(dist)
+            readout = [f"{names[i]}: {dist[i]:.1f}m / {az[i]:.1f}°" for i in order]
+            shown = order[:self.hover_teams]
+            segments = [[tuple(team_xy[i]), (mx, my)] for i in shown]
+            colors = [team_colors[i] for i in shown]
+        self.hover_readout.set('   '.join(readout))
+        self.renderer.show_hover((tx, ty), (mx, my), label, segments, colors)
+        self.profiler.record('hover', t0, time.perf_counter())
+
+    def correction(self):
+        # the correction in effect now: it cancels the mean bias of all shots
+        # relative to their aim points. Computed from the statistics rather
+        # than read from the last frame, which may not have been drawn yet
+        if self.bias.n:
+            bx, by = self.bias.mean
+            return -bx, -by
+        if self.net_client and 'corr' in self.net_state:
+            # following a host: impacts are its own, and so is the correction
+            return tuple(self.net_state['corr'])
+        return 0.0, 0.0
 
     def update_plot(self, *args):
-        # 1) Clear & style
-        self.ax.clear()
-        self.ax.set_facecolor('#2b2b2b')
-        self.ax.grid(color='gray', linestyle='--')
-        # Ensure autoscale is off so the view doesn't jump around
-        self.ax.set_autoscale_on(False)
+        if self.renderer.busy:
+            # the last frame is still rasterizing; draw again once it is shown
+            self.renderer.redraw_pending = True
+            return
+        if not self.first_frame:
+            self.draw_frame()
+            return
+        self.first_frame = False
+        with self.startup.phase('first draw'):
+            self.draw_frame()
+            # the window opens with a complete first frame
+            self.worker.wait()
+        if self.profile_startup:
+            self.startup.report()
+
+    def draw_frame(self):
+        # 1) Start a frame of the retained scene; artists persist between calls
+        t_start = time.perf_counter()
+        E = self.renderer.elements
+        self.scene.begin_frame()
+        self.profiler.count('coalesced', max(0, self.redraw.last_coalesced - 1))
 
         # 2) Compute target in map coords
         td = self.safe_get_double(self.target_distance)
-        ta = np.deg2rad(self.safe_get_double(self.target_azimuth))
-        tx, ty = td * np.sin(ta), td * np.cos(ta)
+        tx, ty = polar_to_xy(td, self.safe_get_double(self.target_azimuth))
 
         # 3) Interpolate spread radius at this distance
-        art = self.artillery_type.get()
-        (min_d, max_d), (min_r, max_r) = self.artillery_ranges[art]
-        d0 = min(max(td, min_d), max_d)
-        frac = (d0 - min_d) / (max_d - min_d) if max_d > min_d else 0
-        total_r = min_r + frac * (max_r - min_r)
+        weapon = self.artillery_ranges[self.artillery_type.get()]
+        (min_d, max_d), _ = weapon
+        total_r = float(spread_radius(td, weapon))
         inner_r, outer_r = total_r * 0.5, total_r
 
-        # 4) Update correction only if last impact is outside the true spread
-        if self.impact_zones:
-            ix, iy = self.impact_zones[-1]
-            miss = np.hypot(ix - tx, iy - ty)
-            if miss > outer_r:
-                self.dx_corr = tx - ix
-                self.dy_corr = ty - iy
+        # 4) Correction cancels the mean bias of all shots relative to their aim
+        #    points; "Hold fire" when it moved less than the green ring since the last shot
+        self.dx_corr, self.dy_corr = self.correction()
+        if self.bias.n:
+            bx, by = self.bias.mean
+            shift = np.hypot(self.dx_corr - self.last_shot_corr[0],
+                             self.dy_corr - self.last_shot_corr[1])
+            summary = (f"MPI off {np.hypot(bx, by):.1f}m, "
+                       f"CEP {self.bias.cep():.1f}m (n={self.bias.n})")
+            if shift > inner_r:
                 self.recommendation_text.set(
-                    f"Correct by ({self.dx_corr:.1f}m, {self.dy_corr:.1f}m)"
+                    f"Correct by ({self.dx_corr:.1f}m, {self.dy_corr:.1f}m) · {summary}"
                 )
             else:
-                self.recommendation_text.set("Hold fire")
+                self.recommendation_text.set(f"Hold fire · {summary}")
+        elif self.net_client and 'corr' in self.net_state:
+            self.recommendation_text.set(self.net_state.get('advice', ''))
         else:
-            self.dx_corr = self.dy_corr = 0.0
             self.recommendation_text.set("No impacts yet")
 
-        # 5) Spotter uses persistent correction
-        adj_x, adj_y = tx + self.dx_corr, ty + self.dy_corr
-        sd = np.hypot(adj_x, adj_y)
-        sa = np.degrees(np.arctan2(adj_x, adj_y)) % 360
-        self.spotter_solution.set(f"{sd:.1f}m / {sa:.1f}°")
-
-        # 6) Draw spotter & target
-        self.ax.plot(0, 0, 'o', color='white', markersize=8, label='Spotter')
-        self.ax.plot([0, tx], [0, ty], linestyle=':', color='white')
-        self.ax.plot(tx, ty, 'X', color='red', markersize=10, label='Target')
-
-        # 7) Plot each team
-        for idx, (name, vars) in enumerate(self.team_entries.items()):
-            d = self.safe_get_double(vars['distance'])
-            a = np.deg2rad(self.safe_get_double(vars['azimuth']))
-            if d == 0 and self.safe_get_double(vars['azimuth']) == 0:
-                vars['label'].config(foreground='black')
-                self.team_solution_labels[name].config(text='-- / --')
-                continue
-
-            x, y = d * np.sin(a), d * np.cos(a)
-            dx, dy = tx - x + self.dx_corr, ty - y + self.dy_corr
-            sol_d = np.hypot(dx, dy)
-            sol_a = np.degrees(np.arctan2(dx, dy)) % 360
-
-            # ← FIX: specify text=
-            self.team_solution_labels[name].config(text=f"{sol_d:.1f}m / {sol_a:.1f}°")
-
-            color = self.team_colors[idx % len(self.team_colors)]
-            # dotted wedge = min_d→max_d around team
-            if self.show_team_ranges[name].get():
-                self.ax.add_patch(
-                    patches.Wedge(
-                        (x, y),
-                        max_d, 0, 360,
-                        width=(max_d - min_d),
-                        edgecolor=color,
-                        facecolor='none',
-                        linestyle='--'
-                    )
-                )
-            # team marker + aim line
-            self.ax.plot(x, y, '^', color=color, markersize=8, label=name)
-            self.ax.plot([x, tx], [y, ty], linestyle=':', color=color)
-
-        # 8) Draw the green/orange rings at the target
-        self.ax.add_patch(
-            patches.Circle((tx, ty), inner_r,
-                           facecolor='green', alpha=0.3, edgecolor='none')
-        )
-        self.ax.add_patch(
-            patches.Wedge((tx, ty), outer_r, 0, 360,
-                          width=(outer_r - inner_r),
-                          facecolor='orange', alpha=0.3, edgecolor='none')
-        )
-
-        # 9) Plot impacts
-        for i, (ix, iy) in enumerate(self.impact_zones, start=1):
-            self.ax.plot(ix, iy, 'D', color='yellow')
-            self.ax.text(ix, iy, str(i), color='black',
-                         ha='center', va='center')
+        # 5) One batched solve: the spotter (row 0, at the origin) and every team
+        team_xy = self.teams.xy()
+        active = self.teams.active()
+        sol = self.solution = solve(np.vstack(((0.0, 0.0), team_xy)), (tx, ty), weapon,
+                                    (self.dx_corr, self.dy_corr))
+        if self.recorder:
+            self.record('frame', sol=round_solutions(sol))
+        if self.net_server:
+            self.publish_state(td, sol, active)
+
+        # spotter uses persistent correction; team labels are only
+        # reconfigured when their text changes
+        self.spotter_solution.set(f"{sol.distance[0, 0]:.1f}m / {sol.azimuth[0, 0]:.1f}°")
+        for row, on, d, a in zip(self.team_rows, active, sol.distance[1:, 0], sol.azimuth[1:, 0]):
+            text = f"{d:.1f}m / {a:.1f}°" if on else '-- / --'
+            if text != row['text']:
+                row['text'] = text
+                row['solution'].config(text=text)
+        self.update_hit_probabilities(sol, active, weapon)
+        if len(self.targets):
+            self.update_assignments(team_xy, active, weapon)
+        else:
+            self.mission_team = ()
+            self.assignment_key = None
+        t_recompute = time.perf_counter()
+
+        # 6) Viewport: follow spotter, target and teams unless zoomed/panned;
+        #    elements below leave out what falls outside it
+        if self.view.auto:
+            self.view.fit(np.vstack(((0.0, 0.0), (tx, ty), team_xy[active])))
+        view = self.view.bounds()
+        self.scene.sync('view', E.ViewElement, view)
+        if self.map_tiles:
+            # only the tiles under the view, at about screen resolution
+            level, rows, cols = self.map_tiles.visible(view, self.renderer.width_px,
+                                                       self.map_spotter)
+            misses = self.map_tiles.cache.misses
+            self.scene.sync('map', E.MapElement, (self.map_tiles, level, rows, cols, self.map_spotter))
+            if self.map_tiles.cache.misses > misses:
+                self.profiler.count('tiles loaded', self.map_tiles.cache.misses - misses)
+
+        # Coverage heatmap over the view (computed only while shown)
+        show_coverage = bool(self.show_coverage.get())
+        if show_coverage:
+            self.update_coverage(view, (min_d, max_d))
+        shown = self.coverage_shown
+        self.scene.sync('coverage', E.CoverageElement,
+                        (show_coverage, id(shown), shown))
+
+        # 7) Spotter & target
+        self.scene.sync('spotter', E.SpotterElement, ())
+        self.scene.sync('target', E.TargetElement, (tx, ty))
+
+        # 8) All teams as collections
+        self.scene.sync('teams', E.TeamsElement,
+                        (self.teams, self.teams.version, tx, ty, min_d, max_d, view))
+
+        # Queued targets and the lines to their assigned teams
+        self.scene.sync('missions', E.MissionsElement,
+                        (self.targets, self.targets.version, self.teams, self.teams.version,
+                         self.current_assignment()))
+
+        # 9) Green/orange rings at the target
+        self.scene.sync('rings', E.RingsElement, (tx, ty, inner_r, outer_r,
+                                                bool(circles_visible(tx, ty, outer_r, view))))
+
+        # 10) Impacts
+        self.scene.sync('impacts', E.ImpactsElement,
+                        (self.impacts, self.impacts.version, view), self.impact_labels)
+
+        # 11) Mean point of impact and 50% dispersion ellipse
+        if self.mpi.n:
+            mx, my = self.mpi.mean
+            w, h, angle = self.bias.ellipse(0.5)
+            visible = bool(circles_visible(mx, my, max(w, h) / 2 + 1.0, view))
+            self.scene.sync('dispersion', E.DispersionElement,
+                            (visible, mx, my, w, h, angle, self.bias.cep()))
+        else:
+            self.scene.sync('dispersion', E.DispersionElement, (False, 0, 0, 0, 0, 0, 0))
+
+        # 12) Legend follows the visible labelled artists
+        self.scene.sync_legend()
+        changed = self.scene.end_frame()
+        self.profiler.record('recompute', t_start, t_recompute)
+        self.profiler.record('artists', t_recompute, time.perf_counter())
+
+        # nothing changed → skip the Agg pass entirely
+        if changed:
+            self.renderer.present()
+        self.profiler.record('frame', t_start, time.perf_counter())
+        if self.renderer.hud_visible:
+            self.renderer.set_hud(self.hud_summary())
+
+    def update_hit_probabilities(self, sol, active, weapon):
+        # P(hit) and expected shells per team at its solution distance; the
+        # aim error is the uncertainty of the current correction
+        if not active.any():
+            for row in self.team_rows:
+                if row['hit_text'] != '--':
+                    row['hit_text'] = '--'
+                    row['hit'].config(text='--')
+            return
+        # the correction cancels the mean bias, so shots are centred on the
+        # target and only the correction's uncertainty moves them
+        aim_cov = self.bias.mean_cov if self.bias.n else None
+        hits = max(1, round(self.safe_get_double(self.hits_to_kill)))
+        version = self.teams.version
+        self.worker.submit('hitprob', self.estimate_hits, sol.distance[1:, 0], weapon,
+                           max(self.safe_get_double(self.target_radius), 0.0),
+                           aim_cov, sol.in_range[1:, 0],
+                           done=lambda p: self.show_hit_probabilities(p, active, hits, version),
+                           phase='hitprob')
+
+    def estimate_hits(self, *args):
+        # 'hitprob' job: the estimator and its cache are only used here
+        if self.hitprob is None:
+            self.hitprob = HitProbability()
+        return self.hitprob.estimate(*args)
+
+    def show_hit_probabilities(self, p, active, hits, version):
+        if version != self.teams.version:
+            return  # rows changed since; a newer job follows
+        shells = shells_to_kill(p, hits)
+        for row, on, pi, n in zip(self.team_rows, active, p.tolist(), shells.tolist()):
+            if not on:
+                text = '--'
+            elif pi > 0:
+                text = f"{pi:.0%} · {n:.1f} sh"
+            else:
+                text = '0% · –'
+            if text != row['hit_text']:
+                row['hit_text'] = text
+                row['hit'].config(text=text)
+
+    def update_coverage(self, view, band):
+        # reach grid in the background, once per view, band and team layout
+        key = (view, band, self.teams.version)
+        if key == self.coverage_key:
+            return
+        self.coverage_key = key
+        active = self.teams.active()
+        n = int(np.count_nonzero(active))
+        self.worker.submit('coverage', self.coverage.update, view, band, self.teams.xy()[active],
+                           done=lambda result: self.show_coverage_grid((*result, n)),
+                           phase='coverage')
+
+    def show_coverage_grid(self, shown):
+        self.coverage_shown = shown
+        if self.worker.threads:
+            self.request_redraw()
+
+    def current_assignment(self):
+        # the last finished assignment, while it still fits the tables
+        team = self.mission_team
+        if len(team) != len(self.targets) or max(team, default=-1) >= len(self.teams):
+            return ()
+        return team
+
+    def publish_state(self, td, sol, active):
+        # what clients see; netsync sends only what changed since last frame
+        names = [n for n, a in zip(self.teams.names, active) if a]
+        team_d, team_a, team_in = (v[1:, 0][active].tolist()
+                                   for v in (sol.distance, sol.azimuth, sol.in_range))
+        self.net_server.publish({
+            'target': [round(td, 3), round(self.safe_get_double(self.target_azimuth), 3)],
+            'weapon': self.artillery_type.get(),
+            'corr': [round(self.dx_corr, 3), round(self.dy_corr, 3)],
+            'advice': self.recommendation_text.get(),
+            'spotter': [round(float(sol.distance[0, 0]), 1), round(float(sol.azimuth[0, 0]), 1)],
+            'teams': {n: [round(d, 1), round(a, 1), r]
+                      for n, d, a, r in zip(names, team_d, team_a, team_in)},
+        }, self.impacts)
+
+    def poll_network(self):
+        # apply whatever the network thread queued; edits only invalidate, so
+        # a burst of messages still renders as one frame
+        net = self.net_server or self.net_client
+        messages = net.poll()
+        for kind, payload in messages:
+            if kind == 'input':
+                self.apply_input(*payload)
+            elif kind == 'joined':
+                self.net_peers += 1
+            elif kind == 'left':
+                self.net_peers -= 1
+            elif kind == 'status':
+                self.net_link = payload
+            else:
+                self.apply_remote(payload, snapshot=kind == 'snapshot')
+        if messages:
+            self.update_net_status()
+        self.root.after(self.NET_POLL_MS, self.poll_network)
 
-        # 10) Lock limits and draw legend
-        lim = self.max_range * 1.1
-        self.ax.set_xlim(-lim, lim)
-        self.ax.set_ylim(-lim, lim)
-        leg = self.ax.legend(loc='upper right', fontsize='small')
-        for t in leg.get_texts():
-            t.set_color('white')
+    def apply_input(self, event, fields):
+        # a client's input, applied (and recorded) as if it was made here
+        try:
+            if event == 'target':
+                d, a = float(fields['d']), float(fields['a'])
+                if np.isfinite((d, a)).all():
+                    self.target_distance.set(d)
+                    self.target_azimuth.set(a)
+            elif event == 'click':
+                x, y = float(fields['x']), float(fields['y'])
+                if np.isfinite((x, y)).all():
+                    self.add_impact(x, y)
+            elif event == 'weapon':
+                if fields['name'] in self.artillery_ranges:
+                    self.artillery_type.set(fields['name'])
+            elif event == 'reset_impacts':
+                self.reset_impacts()
+            elif event == 'total_reset':
+                self.total_reset()
+        except (KeyError, TypeError, ValueError):
+            pass  # malformed input from the network
+
+    def apply_remote(self, payload, snapshot=False):
+        # fold the host's snapshot or delta into our copy of its state, then
+        # bring the inputs it covers in line; none of it is forwarded back
+        if snapshot:
+            self.net_state, self.net_impacts = {}, (None, 0)
+        state = merge(self.net_state, payload)
+        self.record_muted, muted = True, self.record_muted
+        try:
+            weapon = state.get('weapon')
+            if weapon in self.artillery_ranges and weapon != self.artillery_type.get():
+                # the weapon change clears our impacts
+                self.artillery_type.set(weapon)
+                self.net_impacts = (None, 0)
+            if 'target' in payload:
+                d, a = state['target']
+                if d != self.safe_get_double(self.target_distance):
+                    self.target_distance.set(d)
+                if a != self.safe_get_double(self.target_azimuth):
+                    self.target_azimuth.set(a)
+            if 'impacts' in state and ('impacts' in payload or self.net_impacts[0] is None):
+                self.mirror_impacts(state['impacts'])
+        finally:
+            self.record_muted = muted
+        self.request_redraw()
+
+    def mirror_impacts(self, impacts):
+        # append the host's impacts we have not seen; start over on a new
+        # generation or when its ring dropped some we never got
+        generation, last = self.net_impacts
+        first = impacts['from']
+        if generation != impacts['g'] or last < first - 1:
+            self.impacts.clear()
+            last = first - 1
+        for x, y in impacts['xy'][last + 1 - first:]:
+            self.impacts.append(x, y)
+        self.net_impacts = (impacts['g'], first + len(impacts['xy']) - 1)
+
+    def update_net_status(self):
+        if self.net_server:
+            n = self.net_peers
+            self.net_status.set(f"Serving on port {self.net_server.port} · "
+                                f"{n} client{'' if n == 1 else 's'}")
+            return
+        if not self.net_team:
+            self.net_status.set(self.net_link)
+            return
+        line = self.net_state.get('teams', {}).get(self.net_team)
+        if line is None:
+            text = f"{self.net_team}: not in the session"
+        else:
+            d, a, in_range = line
+            text = f"{self.net_team}: {d:.1f}m / {a:.1f}°" + ('' if in_range else ' (out of range)')
+        self.net_status.set(f"{self.net_link} · {text}")
+
+    def hud_summary(self):
+        stats = self.scene.frame_stats
+        return (f"{self.profiler.hud_text()}\n"
+                f"artists created/updated: {stats['created']}/{stats['updated']}")
+
+    def toggle_hud(self, *args):
+        self.renderer.set_hud(None if self.renderer.hud_visible else self.hud_summary())
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='app.py', description='Foxhole artillery fire control')
+    parser.add_argument('--max-fps', type=float, default=60, help='redraw rate cap')
+    parser.add_argument('--profile-startup', action='store_true',
+                        help='print a per-phase startup timing breakdown to stderr')
+    parser.add_argument('--impact-history', type=int, default=None,
+                        help='keep only the last N impacts (default: all)')
+    parser.add_argument('--impact-labels', type=int, default=20,
+                        help='number the most recent N impacts on the map')
+    parser.add_argument('--teams', type=int, default=4, help='number of team rows to start with')
+    parser.add_argument('--mpi-window', type=int, default=None,
+                        help='base the MPI correction on the last N impacts only')
+    parser.add_argument('--mpi-decay', type=float, default=None,
+                        help='exponentially down-weight older impacts (e.g. 0.8)')
+    parser.add_argument('--trace', metavar='PATH',
+                        help='write a JSON trace of every frame phase on exit')
+    parser.add_argument('--profile-session', metavar='PATH',
+                        help='run the session under cProfile and dump stats on exit')
+    parser.add_argument('--map', metavar='DIR',
+                        help="map background built with 'app.py tiles'")
+    parser.add_argument('--map-spotter', type=float, nargs=2, default=(0.0, 0.0),
+                        metavar=('X', 'Y'), help="spotter's position on the map, in metres")
+    parser.add_argument('--map-cache-mb', type=float, default=64,
+                        help='memory cap for decoded map tiles')
+    parser.add_argument('--renderer', choices=sorted(RENDERERS), default='mpl',
+                        help="map backend: matplotlib/Agg or native Tk canvas items")
+    parser.add_argument('--weapons', metavar='PATH',
+                        help='weapon data file (default: weapons.json next to the app)')
+    parser.add_argument('--workers', type=int, default=2,
+                        help='threads for background analyses and rasterizing (0: none)')
+    parser.add_argument('--record', metavar='PATH',
+                        help='append every input and the resulting solutions to a session log')
+    net = parser.add_mutually_exclusive_group()
+    net.add_argument('--serve', type=int, nargs='?', const=PORT, metavar='PORT',
+                     help=f'share this session on the LAN (default port {PORT})')
+    net.add_argument('--connect', metavar='HOST[:PORT]',
+                     help="follow a session shared with --serve")
+    parser.add_argument('--team', metavar='NAME',
+                        help="with --connect, show this team's solution (e.g. 2 or 'Team 2')")
+    args = parser.parse_args(argv)
+
+    if args.team and not args.connect:
+        parser.error("--team needs --connect")
+    if args.serve is not None and not 0 <= args.serve < 65536:
+        parser.error(f"--serve: bad port {args.serve}")
+    net_server = net_client = None
+    if args.serve is not None or args.connect:
+        # asyncio is imported only for a shared session
+        from netsync import SyncServer, SyncClient
+    if args.serve is not None:
+        try:
+            net_server = SyncServer(port=args.serve).start()
+        except OSError as e:
+            parser.error(f"cannot serve on port {args.serve}: {e.strerror}")
+    elif args.connect:
+        host, _, port = args.connect.partition(':')
+        if not host or port and not (port.isdigit() and 0 < int(port) < 65536):
+            parser.error(f"--connect: expected HOST or HOST:PORT, got {args.connect!r}")
+        net_client = SyncClient(host, int(port) if port else PORT).start()
+    team = args.team
+    if team and team.isdigit():
+        team = f'Team {team}'
+
+    startup = PhaseTimer(start=_START)
+    startup.mark('imports')
+    map_tiles = None
+    with startup.phase('weapon catalog'):
+        try:
+            weapons = load_catalog(args.weapons)
+        except (OSError, ValueError) as e:
+            parser.error(f"weapons: {e}")
+    if args.map:
+        from tiles import TilePyramid
+        with startup.phase('map open'):
+            map_tiles = TilePyramid(args.map, cache_bytes=int(args.map_cache_mb * (1 << 20)))
+    with startup.phase('tk root'):
+        root = tk.Tk()
+    app = FoxholeArtilleryApp(root, max_fps=args.max_fps, startup=startup,
+                        profile_startup=args.profile_startup,
+                        impact_history=args.impact_history,
+                        impact_labels=args.impact_labels,
+                        mpi_window=args.mpi_window, mpi_decay=args.mpi_decay,
+                        initial_teams=args.teams,
+                        recorder=SessionRecorder(args.record) if args.record else None,
+                        map_tiles=map_tiles, map_spotter=args.map_spotter,
+                        renderer=args.renderer,
+                        net_server=net_server, net_client=net_client, net_team=team,
+                        weapons=weapons, workers=max(args.workers, 0))
+    if args.trace:
+        app.profiler.start_trace()
+    profile = cProfile.Profile() if args.profile_session else None
+    if profile:
+        profile.enable()
+    try:
+        root.mainloop()
+    finally:
+        if profile:
+            profile.disable()
+            profile.dump_stats(args.profile_session)
+        if args.trace:
+            app.profiler.dump_trace(args.trace)
+        if app.recorder:
+            app.recorder.close()
+        app.worker.close()
+        for net in (net_server, net_client):
+            if net:
+                net.close()
 
-        self.canvas.draw()
 
 if __name__ == '__main__':
-    root = tk.Tk()
-    app = FoxholeArtilleryApp(root)
-    root.mainloop()
+    main()
@@ -0,0 +1,292 @@
+"""Reproducible microbenchmarks for the solver and the rendering paths.
+
+    python bench.py -o bench.json                       # run, write results
+    python bench.py --baseline bench.json --threshold 0.25
+
+Runs headless (Agg canvas, stand-in Tk root; see headless.py) unless a
+display is available. The `tk/` cases use the native canvas renderer; headless
+they time its Python side only, since the canvas stand-in paints nothing. Results are JSON; with --baseline, any case whose
+best run (min_ms, the least noisy statistic) is more than `threshold` slower
+than the baseline is reported as a regression and the exit status is 1.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+import numpy as np
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, HERE)
+
+import solver  # noqa: E402
+
+
+def measure(func, repeat=7, number=1, setup=None):
+    # median/min wall time of `number` calls, over `repeat` runs, in ms per call
+    times = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        t0 = time.perf_counter()
+        for _ in range(number):
+            func()
+        times.append((time.perf_counter() - t0) / number * 1000)
+    return {'median_ms': statistics.median(times), 'min_ms': min(times),
+            'repeat': repeat, 'number': number}
+
+
+def bench_solver(results):
+    rng = np.random.default_rng(0)
+    weapon = solver.ARTILLERY_RANGES['Mortar']
+    targets = rng.uniform(-80, 80, (40, 2))
+    for n in (1, 4, 40, 400):
+        teams = rng.uniform(-80, 80, (n, 2))
+        results[f'solver/teams={n}'] = measure(
+            lambda: solver.solve(teams, targets[0], weapon), number=1000)
+        results[f'solver/teams={n}xtargets=40'] = measure(
+            lambda: solver.solve(teams, targets, weapon), number=200)
+
+
+def new_app(**kwargs):
+    # everything on the calling thread by default, so a frame's time is all
+    # of its work; the background case passes workers explicitly
+    import headless
+    kwargs.setdefault('workers', 0)
+    return headless.make_app(**kwargs)
+
+
+def setup_scene(app, root, teams=4, impacts=0, seed=0):
+    rng = np.random.default_rng(seed)
+    app.target_distance.set(65.0)
+    app.target_azimuth.set(40.0)
+    while len(app.team_rows) < teams:
+        app.add_team()
+    for i, row in enumerate(app.team_rows):
+        row['distance'].set(20.0 + i)
+        row['azimuth'].set((i * 37.0) % 360)
+    for x, y in rng.normal((42.0, 50.0), 6.0, (impacts, 2)):
+        app.impacts.append(x, y)
+    app.request_redraw()
+    app.redraw.flush()
+    root.pump()
+
+
+def bench_update_plot(results):
+    # on Agg, flat in the impact count: impacts are one cached bitmap
+    # (scene.ImpactLayer), redrawn only as the view drifts out of it; on the
+    # tk canvas, each view change (auto-fit follows the edited target)
+    # re-projects every impact item
+    for renderer, prefix in (('mpl', ''), ('tk', 'tk/')):
+        for n in (0, 100, 5000):
+            app, root = new_app(renderer=renderer)
+            setup_scene(app, root, impacts=n)
+            step = iter(range(10 ** 9))
+
+            def frame():
+                # a real edit each time so the frame is never a no-op
+                app.target_azimuth.set(40.0 + next(step) % 7 * 0.1)
+                app.redraw.flush()
+            results[f'update_plot/{prefix}impacts={n}'] = measure(frame, repeat=5, number=10)
+
+
+def bench_mouse_storm(results):
+    for renderer, prefix in (('mpl', ''), ('tk', 'tk/')):
+        mouse_storm(results, renderer, prefix)
+
+
+def mouse_storm(results, renderer, prefix):
+    from headless import MouseEvent
+    app, root = new_app(renderer=renderer)
+    setup_scene(app, root, impacts=100)
+    events = [MouseEvent(app.renderer, -50 + i * 0.1, 20 + (i % 50) * 0.5) for i in range(1000)]
+
+    def storm():
+        # all events arrive before Tk gets idle time: coalesced into one draw
+        for ev in events:
+            app.on_mouse_move(ev)
+        root.pump()
+
+    def every_event():
+        # Tk idles between events: each one is drawn
+        for ev in events:
+            app.on_mouse_move(ev)
+            root.pump()
+    results[f'mouse_storm/{prefix}1000_coalesced'] = measure(storm, repeat=5)
+    results[f'mouse_storm/{prefix}1000_each_drawn'] = measure(every_event, repeat=3)
+
+
+def bench_total_reset(results):
+    app, root = new_app()
+
+    def fill():
+        setup_scene(app, root, impacts=100)
+
+    def reset():
+        app.total_reset()
+        app.redraw.flush()
+    results['total_reset'] = measure(reset, repeat=7, setup=fill)
+
+
+def bench_startup(results, repeat=3):
+    # cold start in a fresh interpreter, including imports
+    times = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), '--startup-probe'],
+                             capture_output=True, text=True, check=True, cwd=HERE)
+        times.append(float(out.stdout.strip()))
+    results['startup_to_first_frame'] = {'median_ms': statistics.median(times),
+                                         'min_ms': min(times), 'repeat': repeat, 'number': 1}
+
+
+def bench_input_latency(results, seconds=2.0, period_ms=8):
+    # how late Tk gets to a steady stream of edits (one every period_ms, each
+    # forcing a new frame) while the map, hit probabilities, coverage and
+    # assignments keep up: all on the Tk thread, then with background workers
+    for workers in (0, 2):
+        app, root = new_app(workers=workers)
+        setup_scene(app, root, teams=8, impacts=5000)
+        for i in range(20):
+            app.add_queue_target(55.0 + i, i * 17.0)
+        app.show_coverage.set(True)
+        app.request_redraw()
+        app.redraw.flush()
+        app.worker.wait()
+        root.pump(wait=True)
+        lateness, step = [], iter(range(10 ** 9))
+        end = time.perf_counter() + seconds
+        renders = app.redraw.renders
+
+        def tick(due):
+            now = time.perf_counter()
+            lateness.append((now - due) * 1000)
+            k = next(step)
+            app.target_distance.set(50.0 + k % 60 * 0.5)
+            app.target_azimuth.set(40.0 + k % 7 * 0.3)
+            if now < end:
+                root.after(period_ms, tick, time.perf_counter() + period_ms / 1000)
+        root.after(period_ms, tick, time.perf_counter() + period_ms / 1000)
+        root.pump(wait=True)
+        app.worker.wait()
+        results[f'input_latency/workers={workers}'] = {
+            'median_ms': statistics.median(lateness), 'min_ms': min(lateness),
+            'p95_ms': float(np.percentile(lateness, 95)), 'max_ms': max(lateness),
+            'repeat': len(lateness), 'number': 1, 'frames': app.redraw.renders - renders}
+        app.worker.close()
+
+
+def bench_netsync(results, frames=200, rate=120.0):
+    # publish → arrival latency of frame-like deltas on localhost, and the
+    # cost of one publish on the Tk thread, for 1 to 50 followers
+    from impacts import ImpactStore
+    from netsync import SimulatedClients, SyncServer
+    teams = {f'Team {i}': [50.0 + i, 10.0 * i, True] for i in range(1, 9)}
+    for n in (1, 10, 50):
+        server = SyncServer('127.0.0.1', 0).start()
+        clients = SimulatedClients('127.0.0.1', server.port, n).start()
+        impacts = ImpactStore()
+        published, publish_ms = {}, []
+        for i in range(frames):
+            teams['Team 1'] = [round(60 + i * 0.1, 1), 12.0, True]
+            if i % 10 == 0:
+                impacts.append(i * 0.5, 3.0)
+            state = {'target': [100.0, round(45 + i * 0.01, 3)], 'weapon': '120mm',
+                     'corr': [1.5, -0.5], 'advice': f'n={len(impacts)}', 'teams': teams}
+            t0 = time.perf_counter()
+            server.publish(dict(state, teams=dict(teams)), impacts)
+            published[server.version] = t0
+            publish_ms.append((time.perf_counter() - t0) * 1000)
+            time.sleep(1 / rate)
+        if not clients.wait_for(server.version):
+            raise RuntimeError(f'netsync: {n} clients did not catch up')
+        latency = [(arrivals[v] - published[v]) * 1000
+                   for arrivals in clients.arrivals for v in published]
+        results[f'netsync/clients={n}'] = {
+            'median_ms': statistics.median(latency), 'min_ms': min(latency),
+            'p95_ms': float(np.percentile(latency, 95)), 'repeat': len(latency), 'number': 1,
+            'publish_ms': statistics.median(publish_ms),
+            'bytes_per_delta': server.sent_bytes / (n * server.version)}
+        clients.close()
+        server.close()
+
+
+def startup_probe():
+    t0 = time.perf_counter()
+    new_app()
+    print((time.perf_counter() - t0) * 1000)
+
+
+CASES = {
+    'solver': bench_solver,
+    'update_plot': bench_update_plot,
+    'mouse_storm': bench_mouse_storm,
+    'total_reset': bench_total_reset,
+    'startup': bench_startup,
+    'netsync': bench_netsync,
+    'input_latency': bench_input_latency,
+}
+
+
+def compare(results, baseline, threshold):
+    regressions = []
+    for name, res in results.items():
+        base = baseline.get('results', {}).get(name)
+        if not base:
+            continue
+        ratio = res['min_ms'] / base['min_ms'] if base['min_ms'] else 1.0
+        flag = 'REGRESSION' if ratio > 1 + threshold else ''
+        print(f"{name:<34} {base['min_ms']:9.3f} → {res['min_ms']:9.3f} ms  "
+              f"x{ratio:5.2f} {flag}")
+        if flag:
+            regressions.append(name)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-o', '--output', help='write the results to this JSON file')
+    parser.add_argument('--only', nargs='+', choices=sorted(CASES), help='run only these groups')
+    parser.add_argument('--baseline', help='results file to compare against')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='allowed slowdown vs. baseline (0.25 = 25%%)')
+    parser.add_argument('--startup-probe', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+    if args.startup_probe:
+        startup_probe()
+        return 0
+
+    import matplotlib
+    results = {}
+    for name in args.only or CASES:
+        print(f"running {name} …", file=sys.stderr)
+        CASES[name](results)
+    report = {
+        'meta': {
+            'python': platform.python_version(), 'platform': platform.platform(),
+            'numpy': np.__version__, 'matplotlib': matplotlib.__version__,
+            'display': bool(os.environ.get('DISPLAY')),
+        },
+        'results': results,
+    }
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1)
+    for name, res in results.items():
+        print(f"{name:<34} {res['median_ms']:9.3f} ms (min {res['min_ms']:.3f})")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s): {', '.join(regressions)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
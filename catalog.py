@@ -0,0 +1,249 @@
+"""Weapon catalog: weapons.json compiled into NumPy lookup tables.
+
+    python app.py --weapons my_weapons.json
+
+weapons.json ({"version": 1, "weapons": {...}}) maps each weapon to its
+effective range and spread radius, in metres:
+
+    "Mortar": {"range": [45, 80], "spread": [5.5, 12]},
+    "Hades' Net": {"range": [300, 575], "spread": [[300, 35], [450, 41], [575, 52]]},
+    "Mortar (Warden)": {"base": "Mortar", "spread": [5, 11.5]}
+
+A spread is either the radius at min and max range (linear in between) or a
+piecewise-linear curve of [distance, radius] points. `base` starts from
+another entry and overrides some of its fields, e.g. for a faction variant.
+
+Loading compiles the file into an immutable Catalog: the range bands plus a
+dense spread table, LUT_SIZE samples across each band, so a spread query is
+one indexed read. The compiled arrays are cached on disk, keyed by the
+file's SHA-256, so later launches skip validation and sampling.
+
+The file is looked up next to the executable first, so a frozen build picks
+up a new file dropped beside it, then next to this module (the copy bundled
+into the build). With no file, solver.ARTILLERY_RANGES is used.
+"""
+import hashlib
+import json
+import os
+import sys
+from collections.abc import Mapping
+
+import numpy as np
+
+from solver import ARTILLERY_RANGES
+
+FILENAME = 'weapons.json'
+# the file's "version"; a newer file is refused rather than misread
+VERSION = 1
+LUT_SIZE = 2048
+# bump when the compiled layout changes; part of the cache key
+FORMAT = 1
+
+
+class Weapon(tuple):
+    # ((min_d, max_d), (min_r, max_r)) like ARTILLERY_RANGES values, so it goes
+    # wherever a weapon tuple does; spread_radius reads its row of `lut`
+    # instead of interpolating (`table` is that row as a list, for scalar
+    # queries). From Catalog.select, row, step and the band are per-element
+    # arrays.
+    def __new__(cls, band, spread, lut, row, step, key, table=None):
+        self = super().__new__(cls, (band, spread))
+        self.lut, self.row, self.step, self.table = lut, row, step, table
+        # equal weapons have the same band and spread curve, whatever their name
+        self.key = key
+        self.hash = hash(key)
+        return self
+
+    def __eq__(self, other):
+        if isinstance(other, Weapon):
+            return self.key == other.key
+        return tuple.__eq__(self, other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return self.hash
+
+
+class Catalog(Mapping):
+    # name → Weapon, read-only; iterates in file order
+    def __init__(self, names, band, points, offsets, source=None, lut=None, step=None):
+        # curve i is points[offsets[i]:offsets[i + 1]]; lut and step come
+        # from a cache, otherwise they are sampled here
+        self.names = tuple(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.band = np.asarray(band, dtype=float)
+        self.points = np.asarray(points, dtype=float)
+        self.offsets = np.asarray(offsets, dtype=np.intp)
+        self.source = source
+        # SHA-256 of the weapons file, set by load_catalog; None when built in
+        self.digest = None
+        if lut is None:
+            lut, step = self.tabulate()
+        self.lut, self.step = lut, step
+        for array in (self.band, self.points, self.offsets, self.lut, self.step):
+            array.setflags(write=False)
+        self.weapons = {}
+        for i, name in enumerate(self.names):
+            (min_d, max_d) = self.band[i].tolist()
+            curve = self.points[self.offsets[i]:self.offsets[i + 1]]
+            key = ((min_d, max_d), tuple(map(tuple, curve.tolist())))
+            self.weapons[name] = Weapon(
+                (min_d, max_d), (float(self.lut[i, 0]), float(self.lut[i, -1])),
+                self.lut, i, float(self.step[i]), key, self.lut[i].tolist())
+
+    def tabulate(self):
+        # spread sampled at LUT_SIZE evenly spaced distances across each band
+        lut = np.empty((len(self.names), LUT_SIZE))
+        step = np.ones(len(self.names))
+        for i, (min_d, max_d) in enumerate(self.band.tolist()):
+            curve = self.points[self.offsets[i]:self.offsets[i + 1]]
+            if max_d > min_d:
+                step[i] = (max_d - min_d) / (LUT_SIZE - 1)
+            lut[i] = np.interp(np.linspace(min_d, max_d, LUT_SIZE), curve[:, 0], curve[:, 1])
+        return lut, step
+
+    def __getitem__(self, name):
+        return self.weapons[name]
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __len__(self):
+        return len(self.names)
+
+    def select(self, names):
+        # one weapon per name, as per-row arrays of band, spread and table
+        # row; KeyError for an unknown name
+        rows = np.fromiter((self.index[n] for n in names), dtype=np.intp, count=len(names))
+        min_d, max_d = self.band[rows].T
+        spread = (self.lut[rows, 0], self.lut[rows, -1])
+        return Weapon((min_d, max_d), spread, self.lut, rows, self.step[rows], object())
+
+    def save(self, path):
+        # one JSON line (names, bands, curves), then the raw lut and step;
+        # written under a temporary name, so a reader never sees half a file
+        head = json.dumps({'names': self.names, 'band': self.band.tolist(),
+                           'points': self.points.tolist(), 'offsets': self.offsets.tolist()})
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'wb') as f:
+            f.write(head.encode() + b'\n')
+            f.write(self.lut.astype('<f8').tobytes() + self.step.astype('<f8').tobytes())
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path, source=None):
+        # the tables are used straight from the file's bytes, not sampled again
+        with open(path, 'rb') as f:
+            head, _, body = f.read().partition(b'\n')
+        meta = json.loads(head)
+        n = len(meta['names'])
+        values = np.frombuffer(body, dtype='<f8')
+        if len(values) != n * (LUT_SIZE + 1):
+            raise ValueError(f"{path}: truncated or stale catalog cache")
+        return cls(meta['names'], meta['band'], meta['points'], meta['offsets'], source,
+                   values[:n * LUT_SIZE].reshape(n, LUT_SIZE), values[n * LUT_SIZE:])
+
+
+def compile_entries(entries, source='weapons'):
+    # {name: {"range": [...], "spread": [...], "base": name}} → Catalog
+    if not isinstance(entries, dict):
+        raise ValueError(f"{source}: expected an object of weapons")
+    if not entries:
+        raise ValueError(f"{source}: no weapons")
+    resolved = {}
+
+    def resolve(name, seen=()):
+        if name in resolved:
+            return resolved[name]
+        entry = entries.get(name)
+        if not isinstance(entry, dict):
+            raise ValueError(f"{source}: {name!r} is not a weapon entry")
+        if 'base' in entry:
+            if entry['base'] in seen:
+                raise ValueError(f"{source}: {name!r}: circular base")
+            entry = dict(resolve(entry['base'], seen + (name,)), **entry)
+            del entry['base']
+        resolved[name] = entry
+        return entry
+
+    band, points, offsets = [], [], [0]
+    for name in entries:
+        entry = resolve(name)
+        try:
+            (min_d, max_d) = map(float, entry['range'])
+            spread = entry['spread']
+            if all(isinstance(p, (list, tuple)) for p in spread):
+                curve = sorted((float(d), float(r)) for d, r in spread)
+            else:
+                min_r, max_r = map(float, spread)
+                curve = [(min_d, min_r), (max_d, max_r)]
+        except (KeyError, TypeError, ValueError) as e:
+            raise ValueError(f"{source}: {name!r}: needs \"range\": [min, max] and "
+                             f"\"spread\": [min, max] or [[distance, radius], ...] ({e})")
+        if not 0 <= min_d <= max_d or not curve or min(r for _, r in curve) < 0:
+            raise ValueError(f"{source}: {name!r}: bad range or spread")
+        band.append((min_d, max_d))
+        points.extend(curve)
+        offsets.append(len(points))
+    return Catalog(list(entries), band, points, offsets, source)
+
+
+def builtin():
+    return compile_entries({name: {'range': r, 'spread': s}
+                            for name, (r, s) in ARTILLERY_RANGES.items()}, 'built-in')
+
+
+def find_catalog():
+    # first weapons.json next to the executable (frozen builds) or this module
+    dirs = [os.path.dirname(os.path.abspath(__file__))]
+    if getattr(sys, 'frozen', False):
+        dirs.insert(0, os.path.dirname(sys.executable))
+    for d in dirs:
+        path = os.path.join(d, FILENAME)
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def cache_dir():
+    base = (os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_CACHE_HOME')
+            or os.path.join(os.path.expanduser('~'), '.cache'))
+    return os.path.join(base, 'foxhole-artillery')
+
+
+def load_catalog(path=None, cache=True):
+    # Catalog from `path` (default: find_catalog(), else the built-in table).
+    # Raises OSError or ValueError for a missing, malformed or empty file
+    path = path or find_catalog()
+    if path is None:
+        return builtin()
+    with open(path, 'rb') as f:
+        data = f.read()
+    digest = hashlib.sha256(data + f'|{FORMAT}|{LUT_SIZE}'.encode()).hexdigest()
+    cached = os.path.join(cache_dir(), f'weapons-{digest[:32]}.bin')
+    if cache and os.path.isfile(cached):
+        try:
+            catalog = Catalog.load(cached, path)
+        except (OSError, ValueError, KeyError, TypeError):
+            pass  # unreadable or stale: compile again and overwrite it
+        else:
+            catalog.digest = hashlib.sha256(data).hexdigest()
+            return catalog
+    try:
+        doc = json.loads(data)
+    except ValueError as e:
+        raise ValueError(f"{path}: {e}")
+    if isinstance(doc, dict) and doc.get('version', VERSION) != VERSION:
+        raise ValueError(f"{path}: version {doc['version']!r} is not supported "
+                         f"(expected {VERSION})")
+    catalog = compile_entries(doc.get('weapons') if isinstance(doc, dict) else None, path)
+    catalog.digest = hashlib.sha256(data).hexdigest()
+    if cache:
+        try:
+            os.makedirs(cache_dir(), exist_ok=True)
+            catalog.save(cached)
+        except OSError:
+            pass  # a read-only cache only costs the next launch a compile
+    return catalog
@@ -0,0 +1,238 @@
+"""Command-line entry points that run without the GUI.
+
+    python app.py solve --weapon "Rocket Battery" < missions.jsonl
+    python app.py replay session.jsonl --check
+    python app.py tiles deadlands.png maps/deadlands --mpp 1.5
+
+Records are spotter-relative, one per JSONL line or CSV row:
+target_distance, target_azimuth and optionally team_distance, team_azimuth
+(default: fire from the spotter), dx_corr, dy_corr, weapon and id. Records
+are read in chunks and solved with one vectorized call per chunk, so memory
+use stays constant however long the input is.
+"""
+import argparse
+import csv
+import io
+import itertools
+import json
+import math
+import sys
+
+import numpy as np
+
+from catalog import load_catalog
+from solver import polar_to_xy, solve_pairs
+
+NUMERIC_FIELDS = ('target_distance', 'target_azimuth', 'team_distance', 'team_azimuth',
+                  'dx_corr', 'dy_corr')
+REQUIRED_FIELDS = ('target_distance', 'target_azimuth')
+OUTPUT_FIELDS = ('distance', 'azimuth', 'in_range', 'spread')
+BOM = b'\xef\xbb\xbf'
+
+
+def positive_int(text):
+    # argparse type: an integer >= 1
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"expected an integer, got {text!r}") from None
+    if value < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {value}")
+    return value
+
+
+def read_records(stream, fmt):
+    # one dict per record; ValueError names the offending line
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        if reader.fieldnames is not None and not set(REQUIRED_FIELDS) <= set(reader.fieldnames):
+            raise ValueError(f"line 1: not JSONL, and not a CSV header with "
+                             f"{' and '.join(REQUIRED_FIELDS)}")
+        yield from reader
+        return
+    for n, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            rec = json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"line {n}: {e}") from None
+        if not isinstance(rec, dict):
+            raise ValueError(f"line {n}: expected a JSON object, got {type(rec).__name__}")
+        yield rec
+
+
+def sniff_format(stream):
+    # peek at the first non-blank character: '{' means JSONL, '[' a JSON
+    # array (unsupported), anything else CSV, checked against its header
+    head = stream.buffer.peek(64) if hasattr(stream, 'buffer') else b''
+    head = (head[len(BOM):] if head.startswith(BOM) else head).lstrip()[:1]
+    if head == b'[':
+        raise ValueError("a JSON array is not supported; write one object per line (JSONL)")
+    return 'jsonl' if head == b'{' else 'csv'
+
+
+def finite(value):
+    # JSON has no NaN or infinity
+    return round(value, 2) if math.isfinite(value) else None
+
+
+def solve_chunk(records, default_weapon, catalog):
+    # missing or blank fields count as 0
+    td, ta, md, ma, cx, cy = (
+        np.array([float(rec.get(key) or 0) for rec in records]) for key in NUMERIC_FIELDS
+    )
+    names = [rec.get('weapon') or default_weapon for rec in records]
+    target_xy = np.stack(polar_to_xy(td, ta), axis=-1)
+    team_xy = np.stack(polar_to_xy(md, ma), axis=-1)
+    return solve_pairs(team_xy, target_xy, catalog.select(names),
+                       np.stack((cx, cy), axis=-1))
+
+
+def write_chunk(writer, fmt, records, sol):
+    rows = zip(records, sol.distance.tolist(), sol.azimuth.tolist(),
+               sol.in_range.tolist(), sol.spread.tolist())
+    if fmt == 'csv':
+        writer.writerows(
+            [rec.get('id', ''), f'{d:.2f}', f'{a:.2f}', int(ok), f'{r:.2f}']
+            for rec, d, a, ok, r in rows
+        )
+    else:
+        writer.writelines(
+            json.dumps({'id': rec.get('id'), 'distance': finite(d), 'azimuth': finite(a),
+                        'in_range': bool(ok), 'spread': finite(r)}) + '\n'
+            for rec, d, a, ok, r in rows
+        )
+
+
+def cmd_solve(args):
+    try:
+        catalog = load_catalog(args.weapons)
+    except (OSError, ValueError) as e:
+        sys.exit(f"weapons: {e}")
+    # default: the catalog's first entry, so a weapons.json without a Mortar works
+    weapon = args.weapon or next(iter(catalog))
+    if weapon not in catalog:
+        sys.exit(f"unknown weapon {weapon!r}; choose from: {', '.join(catalog)}")
+    # utf-8-sig drops the byte order mark some spreadsheet exports start with
+    src = (open(args.input, encoding='utf-8-sig', newline='') if args.input
+           else io.TextIOWrapper(sys.stdin.buffer, encoding='utf-8-sig', newline=''))
+    dst = open(args.output, 'w', newline='') if args.output else sys.stdout
+    try:
+        fmt = args.format or sniff_format(src)
+    except ValueError as e:
+        sys.exit(f"input: {e}")
+    out_fmt = args.output_format or fmt
+    writer = csv.writer(dst) if out_fmt == 'csv' else dst
+
+    records = read_records(src, fmt)
+    done = 0
+    try:
+        while True:
+            try:
+                chunk = list(itertools.islice(records, args.chunk_size))
+            except (ValueError, csv.Error) as e:
+                sys.exit(f"input: {e}")
+            if out_fmt == 'csv' and done == 0:
+                # only once the input is known to parse
+                writer.writerow(('id',) + OUTPUT_FIELDS)
+            if not chunk:
+                break
+            try:
+                sol = solve_chunk(chunk, weapon, catalog)
+            except KeyError as e:
+                sys.exit(f"records {done + 1}-{done + len(chunk)}: unknown weapon {e}")
+            except ValueError as e:
+                sys.exit(f"records {done + 1}-{done + len(chunk)}: {e}")
+            write_chunk(writer, out_fmt, chunk, sol)
+            done += len(chunk)
+    finally:
+        if args.input:
+            src.close()
+        if args.output:
+            dst.close()
+    return 0
+
+
+def cmd_replay(args):
+    # imported here: replay builds a (headless) app, `solve` must stay light
+    import time
+    from session import Replay, read_log
+    try:
+        catalog = load_catalog(args.weapons)
+    except (OSError, ValueError) as e:
+        sys.exit(f"weapons: {e}")
+    replay = Replay(catalog, realtime=args.realtime, check=args.check, max_fps=args.max_fps,
+                    trace=bool(args.trace))
+    t0 = time.perf_counter()
+    try:
+        ok = replay.run(read_log(args.log))
+    except (OSError, ValueError, KeyError, IndexError) as e:
+        sys.exit(f"replay {args.log}: {e}")
+    replay.report(time.perf_counter() - t0)
+    if args.trace and replay.app:
+        replay.app.profiler.dump_trace(args.trace)
+    return 0 if ok else 1
+
+
+def cmd_tiles(args):
+    from tiles import build
+    try:
+        meta = build(args.image, args.out, args.mpp, tuple(args.origin), args.tile)
+    except ImportError:
+        sys.exit("tiles: reading the map image needs Pillow (pip install Pillow)")
+    except OSError as e:
+        sys.exit(f"tiles: {e}")
+    print(f"{len(meta['levels'])} levels, {args.tile} px tiles in {args.out}", file=sys.stderr)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='app.py', description='Foxhole artillery fire control')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('solve', help='compute firing solutions from CSV or JSONL records')
+    p.add_argument('input', nargs='?', help='input file (default: stdin)')
+    p.add_argument('-o', '--output', help='output file (default: stdout)')
+    p.add_argument('--weapon', help='weapon for records without a weapon field '
+                                    "(default: the catalog's first)")
+    p.add_argument('--weapons', metavar='PATH',
+                   help='weapon data file (default: weapons.json next to the app)')
+    p.add_argument('--format', choices=('csv', 'jsonl'), help='input format (default: sniffed)')
+    p.add_argument('--output-format', choices=('csv', 'jsonl'),
+                   help='output format (default: same as input)')
+    p.add_argument('--chunk-size', type=positive_int, default=65536, help='records solved per batch')
+    p.set_defaults(func=cmd_solve)
+
+    p = sub.add_parser('replay', help='replay a recorded session headless (see --record)')
+    p.add_argument('log', help='session log written with --record')
+    p.add_argument('--realtime', action='store_true',
+                   help='keep the recorded timing (default: as fast as possible)')
+    p.add_argument('--check', action='store_true',
+                   help='verify the firing solutions against the log; exit 1 on mismatch')
+    p.add_argument('--max-fps', type=float, default=0,
+                   help='redraw rate cap during replay (default: uncapped)')
+    p.add_argument('--trace', metavar='PATH', help='write a JSON trace of every frame phase')
+    p.add_argument('--weapons', metavar='PATH',
+                   help='weapon data file the session was recorded with '
+                        '(default: weapons.json next to the app)')
+    p.set_defaults(func=cmd_replay)
+
+    p = sub.add_parser('tiles', help='slice a map image into a tile pyramid for --map')
+    p.add_argument('image', help='region map image (PNG, JPEG, ...)')
+    p.add_argument('out', help='output directory')
+    p.add_argument('--mpp', type=float, required=True, help='metres per pixel of the image')
+    p.add_argument('--origin', type=float, nargs=2, default=(0.0, 0.0), metavar=('X', 'Y'),
+                   help="map position of the image's top-left corner, in metres")
+    p.add_argument('--tile', type=int, default=256, help='tile size in pixels')
+    p.set_defaults(func=cmd_tiles)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
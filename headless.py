@@ -0,0 +1,192 @@
+"""Run FoxholeArtilleryApp without a display, for benchmarks and replays.
+
+Tk variables stay real (they live in a plain Tcl interpreter, no Tk), while
+widgets become inert stand-ins and the map renders through the Agg canvas,
+or, with renderer='tk', onto a canvas stand-in that keeps its items.
+`after`/`after_idle` callbacks are queued and run by HeadlessRoot.pump(), so
+the redraw scheduler and motion coalescing behave as in the real app.
+If a display is available (e.g. a virtual Xvfb one), real=True builds the
+app on a real, withdrawn Tk root instead.
+"""
+import os
+import time
+import tkinter
+from types import SimpleNamespace
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+
+class Widget:
+    # accepts any constructor arguments and any method call
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+        return Widget()
+
+    def __call__(self, *args, **kwargs):
+        return Widget()
+
+
+class HeadlessCanvas(FigureCanvasAgg):
+    # FigureCanvasTkAgg stand-in: same drawing path minus the Tk photo copy
+    def __init__(self, figure, master=None):
+        super().__init__(figure)
+        self.blits = 0
+
+    def get_tk_widget(self):
+        return Widget()
+
+    def blit(self, bbox=None):
+        self.blits += 1
+
+    def draw_idle(self, *args, **kwargs):
+        self.draw()
+
+
+class HeadlessTkCanvas(Widget):
+    # tk.Canvas stand-in for the native renderer: items keep their coordinates
+    # and options, so element logic runs for real, but nothing is painted
+    def __init__(self, master=None, width=800, height=800, **kwargs):
+        self.items = {}
+        self.serial = 0
+
+    def create(self, kind, *coords, **options):
+        self.serial += 1
+        tags = options.pop('tags', ())
+        self.items[self.serial] = {'kind': kind, 'coords': [float(c) for c in coords],
+                                   'options': options,
+                                   'tags': {tags} if isinstance(tags, str) else set(tags)}
+        return self.serial
+
+    def __getattr__(self, name):
+        if name.startswith('create_'):
+            return lambda *coords, **options: self.create(name[7:], *coords, **options)
+        return super().__getattr__(name)
+
+    def find(self, tag):
+        if isinstance(tag, int):
+            return [tag] if tag in self.items else []
+        return [i for i, item in self.items.items() if tag == 'all' or tag in item['tags']]
+
+    def coords(self, item, *coords):
+        if coords:
+            self.items[item]['coords'] = [float(c) for c in coords]
+        return self.items[item]['coords']
+
+    def itemconfig(self, item, **options):
+        self.items[item]['options'].update(options)
+
+    def delete(self, tag):
+        for i in self.find(tag):
+            del self.items[i]
+
+    def scale(self, tag, x0, y0, kx, ky):
+        for i in self.find(tag):
+            c = self.items[i]['coords']
+            c[0::2] = [x0 + (x - x0) * kx for x in c[0::2]]
+            c[1::2] = [y0 + (y - y0) * ky for y in c[1::2]]
+
+    def move(self, tag, dx, dy):
+        for i in self.find(tag):
+            c = self.items[i]['coords']
+            c[0::2] = [x + dx for x in c[0::2]]
+            c[1::2] = [y + dy for y in c[1::2]]
+
+    def bbox(self, item):
+        x, y = self.items[item]['coords'][:2]
+        return x, y, x + 100, y + 60
+
+    def winfo_rgb(self, color):
+        return (65535, 65535, 65535)
+
+    def photo(self, rgba):
+        return SimpleNamespace(width=rgba.shape[1], height=rgba.shape[0])
+
+
+class HeadlessRoot(Widget):
+    def __init__(self):
+        self.tk = tkinter._default_root.tk
+        self.queue = []
+        self.seq = 0
+
+    def after(self, ms, func=None, *args):
+        self.seq += 1
+        self.queue.append((time.perf_counter() + ms / 1000.0, self.seq, func, args))
+        return f'after#{self.seq}'
+
+    def after_idle(self, func, *args):
+        return self.after(0, func, *args)
+
+    def after_cancel(self, after_id):
+        seq = int(after_id.split('#')[1])
+        self.queue = [job for job in self.queue if job[1] != seq]
+
+    def pump(self, wait=False):
+        # run due callbacks (all of them when wait=True, sleeping until each is due)
+        while self.queue:
+            self.queue.sort()
+            due, _, func, args = self.queue[0]
+            delay = due - time.perf_counter()
+            if delay > 0:
+                if not wait:
+                    return
+                time.sleep(delay)
+            self.queue.pop(0)
+            if func is not None:
+                func(*args)
+
+    def mainloop(self):
+        self.pump(wait=True)
+
+
+def install(app_module):
+    # point the app module's tk/ttk globals at the headless stand-ins
+    if tkinter._default_root is None:
+        tkinter._default_root = tkinter.Tcl()
+    app_module.tk = SimpleNamespace(
+        DoubleVar=tkinter.DoubleVar, StringVar=tkinter.StringVar,
+        BooleanVar=tkinter.BooleanVar, IntVar=tkinter.IntVar,
+        TclError=tkinter.TclError, BOTH=tkinter.BOTH,
+        Canvas=Widget, Checkbutton=Widget, Frame=Widget, Label=Widget,
+        Button=Widget, Toplevel=Widget,
+    )
+    app_module.ttk = SimpleNamespace(
+        Style=Widget, Notebook=Widget, Frame=Widget, Label=Widget, Entry=Widget,
+        Button=Widget, Combobox=Widget, Scrollbar=Widget, LabelFrame=Widget,
+        Separator=Widget, Checkbutton=Widget,
+    )
+
+
+def make_app(real=None, **kwargs):
+    # returns (app, root); the first frame has already been rendered
+    import app as app_module
+    if real is None:
+        real = bool(os.environ.get('DISPLAY'))
+    if real:
+        root = tkinter.Tk()
+        root.withdraw()
+        root.pump = lambda wait=False: root.update()
+    else:
+        install(app_module)
+        root = HeadlessRoot()
+        tk_canvas = kwargs.get('renderer') == 'tk'
+        kwargs.setdefault('canvas_class', HeadlessTkCanvas if tk_canvas else HeadlessCanvas)
+    app = app_module.FoxholeArtilleryApp(root, **kwargs)
+    app.redraw.flush()
+    app.worker.wait()
+    root.pump()
+    return app, root
+
+
+class MouseEvent:
+    # the fields of a matplotlib MouseEvent that the app reads, at map
+    # position (xdata, ydata) of the app's renderer
+    def __init__(self, renderer, xdata, ydata, button=1, inaxes=True):
+        self.inaxes = renderer if inaxes else None
+        self.xdata = xdata
+        self.ydata = ydata
+        self.button = button
+        self.x, self.y = renderer.to_px(xdata, ydata)
@@ -0,0 +1,148 @@
+"""Monte Carlo hit probability for each team's current solution.
+
+A shell lands uniformly within the weapon's spread radius at the firing
+distance (the same curve as the rings on the map), around the corrected aim
+point. The correction is estimated from the impacts so far, so it carries
+an uncertainty: when given, aim_cov adds a Gaussian aim error with that
+covariance (ImpactStatistics.mean_cov). P(hit) is the fraction of shells
+landing within the target radius; the expected shells to kill is hits / P(hit).
+
+One set of unit samples is drawn up front and rescaled for every query, and
+results are cached per distance bucket, so steady-state frames cost nothing.
+Without aim error a query is a binary search in the samples' sorted radii.
+With it, each sample hits for one interval of spreads; the intervals are
+sorted once per aim error, after which every team's query is again a binary
+search. The aim error enters the keys coarsely, as its standard deviations
+rounded to aim_step metres, since every impact changes the covariance
+slightly: most clicks then reuse every cached value, and once the
+correction is well known the error rounds to zero.
+"""
+from collections import OrderedDict
+
+import numpy as np
+
+from solver import spread_radius
+
+
+class HitProbability:
+    def __init__(self, samples=1 << 20, bucket=0.5, seed=0, cache_size=4096, aim_step=0.25,
+                 aim_cache_size=4):
+        rng = np.random.default_rng(seed)
+        # uniform in the unit disk, and standard normal aim errors, as float32
+        radius = np.sqrt(rng.random(samples, dtype=np.float32))
+        theta = rng.random(samples, dtype=np.float32) * np.float32(2 * np.pi)
+        self.ux, self.uy = radius * np.cos(theta), radius * np.sin(theta)
+        self.zx, self.zy = rng.standard_normal((2, samples), dtype=np.float32)
+        self.sorted_r2 = None
+        self.bucket = bucket
+        self.aim_step = aim_step
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        # (target radius, aim error) -> sorted hit intervals, 8 MB each
+        self.intervals = OrderedDict()
+        self.aim_cache_size = aim_cache_size
+        self.hits = self.misses = 0
+
+    def probability(self, spread, target_radius, aim_cov=None):
+        # fraction of shells within target_radius of the target
+        if aim_cov is None or not np.any(aim_cov):
+            if spread <= 0:
+                return 1.0
+            # no aim error: a hit is |u| <= R/spread, counted by binary search
+            # in the sorted squared radii of the same samples
+            if self.sorted_r2 is None:
+                self.sorted_r2 = np.sort(self.ux * self.ux + self.uy * self.uy)
+            n = np.searchsorted(self.sorted_r2, np.float32((target_radius / spread) ** 2),
+                                side='right')
+            return n / len(self.sorted_r2)
+        lo, hi = self.hit_intervals(target_radius, aim_cov)
+        s = np.float32(max(spread, 0.0))
+        # samples whose interval holds s: started at or before it, not ended before it
+        n = np.searchsorted(lo, s, side='right') - np.searchsorted(hi, s, side='left')
+        return n / len(lo)
+
+    def hit_intervals(self, target_radius, aim_cov):
+        # sample i lands at s·u_i + e_i for spread s and aim error e_i = A·z_i;
+        # |s·u_i + e_i| <= R is a quadratic in s, so it hits for one interval
+        # of spreads. The intervals' ends, sorted, answer P(hit) at any
+        # spread with two binary searches, however many teams ask
+        key = (target_radius, aim_cov.tobytes())
+        cached = self.intervals.get(key)
+        if cached is not None:
+            self.intervals.move_to_end(key)
+            return cached
+        # A·Aᵀ = aim_cov; eigh rather than Cholesky since few impacts give a
+        # singular covariance
+        evals, evecs = np.linalg.eigh(aim_cov)
+        (a, b), (c, d) = (evecs * np.sqrt(np.clip(evals, 0.0, None))).astype(np.float32)
+        ex = a * self.zx + b * self.zy
+        ey = c * self.zx + d * self.zy
+        # |u|²s² + 2(u·e)s + |e|² - R² <= 0, with half the linear term
+        qa = self.ux * self.ux + self.uy * self.uy
+        qb = self.ux * ex
+        qb += self.uy * ey
+        qc = ex * ex
+        qc += ey * ey
+        qc -= np.float32(target_radius ** 2)
+        root = qb * qb
+        root -= qa * qc
+        never = root < 0
+        np.sqrt(np.maximum(root, 0, out=root), out=root)
+        hi = (root - qb) / qa
+        lo = np.maximum((-qb - root) / qa, 0, dtype=np.float32)
+        # no real root, or only negative spreads: an empty interval
+        never |= hi < 0
+        lo[never] = hi[never] = np.inf
+        lo.sort()
+        hi.sort()
+        self.intervals[key] = lo, hi
+        if len(self.intervals) > self.aim_cache_size:
+            self.intervals.popitem(last=False)
+        return lo, hi
+
+    def estimate(self, distances, weapon, target_radius, aim_cov=None, in_range=None):
+        # P(hit) for every distance (0 where out of range) with shots centred
+        # on the target, cached per distance bucket with the other inputs
+        # rounded into the key; computed from the rounded inputs too, so a
+        # cached value is exact for its key
+        target_radius = round(target_radius, 2)
+        aim_cov, cov_key = self.quantize_cov(aim_cov)
+        common = (weapon, target_radius, cov_key)
+        out = np.zeros(len(distances))
+        for i, d in enumerate(np.asarray(distances, dtype=float).tolist()):
+            if in_range is not None and not in_range[i]:
+                continue
+            b = int(round(d / self.bucket))
+            key = (b,) + common
+            p = self.cache.get(key)
+            if p is None:
+                self.misses += 1
+                p = self.cache[key] = self.probability(
+                    float(spread_radius(b * self.bucket, weapon)), target_radius, aim_cov=aim_cov)
+                if len(self.cache) > self.cache_size:
+                    self.cache.popitem(last=False)
+            else:
+                self.hits += 1
+                self.cache.move_to_end(key)
+            out[i] = p
+        return out
+
+    def quantize_cov(self, aim_cov):
+        # (covariance, key) from the standard deviations rounded to aim_step;
+        # (None, None) when the aim error rounds to nothing. Shells spread
+        # evenly in every direction around a centred target, so the error's
+        # orientation does not change P(hit) and is left out
+        if aim_cov is None:
+            return None, None
+        evals = np.linalg.eigvalsh(aim_cov)
+        sd = np.round(np.sqrt(np.clip(evals, 0.0, None)) / self.aim_step).astype(int)
+        if not sd.any():
+            return None, None
+        return np.diag((sd * self.aim_step) ** 2), tuple(sd.tolist())
+
+
+def shells_to_kill(p, hits=1):
+    # expected shells for `hits` hits (negative binomial mean); inf if p is 0
+    p = np.asarray(p, dtype=float)
+    with np.errstate(divide='ignore'):
+        return np.where(p > 0, hits / np.where(p > 0, p, 1.0), np.inf)
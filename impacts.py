@@ -0,0 +1,150 @@
+"""Recorded shell impacts, stored in a growable NumPy array.
+
+With a history length the store becomes a bounded ring buffer that keeps only
+the most recent impacts. Shot numbers keep counting up either way, so labels
+stay stable as old impacts drop out.
+"""
+from collections import deque
+
+import numpy as np
+
+from tables import Versioned
+
+
+class ImpactStore(Versioned):
+    def __init__(self, history=None, capacity=64):
+        super().__init__()
+        self.history = history
+        self._xy = np.empty((history or capacity, 2))
+        self._start = 0
+        self._len = 0
+        self.total = 0
+        # bumped by clear(), when shot numbers start over
+        self.generation = 0
+
+    def __len__(self):
+        return self._len
+
+    def __bool__(self):
+        return self._len > 0
+
+    def append(self, x, y):
+        cap = len(self._xy)
+        if self.history and self._len == self.history:
+            # full ring: overwrite the oldest entry
+            self._xy[self._start] = x, y
+            self._start = (self._start + 1) % cap
+        else:
+            if self._len == cap:
+                self._xy = np.concatenate((self._xy, np.empty_like(self._xy)))
+                cap *= 2
+            self._xy[(self._start + self._len) % cap] = x, y
+            self._len += 1
+        self.total += 1
+        self.version += 1
+
+    def clear(self):
+        self._start = self._len = self.total = 0
+        self.version += 1
+        self.generation += 1
+
+    @property
+    def xy(self):
+        # (n, 2) in chronological order; a view unless the ring has wrapped
+        end = self._start + self._len
+        if end <= len(self._xy):
+            return self._xy[self._start:end]
+        return np.concatenate((self._xy[self._start:], self._xy[:end - len(self._xy)]))
+
+    def recent(self, n):
+        # the last n impacts and their 1-based shot numbers
+        n = min(n, self._len)
+        xy = self.xy[self._len - n:]
+        return xy, np.arange(self.total - n + 1, self.total + 1)
+
+
+class ImpactStatistics:
+    # streaming mean point of impact and 2x2 covariance (Welford), O(1) per
+    # impact; optionally over a sliding window or with exponential decay
+    def __init__(self, window=None, decay=None):
+        if window and decay:
+            raise ValueError('use either a sliding window or a decay factor, not both')
+        self.window = window
+        self.decay = decay
+        self.samples = deque()
+        self.reset()
+
+    def reset(self):
+        self.n = 0
+        # sum of the sample weights, and of their squares
+        self.weight = 0.0
+        self.weight2 = 0.0
+        self.mean = np.zeros(2)
+        self.m2 = np.zeros((2, 2))
+        self.samples.clear()
+
+    def add(self, x, y):
+        p = np.array((x, y), dtype=float)
+        if self.window:
+            if len(self.samples) == self.window:
+                self.remove_sample(self.samples.popleft())
+            self.samples.append(p)
+        if self.decay:
+            self.weight *= self.decay
+            self.weight2 *= self.decay * self.decay
+            self.m2 *= self.decay
+        self.n += 1
+        self.weight += 1.0
+        self.weight2 += 1.0
+        d = p - self.mean
+        self.mean += d / self.weight
+        self.m2 += np.outer(d, p - self.mean)
+
+    def remove_sample(self, p):
+        # inverse Welford step for the sample leaving the window
+        self.n -= 1
+        self.weight2 -= 1.0
+        if self.weight <= 1.0:
+            self.weight = self.weight2 = 0.0
+            self.mean[:] = 0.0
+            self.m2[:] = 0.0
+            return
+        prev = (self.weight * self.mean - p) / (self.weight - 1.0)
+        self.m2 -= np.outer(p - prev, p - self.mean)
+        self.mean = prev
+        self.weight -= 1.0
+
+    @property
+    def cov(self):
+        # unbiased for weighted samples; W - 1 (i.e. n - 1) without decay
+        dof = self.weight - self.weight2 / self.weight if self.weight else 0.0
+        if dof <= 1e-9:
+            return np.zeros((2, 2))
+        return self.m2 / dof
+
+    @property
+    def mean_cov(self):
+        # covariance of the mean itself: cov / n for equal weights. With
+        # decay the older samples count for less, so it is cov over the
+        # effective sample count W² / Σw², which is smaller than n
+        if not self.weight:
+            return np.zeros((2, 2))
+        return self.cov * (self.weight2 / (self.weight * self.weight))
+
+    def axes(self):
+        # principal standard deviations (major, minor) and major-axis angle in degrees
+        evals, evecs = np.linalg.eigh(self.cov)
+        s_minor, s_major = np.sqrt(np.clip(evals, 0.0, None))
+        angle = np.degrees(np.arctan2(evecs[1, 1], evecs[0, 1]))
+        return s_major, s_minor, angle
+
+    def cep(self):
+        # circular error probable (R50), the usual 0.5887·(σ1 + σ2) approximation
+        s_major, s_minor, _ = self.axes()
+        return 0.5887 * (s_major + s_minor)
+
+    def ellipse(self, p=0.5):
+        # full width, height and angle of the ellipse holding fraction p of shots
+        k = np.sqrt(-2.0 * np.log(1.0 - p))
+        s_major, s_minor, angle = self.axes()
+        return 2 * k * s_major, 2 * k * s_minor, angle
@@ -0,0 +1,188 @@
+"""Fire mission queue and team-to-target assignment.
+
+Every target in the queue goes to one team. The cost of a pair is its
+range stress, ((d - mid) / half_band)², 0 at the middle of the weapon's band
+and 1 at either end; pairs out of range cannot be used. Each team offers a
+number of slots, and its n-th target costs an extra n·balance, which
+spreads the load.
+
+The assignment is a min-cost perfect matching on a square matrix: targets
+plus zero-cost dummy rows against team slots, solved with the Hungarian
+method (shortest augmenting paths, one vectorized column scan per step).
+Its dual potentials are kept. When a target or a team changes, only that
+row or those columns are recomputed and re-augmented, instead of solving
+again from scratch.
+"""
+import math
+
+import numpy as np
+
+from solver import solve
+from tables import PolarTable
+
+# cost of an out-of-range pair; an assignment at or above this is no assignment
+INFEASIBLE = 1e6
+
+
+class TargetQueue(PolarTable):
+    # queued targets, spotter-relative like TeamTable
+    pass
+
+
+class Assignment:
+    def __init__(self, balance=0.1):
+        self.balance = balance
+        self.slots = 0
+        self.shape = None
+        self.cost = None
+        self.team_xy = self.target_xy = None
+        self.team_on = self.target_on = None
+        self.band = None
+        self.full_solves = self.augmentations = 0
+
+    def stress(self, team_xy, team_on, target_xy, target_on, weapon):
+        # (targets, teams) range stress, INFEASIBLE where out of range
+        (min_d, max_d), _ = weapon
+        sol = solve(team_xy, target_xy, weapon)
+        mid, half = (min_d + max_d) / 2, max((max_d - min_d) / 2, 1e-9)
+        stress = np.where(sol.in_range, ((sol.distance - mid) / half) ** 2, INFEASIBLE).T
+        stress[:, ~team_on] = INFEASIBLE
+        stress[~target_on] = 0.0
+        return stress
+
+    def columns(self, stress):
+        # expand (rows, teams) to (rows, teams·slots): slot n of a team costs n·balance more
+        stress = stress[:, :, None]
+        penalty = self.balance * np.arange(self.slots)
+        return (stress + np.where(stress >= INFEASIBLE, 0.0, penalty)).reshape(len(stress), -1)
+
+    def update(self, team_xy, team_on, target_xy, target_on, weapon):
+        # returns (team index or -1 per target, stress of that pair)
+        n_teams, n_targets = len(team_xy), len(target_xy)
+        if not n_teams or not n_targets:
+            return np.full(n_targets, -1), np.zeros(n_targets)
+        # one slot more than an even share, so range limits leave some slack;
+        # grown by doubling as targets are added, to keep full solves rare
+        needed = math.ceil(n_targets / n_teams) + 1
+        if self.shape is None or n_teams != self.shape[0] or weapon[0] != self.band:
+            self.slots = needed
+            self.solve_full(team_xy, team_on, target_xy, target_on, weapon)
+        elif needed > self.slots:
+            self.slots = max(needed, 2 * self.slots)
+            self.solve_full(team_xy, team_on, target_xy, target_on, weapon)
+        else:
+            self.solve_changes(team_xy, team_on, target_xy, target_on, weapon)
+        return self.result(n_targets)
+
+    def pad_targets(self, target_xy, target_on, size):
+        # dummy rows (inactive, zero cost) up to the matrix size
+        xy = np.zeros((size, 2))
+        on = np.zeros(size, dtype=bool)
+        xy[:len(target_xy)], on[:len(target_on)] = target_xy, target_on
+        return xy, on
+
+    def solve_full(self, team_xy, team_on, target_xy, target_on, weapon):
+        self.full_solves += 1
+        n_cols = len(team_xy) * self.slots
+        self.shape = (len(team_xy), n_cols)
+        self.band = weapon[0]
+        self.target_xy, self.target_on = self.pad_targets(target_xy, target_on, n_cols)
+        self.team_xy, self.team_on = team_xy.copy(), team_on.copy()
+        self.cost = self.columns(self.stress(team_xy, team_on, self.target_xy,
+                                             self.target_on, weapon))
+        # column reduction start: v = column minima, every row free
+        self.u = np.zeros(n_cols)
+        self.v = self.cost.min(axis=0)
+        self.row_of = np.full(n_cols, -1)
+        self.col_of = np.full(n_cols, -1)
+        for i in range(n_cols):
+            self.augment(i)
+
+    def solve_changes(self, team_xy, team_on, target_xy, target_on, weapon):
+        n_cols = self.shape[1]
+        new_xy, new_on = self.pad_targets(target_xy, target_on, n_cols)
+        rows = np.flatnonzero(np.any(new_xy != self.target_xy, axis=1) | (new_on != self.target_on))
+        teams = np.flatnonzero(np.any(team_xy != self.team_xy, axis=1) | (team_on != self.team_on))
+        self.target_xy, self.target_on = new_xy, new_on
+        self.team_xy, self.team_on = team_xy.copy(), team_on.copy()
+        if not len(rows) and not len(teams):
+            return
+        freed = set()
+        if len(rows):
+            # new costs for the changed targets; u from the new row keeps
+            # the duals feasible, then the rows are matched again
+            self.cost[rows] = self.columns(self.stress(
+                team_xy, team_on, new_xy[rows], new_on[rows], weapon))
+            self.u[rows] = (self.cost[rows] - self.v).min(axis=1)
+            for i in rows:
+                self.unassign(i)
+                freed.add(int(i))
+        if len(teams):
+            # likewise for every slot column of the changed teams
+            cols = (teams[:, None] * self.slots + np.arange(self.slots)).ravel()
+            stress = self.stress(team_xy[teams], team_on[teams], new_xy, new_on, weapon)
+            self.cost[:, cols] = self.columns(stress)
+            self.v[cols] = (self.cost[:, cols] - self.u[:, None]).min(axis=0)
+            for j in cols:
+                i = self.row_of[j]
+                if i >= 0:
+                    self.unassign(i)
+                    freed.add(int(i))
+        for i in sorted(freed):
+            self.augment(i)
+
+    def unassign(self, i):
+        j = self.col_of[i]
+        if j >= 0:
+            self.row_of[j] = -1
+            self.col_of[i] = -1
+
+    def augment(self, start):
+        # shortest augmenting path from free row `start` (Dijkstra over reduced
+        # costs, each step scanning all columns at once); potentials are
+        # updated once at the end, and ties go to a free column, which ends
+        # the search early
+        self.augmentations += 1
+        cost, u, v, row_of, col_of = self.cost, self.u, self.v, self.row_of, self.col_of
+        n = len(v)
+        shortest = np.full(n, np.inf)
+        path = np.full(n, -1)
+        remaining = np.ones(n, dtype=bool)
+        rows = [start]
+        i, min_val = start, 0.0
+        while True:
+            reduced = min_val + cost[i] - u[i] - v
+            better = remaining & (reduced < shortest)
+            path[better] = i
+            shortest[better] = reduced[better]
+            candidates = np.where(remaining, shortest, np.inf)
+            min_val = candidates.min()
+            ties = np.flatnonzero(candidates == min_val)
+            free = ties[row_of[ties] < 0]
+            j = int(free[0] if len(free) else ties[0])
+            remaining[j] = False
+            if row_of[j] < 0:
+                break
+            i = row_of[j]
+            rows.append(i)
+        u[start] += min_val
+        if len(rows) > 1:
+            others = np.array(rows[1:])
+            u[others] += min_val - shortest[col_of[others]]
+        scanned = ~remaining
+        v[scanned] -= min_val - shortest[scanned]
+        # flip the path
+        while True:
+            i = path[j]
+            row_of[j] = i
+            col_of[i], j = j, col_of[i]
+            if i == start:
+                break
+
+    def result(self, n_targets):
+        cols = self.col_of[:n_targets]
+        cost = self.cost[np.arange(n_targets), cols]
+        team = np.where(cost < INFEASIBLE, cols // self.slots, -1)
+        stress = cost - self.balance * (cols % self.slots)
+        team[~self.target_on[:n_targets]] = -1
+        return team, np.where(team >= 0, stress, 0.0)
@@ -0,0 +1,63 @@
+"""LAN sync wire format: messages, state deltas and merging (see netsync.py).
+
+Wire format, one JSON object per line:
+    {"p": 1, "v": 7, "s": {...}}       snapshot (server → client)
+    {"v": 8, "d": {...}}               delta (server → client)
+    {"e": "click", "x": 1.5, "y": 2}   input (client → server), as in session logs
+    {"e": "resync"}                    client lost track, wants a snapshot
+"""
+import json
+
+PROTOCOL = 1
+PORT = 47419
+# client inputs the host accepts
+INPUTS = ('target', 'click', 'weapon', 'reset_impacts', 'total_reset')
+
+
+def encode(msg):
+    return (json.dumps(msg, separators=(',', ':')) + '\n').encode()
+
+
+def diff(old, new):
+    # keys of `new` that differ from `old`; 'teams' is diffed per team, with
+    # None marking a team that is gone
+    delta = {}
+    for key, value in new.items():
+        prev = old.get(key)
+        if value == prev:
+            continue
+        if key == 'teams' and prev is not None:
+            teams = {name: v for name, v in value.items() if prev.get(name) != v}
+            teams.update((name, None) for name in prev if name not in value)
+            delta[key] = teams
+        else:
+            delta[key] = value
+    return delta
+
+
+def merge(state, delta):
+    # apply a delta (or a snapshot) to a state in place
+    for key, value in delta.items():
+        if key == 'teams':
+            teams = state.setdefault('teams', {})
+            for name, v in value.items():
+                if v is None:
+                    teams.pop(name, None)
+                else:
+                    teams[name] = v
+        elif key == 'impacts':
+            old = state.get('impacts')
+            if (old and value['g'] == old['g']
+                    and value['from'] == old['from'] + len(old['xy'])):
+                old['xy'] = old['xy'] + value['xy']
+            else:
+                # new generation (impacts were cleared) or a snapshot
+                old = state['impacts'] = dict(value, xy=list(value['xy']))
+            keep = value.get('keep')
+            if keep and len(old['xy']) > keep:
+                # the host keeps a ring of its last `keep` impacts
+                old['from'] += len(old['xy']) - keep
+                old['xy'] = old['xy'][-keep:]
+        else:
+            state[key] = value
+    return state
@@ -0,0 +1,301 @@
+"""LAN session sync: one app serves its session, others follow it.
+
+    python app.py --serve                        # spotter / host
+    python app.py --connect 192.168.1.20 --team 2
+
+The host publishes its state once per rendered frame: target, weapon,
+correction, advice, impacts and every active team's firing solution. Only
+what changed since the last frame is sent, as one compact JSON line tagged
+with a state version. A client that joins late, or sees a version gap, gets
+a snapshot of the full state first. Clients forward their own target edits,
+impact clicks, weapon changes and resets to the host, which applies
+them like local input and broadcasts the outcome.
+
+Networking runs on an asyncio loop in a background thread. The Tk thread
+only computes the delta, hands it over with call_soon_threadsafe, and drains
+incoming messages from a queue it polls with root.after, so it never waits
+on a socket.
+
+The wire format and state merging live in netproto.py, which the app imports
+without pulling in asyncio.
+"""
+import asyncio
+import json
+import queue
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from netproto import INPUTS, PORT, PROTOCOL, diff, encode, merge
+
+# a client this far behind is dropped; it reconnects and gets a snapshot
+MAX_BUFFER = 1 << 20
+LINE_LIMIT = 1 << 24
+
+
+async def follow(reader, writer, handle):
+    # read a server's snapshot and deltas until it disconnects, calling
+    # handle(kind, version, payload) for each one that applies in order
+    version = None
+    while True:
+        line = await reader.readline()
+        if not line:
+            return
+        msg = json.loads(line)
+        if 's' in msg:
+            if msg.get('p') != PROTOCOL:
+                raise ConnectionError(f"protocol {msg.get('p')} != {PROTOCOL}")
+            version = msg['v']
+            handle('snapshot', version, msg['s'])
+        elif version is not None and msg['v'] == version + 1:
+            version += 1
+            handle('delta', version, msg['d'])
+        elif version is not None:
+            # missed an update: drop deltas until a fresh snapshot arrives
+            version = None
+            writer.write(encode({'e': 'resync'}))
+
+
+class LoopThread:
+    # a private asyncio loop on a daemon thread
+    def __init__(self):
+        self.loop = None
+        self.thread = None
+        self.error = None
+        # (kind, payload) for the Tk thread, drained by polling
+        self.inbox = queue.SimpleQueue()
+
+    def start(self):
+        ready = threading.Event()
+        self.thread = threading.Thread(target=self.run, args=(ready,), daemon=True)
+        self.thread.start()
+        ready.wait()
+        if isinstance(self.error, Exception):
+            raise self.error
+        return self
+
+    def run(self, ready):
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        try:
+            self.loop.run_until_complete(self.setup())
+        except (OSError, OverflowError) as e:
+            self.error = e
+        ready.set()
+        if self.error is None:
+            self.loop.run_forever()
+        self.loop.close()
+
+    async def setup(self):
+        pass
+
+    def call(self, func, *args):
+        # run func(*args) on the loop thread
+        self.loop.call_soon_threadsafe(func, *args)
+
+    def poll(self):
+        # everything received since the last poll, without blocking
+        items = []
+        while True:
+            try:
+                items.append(self.inbox.get_nowait())
+            except queue.Empty:
+                return items
+
+    def close(self):
+        # cancel everything on the loop, then stop it
+        if self.loop and self.loop.is_running():
+            try:
+                asyncio.run_coroutine_threadsafe(self.shutdown(), self.loop).result(timeout=2)
+            except FutureTimeout:
+                pass  # a builtin TimeoutError only from Python 3.11
+            self.call(self.loop.stop)
+            self.thread.join(timeout=1)
+
+    async def shutdown(self):
+        tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+
+class SyncServer(LoopThread):
+    def __init__(self, host='0.0.0.0', port=PORT):
+        super().__init__()
+        self.host, self.port = host, port
+        # Tk thread: the last published state and impacts, and the version
+        self.published = {}
+        self.impacts_sent = (None, 0)
+        self.version = 0
+        # loop thread: the state at mirror_version, for snapshots
+        self.mirror = {}
+        self.mirror_version = 0
+        self.clients = set()
+        self.handlers = set()
+        self.sent_bytes = 0
+
+    async def setup(self):
+        self.server = await asyncio.start_server(self.serve, self.host, self.port,
+                                                 limit=LINE_LIMIT)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def shutdown(self):
+        # closed connections end their handlers at EOF; cancelling them
+        # instead trips asyncio's start_server callback
+        self.server.close()
+        for writer in list(self.clients):
+            writer.close()
+        await asyncio.gather(*self.handlers, return_exceptions=True)
+        await super().shutdown()
+
+    # ── Tk thread ──
+    def publish(self, state, impacts=None):
+        # send what changed since the last call; impacts is an ImpactStore.
+        # Returns the delta (empty: nothing sent)
+        delta = diff(self.published, state)
+        self.published = state
+        if impacts is not None:
+            sent_gen, sent = self.impacts_sent
+            if (impacts.generation, impacts.total) != (sent_gen, sent):
+                if impacts.generation != sent_gen:
+                    sent = 0
+                xy, numbers = impacts.recent(min(impacts.total - sent, len(impacts)))
+                delta['impacts'] = {'g': impacts.generation,
+                                    'from': int(numbers[0]) if len(numbers) else impacts.total + 1,
+                                    'xy': [[round(x, 2), round(y, 2)] for x, y in xy.tolist()]}
+                if impacts.history:
+                    delta['impacts']['keep'] = impacts.history
+                self.impacts_sent = (impacts.generation, impacts.total)
+        if delta:
+            self.version += 1
+            self.call(self.fan_out, self.version, delta)
+        return delta
+
+    # ── loop thread ──
+    def fan_out(self, version, delta):
+        merge(self.mirror, delta)
+        self.mirror_version = version
+        data = encode({'v': version, 'd': delta})
+        for writer in list(self.clients):
+            self.send(writer, data)
+
+    def send(self, writer, data):
+        if writer.transport.get_write_buffer_size() > MAX_BUFFER:
+            self.clients.discard(writer)
+            writer.close()
+            return
+        writer.write(data)
+        self.sent_bytes += len(data)
+
+    def snapshot(self, writer):
+        self.send(writer, encode({'p': PROTOCOL, 'v': self.mirror_version, 's': self.mirror}))
+
+    async def serve(self, reader, writer):
+        peer = writer.get_extra_info('peername')
+        task = asyncio.current_task()
+        self.handlers.add(task)
+        self.snapshot(writer)
+        self.clients.add(writer)
+        self.inbox.put(('joined', peer))
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    msg = json.loads(line)
+                    event = msg.pop('e')
+                except (ValueError, KeyError, AttributeError, TypeError):
+                    continue
+                if event == 'resync':
+                    self.snapshot(writer)
+                elif event in INPUTS:
+                    self.inbox.put(('input', (event, msg)))
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            self.clients.discard(writer)
+            self.handlers.discard(task)
+            writer.close()
+            self.inbox.put(('left', peer))
+
+
+class SyncClient(LoopThread):
+    def __init__(self, host, port=PORT, retry=1.0):
+        super().__init__()
+        self.host, self.port = host, port
+        self.retry = retry
+        self.writer = None
+
+    async def setup(self):
+        self.task = self.loop.create_task(self.session())
+
+    async def session(self):
+        # stay connected: reconnect after any drop, with a fresh snapshot
+        while True:
+            try:
+                reader, writer = await asyncio.open_connection(self.host, self.port,
+                                                               limit=LINE_LIMIT)
+            except OSError as e:
+                self.inbox.put(('status', f"no host at {self.host}:{self.port} ({e.strerror})"))
+                await asyncio.sleep(self.retry)
+                continue
+            self.writer = writer
+            self.inbox.put(('status', f"connected to {self.host}:{self.port}"))
+            try:
+                await follow(reader, writer,
+                             lambda kind, version, payload: self.inbox.put((kind, payload)))
+            except (ConnectionError, ValueError) as e:
+                self.inbox.put(('status', f"dropped: {e}"))
+            finally:
+                self.writer = None
+                writer.close()
+            self.inbox.put(('status', f"lost {self.host}:{self.port}, reconnecting"))
+            await asyncio.sleep(self.retry)
+
+    def send(self, event, **fields):
+        # forward an input to the host (Tk thread); dropped while disconnected
+        self.call(self.write, encode(dict(fields, e=event)))
+
+    def write(self, data):
+        if self.writer is not None:
+            self.writer.write(data)
+
+
+class SimulatedClients(LoopThread):
+    # n followers on one loop, timing when each version reaches each of them;
+    # for latency and fan-out measurements on localhost
+    def __init__(self, host, port, n):
+        super().__init__()
+        self.host, self.port, self.n = host, port, n
+        # per client: version -> perf_counter() at arrival
+        self.arrivals = [{} for _ in range(n)]
+        self.tasks = []
+        self.writers = []
+
+    async def setup(self):
+        for arrivals in self.arrivals:
+            reader, writer = await asyncio.open_connection(self.host, self.port,
+                                                           limit=LINE_LIMIT)
+            self.writers.append(writer)
+            self.tasks.append(self.loop.create_task(
+                follow(reader, writer, self.recorder(arrivals))))
+
+    async def shutdown(self):
+        for writer in self.writers:
+            writer.close()
+        await super().shutdown()
+
+    def recorder(self, arrivals):
+        def handle(kind, version, payload):
+            arrivals[version] = time.perf_counter()
+        return handle
+
+    def wait_for(self, version, timeout=10.0):
+        # True once every client has seen `version`
+        deadline = time.perf_counter() + timeout
+        while time.perf_counter() < deadline:
+            if all(version in arrivals for arrivals in self.arrivals):
+                return True
+            time.sleep(0.001)
+        return False
@@ -0,0 +1,108 @@
+"""Timing helpers for startup and frame profiling."""
+import json
+import sys
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import numpy as np
+
+
+class PhaseTimer:
+    # wall-clock breakdown of a sequence of named phases, e.g. startup
+    def __init__(self, start=None):
+        self.start = time.perf_counter() if start is None else start
+        self.last = self.start
+        self.phases = []
+
+    def mark(self, name):
+        # close a phase that began at the previous mark
+        now = time.perf_counter()
+        self.phases.append((name, now - self.last))
+        self.last = now
+
+    @contextmanager
+    def phase(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.last = time.perf_counter()
+            self.phases.append((name, self.last - t0))
+
+    def total(self):
+        return self.last - self.start
+
+    def report(self, title='startup', file=None):
+        file = file or sys.stderr
+        print(f"{title}: {self.total() * 1000:.1f} ms", file=file)
+        for name, dt in self.phases:
+            print(f"  {name:<18} {dt * 1000:8.1f} ms", file=file)
+        # time between phases, e.g. the Tk event loop before the first frame
+        other = self.total() - sum(dt for _, dt in self.phases)
+        print(f"  {'(idle/other)':<18} {other * 1000:8.1f} ms", file=file)
+
+
+class FrameProfiler:
+    # rolling per-phase timings (p50/p95/p99), event counters and an optional
+    # Chrome-trace style event log for a whole session
+    def __init__(self, history=600):
+        self.history = history
+        self.samples = {}
+        self.counters = {}
+        self.trace = None
+        self.t0 = time.perf_counter()
+
+    @contextmanager
+    def phase(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, t0, time.perf_counter())
+
+    def record(self, name, t0, t1, tid=0):
+        # tid: 0 for the Tk thread, 1 for background work (worker.py)
+        samples = self.samples.get(name)
+        if samples is None:
+            samples = self.samples[name] = deque(maxlen=self.history)
+        samples.append(t1 - t0)
+        if self.trace is not None:
+            self.trace.append({'name': name, 'ph': 'X', 'pid': 0, 'tid': tid,
+                               'ts': (t0 - self.t0) * 1e6, 'dur': (t1 - t0) * 1e6})
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def percentiles(self, name):
+        samples = self.samples.get(name)
+        if not samples:
+            return None
+        return tuple(np.percentile(np.fromiter(samples, float), (50, 95, 99)) * 1000)
+
+    def summary(self):
+        return {
+            'phases': {name: dict(zip(('p50_ms', 'p95_ms', 'p99_ms'), self.percentiles(name)),
+                                  count=len(s))
+                       for name, s in self.samples.items() if s},
+            'counters': dict(self.counters),
+        }
+
+    def hud_text(self):
+        lines = []
+        for name in self.samples:
+            p = self.percentiles(name)
+            if p:
+                lines.append(f"{name:<9} {p[0]:6.1f} {p[1]:6.1f} {p[2]:6.1f}")
+        if lines:
+            lines.insert(0, f"{'ms':<9} {'p50':>6} {'p95':>6} {'p99':>6}")
+        lines += [f"{name}: {n}" for name, n in self.counters.items()]
+        return '\n'.join(lines)
+
+    def start_trace(self):
+        self.trace = []
+
+    def dump_trace(self, path):
+        # chrome://tracing / Perfetto compatible
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': self.trace or [], 'summary': self.summary()}, f)
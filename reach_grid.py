@@ -0,0 +1,112 @@
+"""Coverage raster: how many teams can reach each cell of the view.
+
+Cells lie on a fixed world grid: square, a power of two metres wide, chosen
+so about `cells` of them span the view, and aligned to multiples of their
+size. Panning, or auto-fit nudging the view when a team moves, keeps the
+same cells, so only a zoom by a factor of two or more picks a new size.
+
+A team's reach (cells inside its min_d..max_d band) is kept per TILE x TILE
+block of that grid, for the blocks its band touches, and cached by position,
+band and cell size. Missing blocks are computed for all teams at once by
+broadcasting; a team that moved needs only its own blocks again. The count
+grid for a view is the sum of the blocks under it. Finished grids are also
+cached per window and team layout, so switching the overlay off and on
+again is free.
+"""
+import math
+from collections import OrderedDict
+
+import numpy as np
+
+TILE = 64
+
+
+class ReachGrid:
+    def __init__(self, cells=200, cache_size=16, tile_cache=8192):
+        self.cells = cells
+        # (x, y, band, cell, col, row) -> (TILE, TILE) bool mask, rows = y
+        self.tiles = OrderedDict()
+        self.tile_cache = tile_cache
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.computed = 0
+
+    def cell_size(self, bounds):
+        x0, x1, y0, y1 = bounds
+        span = max(x1 - x0, y1 - y0, 1e-9)
+        return 2.0 ** math.ceil(math.log2(span / self.cells))
+
+    def window(self, bounds, cell):
+        # the cells covering bounds, as [i0, i1) columns and [j0, j1) rows
+        x0, x1, y0, y1 = bounds
+        return (math.floor(x0 / cell), math.ceil(x1 / cell),
+                math.floor(y0 / cell), math.ceil(y1 / cell))
+
+    def blocks(self, pos, band, cell, window):
+        # tiles of the window holding at least one cell of the band around pos
+        (x, y), (min_d, max_d) = pos, band
+        i0, i1, j0, j1 = window
+        size = TILE * cell
+        cols = range(max(math.floor((x - max_d) / size), i0 // TILE),
+                     min(math.floor((x + max_d) / size), (i1 - 1) // TILE) + 1)
+        rows = range(max(math.floor((y - max_d) / size), j0 // TILE),
+                     min(math.floor((y + max_d) / size), (j1 - 1) // TILE) + 1)
+        for row in rows:
+            dy_near = max(row * size - y, 0.0, y - (row + 1) * size)
+            dy_far = max(abs(row * size - y), abs((row + 1) * size - y))
+            for col in cols:
+                dx_near = max(col * size - x, 0.0, x - (col + 1) * size)
+                dx_far = max(abs(col * size - x), abs((col + 1) * size - x))
+                # wholly outside the band, or wholly inside its dead zone
+                if (dx_near * dx_near + dy_near * dy_near > max_d * max_d
+                        or dx_far * dx_far + dy_far * dy_far < min_d * min_d):
+                    continue
+                yield col, row
+
+    def reach(self, keys, band, cell):
+        # (len(keys), TILE, TILE) masks: min_d <= |cell centre - team| <= max_d
+        x, y, cols, rows = np.array([(k[0], k[1], k[4], k[5]) for k in keys], dtype=float).T
+        offsets = np.arange(TILE) + 0.5
+        gx = (cols[:, None] * TILE + offsets) * cell
+        gy = (rows[:, None] * TILE + offsets) * cell
+        min_d, max_d = band
+        d2 = (gx[:, None, :] - x[:, None, None]) ** 2 + (gy[:, :, None] - y[:, None, None]) ** 2
+        self.computed += len(keys)
+        return (d2 >= min_d * min_d) & (d2 <= max_d * max_d)
+
+    def update(self, bounds, band, xy):
+        # (count grid, extent) for teams at xy: rows = y, extent = (left,
+        # right, bottom, top) of the cells, which cover bounds. A copy, safe
+        # to keep
+        cell = self.cell_size(bounds)
+        window = self.window(bounds, cell)
+        layout = tuple(map(tuple, np.round(xy, 3).tolist()))
+        key = (window, cell, band, layout)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.cache.move_to_end(key)
+            return cached
+
+        placed = [(pos + (band, cell, col, row))
+                  for pos in layout for col, row in self.blocks(pos, band, cell, window)]
+        missing = list(dict.fromkeys(k for k in placed if k not in self.tiles))
+        for start in range(0, len(missing), 256):
+            # in batches, to bound the temporary distance arrays
+            batch = missing[start:start + 256]
+            self.tiles.update(zip(batch, self.reach(batch, band, cell)))
+        i0, i1, j0, j1 = window
+        count = np.zeros((j1 - j0, i1 - i0), dtype=np.uint16)
+        for k in placed:
+            self.tiles.move_to_end(k)
+            col, row = k[4] * TILE, k[5] * TILE
+            a0, a1 = max(col, i0), min(col + TILE, i1)
+            b0, b1 = max(row, j0), min(row + TILE, j1)
+            count[b0 - j0:b1 - j0, a0 - i0:a1 - i0] += \
+                self.tiles[k][b0 - row:b1 - row, a0 - col:a1 - col]
+        while len(self.tiles) > self.tile_cache:
+            self.tiles.popitem(last=False)
+
+        result = self.cache[key] = (count, (i0 * cell, i1 * cell, j0 * cell, j1 * cell))
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return result
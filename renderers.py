@@ -0,0 +1,361 @@
+"""Map renderers for the Fire Control view.
+
+    python app.py --renderer tk
+
+A renderer owns the map widget and everything drawn on it: a retained scene
+whose element classes the app syncs each frame (`elements`, `scene`), the
+hover overlay and the profiler HUD. It forwards pointer input to the app as
+events carrying the fields of a matplotlib MouseEvent (inaxes, xdata/ydata
+in map metres, x/y in pixels from the bottom left, button).
+
+- 'mpl' (default): matplotlib's Agg rasterizer, copied into Tk by
+  FigureCanvasTkAgg; the overlay is blitted over a cached background. With
+  background workers the Agg pass runs on a worker thread, and the next frame
+  waits until its result has been copied in.
+- 'tk': native tk.Canvas items (tkscene.py), updated in place. No Agg pass
+  and no image copy per frame, and matplotlib is never imported.
+"""
+import sys
+import threading
+import tkinter as tk
+import traceback
+
+
+class PointerEvent:
+    # the fields of a matplotlib MouseEvent that the app reads
+    def __init__(self, inaxes, xdata, ydata, x, y, button=None):
+        self.inaxes = inaxes
+        self.xdata = xdata
+        self.ydata = ydata
+        self.x = x
+        self.y = y
+        self.button = button
+
+
+class MplRenderer:
+    name = 'mpl'
+
+    def __init__(self, app, parent, canvas_class=None):
+        self.app = app
+        self.profiler = app.profiler
+        # matplotlib's Tk backend is imported here rather than at module load,
+        # and a bare Figure skips pyplot and its global figure manager
+        with app.startup.phase('backend import'):
+            from matplotlib.figure import Figure
+            from matplotlib.backends.backend_agg import FigureCanvasAgg
+            import scene as elements
+            if canvas_class is None:
+                from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg as canvas_class
+        self.elements = elements
+        self.agg_draw = FigureCanvasAgg.draw
+        # a background raster owns the figure until presented(): Agg draws on
+        # the Tk side (expose) wait for it via raster_lock, and resizes, which
+        # change the figure's size and dpi, are held back until it is done
+        self.worker = app.worker
+        self.busy = False
+        self.redraw_pending = False
+        self.raster_lock = threading.Lock()
+        self.held_events = []
+        with app.startup.phase('figure creation'):
+            self.create_figure(parent, Figure, canvas_class)
+        if self.worker.threads:
+            self.canvas.draw = self.locked_draw
+            widget = self.canvas.get_tk_widget()
+            for sequence, handler in (('<Configure>', 'resize'),
+                                      ('<Map>', '_update_device_pixel_ratio')):
+                if hasattr(self.canvas, handler):
+                    widget.bind(sequence, self.hold_while_busy(getattr(self.canvas, handler)))
+
+    def create_figure(self, pf, Figure, canvas_class):
+        app = self.app
+        self.fig = Figure(figsize=(8,8))
+        self.ax = self.fig.add_subplot()
+        self.fig.patch.set_facecolor('#2b2b2b')
+        self.ax.set_facecolor('#2b2b2b')
+        self.ax.tick_params(colors='white')
+        for spine in self.ax.spines.values(): spine.set_color('white')
+        self.ax.title.set_color('white')
+        self.ax.xaxis.label.set_color('white')
+        self.ax.yaxis.label.set_color('white')
+        self.ax.grid(color='gray', linestyle='--')
+        # Limits come from the app's viewport; autoscale off so artists never move them
+        self.ax.set_autoscale_on(False)
+        x0, x1, y0, y1 = app.view.bounds()
+        self.ax.set_xlim(x0, x1)
+        self.ax.set_ylim(y0, y1)
+        self.scene = self.elements.Scene(self.ax)
+        self.canvas = canvas_class(self.fig, master=pf)
+        self.canvas.get_tk_widget().pack(fill=tk.BOTH, expand=True)
+        self.canvas.mpl_connect('button_press_event', app.on_click)
+        self.canvas.mpl_connect('button_release_event', app.on_release)
+        self.canvas.mpl_connect('scroll_event', app.on_scroll)
+        self.canvas.mpl_connect('motion_notify_event', app.on_mouse_move)
+        self.canvas.mpl_connect('axes_leave_event', app.hide_hover)
+        # any full draw (present, resize, expose) re-caches the hover background
+        self.canvas.mpl_connect('draw_event', self.on_draw)
+        self.canvas.mpl_connect('resize_event', self.invalidate_hover_background)
+        self.hover_bg = None
+        self.setup_hover_overlay()
+
+    def setup_hover_overlay(self):
+        # one persistent line + text for the cursor readout, plus the profiler
+        # HUD; when the canvas can blit they are animated, i.e. left out of full
+        # draws and blitted on top
+        from matplotlib.collections import LineCollection
+        animated = self.canvas.supports_blit
+        self.hover_line = self.ax.plot([], [], linestyle=':', color='yellow',
+                                       animated=animated, visible=False)[0]
+        self.hover_text = self.ax.text(0, 0, '', color='yellow', fontsize=8,
+                                       ha='left', va='bottom', clip_on=True,
+                                       animated=animated, visible=False)
+        # cursor to the nearest teams
+        self.hover_team_lines = self.ax.add_collection(LineCollection(
+            [], linestyle=':', linewidth=0.8, animated=animated, visible=False))
+        self.hud = self.ax.text(0.01, 0.99, '', transform=self.ax.transAxes,
+                                color='white', fontsize=7, family='monospace',
+                                ha='left', va='top', animated=animated, visible=False,
+                                bbox=dict(facecolor='black', alpha=0.6, edgecolor='none'))
+
+    @property
+    def width_px(self):
+        return self.ax.bbox.width
+
+    def to_px(self, x, y):
+        return tuple(self.ax.transData.transform((x, y)))
+
+    def on_draw(self, event):
+        if self.canvas.supports_blit:
+            self.hover_bg = self.canvas.copy_from_bbox(self.ax.bbox)
+
+    def invalidate_hover_background(self, *args):
+        self.hover_bg = None
+
+    def present(self):
+        # FigureCanvasTkAgg.draw() is an Agg render followed by a blit into the
+        # Tk photo image; run the two halves separately so each can be timed.
+        # The static scene changed, so on_draw re-caches the hover background
+        self.hover_bg = None
+        if self.worker.threads:
+            self.busy = True
+            self.worker.submit('raster', self.raster, done=self.presented, phase='raster')
+            return
+        with self.profiler.phase('raster'):
+            self.agg_draw(self.canvas)
+        with self.profiler.phase('blit'):
+            self.canvas.blit()
+
+    def raster(self):
+        # worker thread; the app leaves the figure alone while busy
+        try:
+            with self.raster_lock:
+                self.agg_draw(self.canvas)
+            return True
+        except Exception:
+            traceback.print_exc()
+            return False
+
+    def hold_while_busy(self, handler):
+        # a Tk event handler that waits for the raster in flight, if any
+        def on_event(event):
+            if self.busy:
+                self.held_events.append((handler, event))
+            else:
+                handler(event)
+        return on_event
+
+    def presented(self, ok):
+        if ok:
+            with self.profiler.phase('blit'):
+                self.canvas.blit()
+        self.busy = False
+        held, self.held_events = self.held_events, []
+        for handler, event in held:
+            handler(event)
+        if self.hover_visible or self.hud_visible:
+            self.present_overlay()
+        if self.redraw_pending:
+            self.redraw_pending = False
+            self.app.request_redraw()
+
+    def locked_draw(self, *args, **kwargs):
+        with self.raster_lock:
+            type(self.canvas).draw(self.canvas, *args, **kwargs)
+
+    def present_overlay(self):
+        # drawn once the background raster is in (see presented)
+        if self.busy:
+            return
+        # fallback: no blitting support, so the overlay is part of the full draw
+        if not self.canvas.supports_blit:
+            self.canvas.draw_idle()
+            return
+        if self.hover_bg is None:
+            self.canvas.draw()  # on_draw caches the fresh background
+        self.canvas.restore_region(self.hover_bg)
+        self.ax.draw_artist(self.hover_team_lines)
+        self.ax.draw_artist(self.hover_line)
+        self.ax.draw_artist(self.hover_text)
+        self.ax.draw_artist(self.hud)
+        self.canvas.blit(self.ax.bbox)
+
+    @property
+    def hover_visible(self):
+        return self.hover_line.get_visible()
+
+    def show_hover(self, target, point, label, segments, colors):
+        (tx, ty), (mx, my) = target, point
+        self.hover_team_lines.set_segments(segments)
+        self.hover_team_lines.set_color(colors)
+        self.hover_line.set_data([tx, mx], [ty, my])
+        self.hover_text.set_position((mx, my))
+        self.hover_text.set_text(label)
+        for artist in (self.hover_line, self.hover_text, self.hover_team_lines):
+            artist.set_visible(True)
+        self.present_overlay()
+
+    def clear_hover(self, present=True):
+        # present=False leaves the screen to the next full frame
+        for artist in (self.hover_line, self.hover_text, self.hover_team_lines):
+            artist.set_visible(False)
+        if present:
+            self.present_overlay()
+
+    @property
+    def hud_visible(self):
+        return self.hud.get_visible()
+
+    def set_hud(self, text):
+        # None hides the HUD
+        self.hud.set_visible(text is not None)
+        self.hud.set_text(text or '')
+        self.present_overlay()
+
+
+class TkRenderer:
+    name = 'tk'
+    # items are updated in place on the Tk thread; never waits on a raster
+    busy = False
+
+    def __init__(self, app, parent, canvas_class=None):
+        self.app = app
+        with app.startup.phase('canvas creation'):
+            import tkscene as elements
+            self.elements = elements
+            canvas_class = canvas_class or tk.Canvas
+            self.canvas = canvas_class(parent, width=800, height=800, background='#2b2b2b',
+                                       highlightthickness=0)
+            self.canvas.pack(fill=tk.BOTH, expand=True)
+            self.scene = elements.Scene(self.canvas, (800, 800),
+                                        photo=getattr(self.canvas, 'photo', None))
+            self.setup_overlay()
+            self.bind_events()
+
+    def setup_overlay(self):
+        # hover items live in map metres like the scene's, so a zoom moves
+        # them too; the HUD is fixed to the top-left corner
+        scene, canvas, world = self.scene, self.canvas, self.elements.WORLD
+        self.team_lines = []
+        self.hover_line = scene.add(canvas.create_line(
+            0, 0, 0, 0, fill='yellow', dash=(2, 4), state='hidden', tags=world), 'overlay')
+        self.hover_text = scene.add(canvas.create_text(
+            0, 0, fill='yellow', anchor='sw', font=('TkDefaultFont', 8), state='hidden',
+            tags=world), 'overlay')
+        self.hud_box = scene.add(canvas.create_rectangle(
+            0, 0, 0, 0, fill='black', outline='', state='hidden'), 'overlay')
+        self.hud = scene.add(canvas.create_text(
+            6, 6, fill='white', anchor='nw', font=('TkFixedFont', 7), state='hidden'), 'overlay')
+        self.hover_shown = self.hud_shown = False
+
+    def bind_events(self):
+        canvas = self.canvas
+        canvas.bind('<ButtonPress>', self.on_press)
+        canvas.bind('<ButtonRelease>', self.on_release)
+        canvas.bind('<Motion>', self.on_motion)
+        canvas.bind('<MouseWheel>', self.on_wheel)
+        canvas.bind('<Leave>', self.app.hide_hover)
+        canvas.bind('<Configure>', self.on_configure)
+
+    def event(self, e, button=None):
+        # Tk pixels (y down) to a matplotlib-style event
+        x, y = self.scene.to_world(e.x, e.y)
+        return PointerEvent(self, x, y, e.x, self.scene.size[1] - e.y, button)
+
+    def button(self, num):
+        # matplotlib numbering: 1 left, 2 middle, 3 right (Tk on macOS swaps 2/3)
+        if sys.platform == 'darwin':
+            return {2: 3, 3: 2}.get(num, num)
+        return num
+
+    def on_press(self, e):
+        if e.num in (4, 5):
+            # X11 reports the wheel as buttons 4 and 5
+            self.app.on_scroll(self.event(e, 'up' if e.num == 4 else 'down'))
+        else:
+            self.app.on_click(self.event(e, self.button(e.num)))
+
+    def on_release(self, e):
+        if e.num not in (4, 5):
+            self.app.on_release(self.event(e, self.button(e.num)))
+
+    def on_motion(self, e):
+        self.app.on_mouse_move(self.event(e))
+
+    def on_wheel(self, e):
+        self.app.on_scroll(self.event(e, 'up' if e.delta > 0 else 'down'))
+
+    def on_configure(self, e):
+        if (e.width, e.height) != self.scene.size:
+            self.scene.resize(e.width, e.height)
+            self.app.request_redraw()
+
+    @property
+    def width_px(self):
+        return self.scene.size[0]
+
+    def to_px(self, x, y):
+        px, py = self.scene.to_px(x, y)
+        return px, self.scene.size[1] - py
+
+    def present(self):
+        # items are already up to date; Tk repaints the damaged regions when idle
+        pass
+
+    @property
+    def hover_visible(self):
+        return self.hover_shown
+
+    def show_hover(self, target, point, label, segments, colors):
+        scene, canvas = self.scene, self.canvas
+        lines = self.elements.pool(scene, self.team_lines, len(segments), lambda: scene.add(
+            canvas.create_line(0, 0, 0, 0, dash=(2, 4), tags=self.elements.WORLD), 'overlay'))
+        for item, ((x0, y0), (x1, y1)), color in zip(lines, segments, colors):
+            canvas.coords(item, *scene.to_px(x0, y0), *scene.to_px(x1, y1))
+            canvas.itemconfig(item, fill=color, state='normal')
+        px, py = scene.to_px(*point)
+        canvas.coords(self.hover_line, *scene.to_px(*target), px, py)
+        canvas.coords(self.hover_text, px, py)
+        canvas.itemconfig(self.hover_text, text=label, state='normal')
+        canvas.itemconfig(self.hover_line, state='normal')
+        self.hover_shown = True
+
+    def clear_hover(self, present=True):
+        for item in [self.hover_line, self.hover_text] + self.team_lines:
+            self.canvas.itemconfig(item, state='hidden')
+        self.hover_shown = False
+
+    @property
+    def hud_visible(self):
+        return self.hud_shown
+
+    def set_hud(self, text):
+        canvas = self.canvas
+        self.hud_shown = text is not None
+        state = 'normal' if self.hud_shown else 'hidden'
+        canvas.itemconfig(self.hud, text=text or '', state=state)
+        if self.hud_shown:
+            x0, y0, x1, y1 = canvas.bbox(self.hud)
+            canvas.coords(self.hud_box, x0 - 3, y0 - 3, x1 + 3, y1 + 3)
+        canvas.itemconfig(self.hud_box, state=state)
+
+
+RENDERERS = {'mpl': MplRenderer, 'tk': TkRenderer}
@@ -0,0 +1,59 @@
+"""Backend-neutral core of the retained map scenes (scene.py, tkscene.py).
+
+A scene keeps one long-lived element per key. Each frame the app syncs every
+element with a tuple of inputs; an element redraws only when they differ from
+the previous frame's, and the scene counts what was created and touched.
+"""
+
+
+class Element:
+    def __init__(self, scene):
+        self.scene = scene
+        self.inputs = None
+        self.create()
+
+    def sync(self, inputs):
+        # dirty check: identical inputs mean nothing to do this frame
+        if inputs == self.inputs:
+            return False
+        self.inputs = inputs
+        self.update(*inputs)
+        return True
+
+    def create(self):
+        pass
+
+    def update(self, *inputs):
+        pass
+
+
+class Scene:
+    def __init__(self):
+        self.elements = {}
+        self.created = 0
+        self.updated = 0
+        self.changed = False
+        self.frame_stats = {'created': 0, 'updated': 0}
+
+    def touched(self, n=1):
+        self.updated += n
+
+    def element(self, key, factory, *args):
+        el = self.elements.get(key)
+        if el is None:
+            el = self.elements[key] = factory(self, *args)
+        return el
+
+    def begin_frame(self):
+        self.created = self.updated = 0
+        self.changed = False
+
+    def end_frame(self):
+        # counters for this frame; steady-state edits should show created == 0
+        self.frame_stats = {'created': self.created, 'updated': self.updated}
+        return self.changed
+
+    def sync(self, key, factory, inputs, *args):
+        changed = self.element(key, factory, *args).sync(inputs)
+        self.changed |= changed
+        return changed
@@ -0,0 +1,383 @@
+"""Retained-mode map scene for the Fire Control plot.
+
+Each logical element of the map owns long-lived matplotlib artists that are
+created once and then updated in place. An element only touches its artists
+when its inputs differ from the previous frame. Elements that take the view
+bounds skip whatever lies wholly outside them.
+"""
+import math
+
+import numpy as np
+from matplotlib import patches
+from matplotlib.artist import Artist
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.collections import LineCollection, PatchCollection
+from matplotlib.figure import Figure
+
+from retained import Element, Scene as RetainedScene
+from viewport import annuli_visible, points_visible
+
+
+class ViewElement(Element):
+    def update(self, x0, x1, y0, y1):
+        self.scene.ax.set_xlim(x0, x1)
+        self.scene.ax.set_ylim(y0, y1)
+        self.scene.touched()
+
+
+class MapElement(Element):
+    # tiled background: one image holding the tiles under the view, rebuilt
+    # only when that set of tiles (or the spotter's map position) changes
+    def create(self):
+        self.image = self.scene.add(self.scene.ax.imshow(
+            np.zeros((1, 1, 4), dtype=np.uint8), extent=(0, 1, 0, 1), origin='upper',
+            interpolation='nearest', aspect='auto', zorder=0, visible=False))
+
+    def update(self, pyramid, level, rows, cols, spotter):
+        data, (left, right, bottom, top) = pyramid.mosaic(level, rows, cols)
+        sx, sy = spotter
+        self.image.set_data(data)
+        self.image.set_extent((left - sx, right - sx, bottom - sy, top - sy))
+        self.image.set_visible(data.size > 0)
+        self.scene.touched()
+
+
+class CoverageElement(Element):
+    # optional heatmap of how many teams reach each cell of the view
+    def create(self):
+        self.image = self.scene.add(self.scene.ax.imshow(
+            np.ma.masked_all((1, 1)), extent=(0, 1, 0, 1), origin='lower', cmap='viridis',
+            interpolation='nearest', aspect='auto', alpha=0.35, zorder=0.5, visible=False))
+
+    def update(self, visible, serial, shown):
+        # shown: the app's latest finished (grid, extent, teams); `serial`
+        # tells them apart without comparing arrays
+        self.image.set_visible(visible and shown is not None)
+        if visible and shown is not None:
+            grid, extent, n_teams = shown
+            # cells no team reaches stay see-through
+            self.image.set_data(np.ma.masked_equal(grid, 0))
+            self.image.set_extent(extent)
+            self.image.set_clim(0.5, max(n_teams, 1) + 0.5)
+        self.scene.touched()
+
+
+def marker_margin(view):
+    # markers and labels reach a little past their anchor point
+    return 0.03 * (view[1] - view[0])
+
+
+class SpotterElement(Element):
+    def create(self):
+        self.marker = self.scene.add(self.scene.ax.plot(
+            0, 0, 'o', color='white', markersize=8, label='Spotter')[0])
+
+
+class TargetElement(Element):
+    def create(self):
+        ax = self.scene.ax
+        self.line = self.scene.add(ax.plot([0, 0], [0, 0], linestyle=':', color='white')[0])
+        self.marker = self.scene.add(ax.plot(
+            0, 0, 'X', color='red', markersize=10, label='Target')[0])
+
+    def update(self, tx, ty):
+        self.line.set_data([0, tx], [0, ty])
+        self.marker.set_data([tx], [ty])
+        self.scene.touched(2)
+
+
+class TeamsElement(Element):
+    # all teams share one scatter for markers, one LineCollection for aim lines
+    # and one PatchCollection for the dotted min_d→max_d range annuli; markers,
+    # labels and annuli outside the view are left out
+    def create(self):
+        ax = self.scene.ax
+        self.annuli = self.scene.add(ax.add_collection(PatchCollection(
+            [], facecolor='none', linestyle='--', zorder=1)))
+        self.lines = self.scene.add(ax.add_collection(LineCollection(
+            [], linestyle=':', zorder=2)))
+        self.markers = self.scene.add(ax.scatter(
+            [], [], marker='^', s=64, zorder=2, label='Teams', visible=False))
+        self.labels = []
+        self.keys = (None, None, None, None, None)
+
+    def update(self, teams, version, tx, ty, min_d, max_d, view):
+        old_version, old_target, old_weapon, old_seen, old_rings = self.keys
+        active = teams.active()
+        xy = teams.xy()[active]
+        colors = [c for c, a in zip(teams.colors, active) if a]
+        seen = points_visible(xy, view, marker_margin(view))
+        rings = teams.ranges_shown()[active] & annuli_visible(
+            xy[:, 0], xy[:, 1], min_d, max_d, view)
+        self.keys = (version, (tx, ty), (min_d, max_d), seen.tobytes(), rings.tobytes())
+
+        if version != old_version or seen.tobytes() != old_seen:
+            self.markers.set_offsets(xy[seen].reshape(-1, 2))
+            self.markers.set_color([c for c, s in zip(colors, seen) if s])
+            self.markers.set_visible(len(xy) > 0)
+            names = [n for n, a in zip(teams.names, active) if a]
+            shown = [(p, n, c) for p, n, c, s in zip(xy, names, colors, seen) if s]
+            while len(self.labels) < len(shown):
+                self.labels.append(self.scene.add(self.scene.ax.text(
+                    0, 0, '', fontsize=7, ha='left', va='bottom')))
+            for label, ((x, y), name, color) in zip(self.labels, shown):
+                label.set_position((x, y))
+                label.set_text(' ' + name.split()[-1])
+                label.set_color(color)
+                label.set_visible(True)
+            for label in self.labels[len(shown):]:
+                label.set_visible(False)
+            self.scene.touched(1 + len(shown))
+
+        if version != old_version or (tx, ty) != old_target:
+            self.lines.set_segments([[(x, y), (tx, ty)] for x, y in xy])
+            self.lines.set_color(colors)
+            self.scene.touched()
+
+        if (version != old_version or (min_d, max_d) != old_weapon
+                or rings.tobytes() != old_rings):
+            self.annuli.set_paths([
+                patches.Wedge((x, y), max_d, 0, 360, width=max_d - min_d)
+                for (x, y), s in zip(xy, rings) if s
+            ])
+            self.annuli.set_edgecolor([c for c, s in zip(colors, rings) if s])
+            self.scene.touched()
+
+
+class MissionsElement(Element):
+    # queued targets in one scatter, and a line from each to its assigned team
+    def create(self):
+        ax = self.scene.ax
+        self.lines = self.scene.add(ax.add_collection(LineCollection(
+            [], linewidth=0.8, alpha=0.7, zorder=2)))
+        self.markers = self.scene.add(ax.scatter(
+            [], [], marker='x', color='red', s=36, zorder=2.6, label='Queued targets',
+            visible=False))
+
+    def update(self, targets, version, teams, teams_version, assigned):
+        target_xy = targets.xy()[targets.active()]
+        self.markers.set_offsets(target_xy.reshape(-1, 2))
+        self.markers.set_visible(len(target_xy) > 0)
+        team_xy, xy = teams.xy(), targets.xy()
+        pairs = [(t, i) for i, t in enumerate(assigned) if t >= 0]
+        self.lines.set_segments([[team_xy[t], xy[i]] for t, i in pairs])
+        self.lines.set_color([teams.colors[t] for t, _ in pairs])
+        self.scene.touched(2)
+
+
+class RingsElement(Element):
+    # green/orange rings at the target
+    def create(self):
+        ax = self.scene.ax
+        self.inner = self.scene.add(ax.add_patch(patches.Circle(
+            (0, 0), 1, facecolor='green', alpha=0.3, edgecolor='none')))
+        self.outer = self.scene.add(ax.add_patch(patches.Wedge(
+            (0, 0), 1, 0, 360, width=1, facecolor='orange', alpha=0.3, edgecolor='none')))
+
+    def update(self, tx, ty, inner_r, outer_r, visible=True):
+        self.inner.set_visible(visible)
+        self.outer.set_visible(visible)
+        self.inner.set_center((tx, ty))
+        self.inner.set_radius(inner_r)
+        self.outer.set_center((tx, ty))
+        self.outer.set_radius(outer_r)
+        self.outer.set_width(outer_r - inner_r)
+        self.scene.touched(2)
+
+
+class ImpactLayer(Artist):
+    # the impact markers and labels as one bitmap, drawn off screen and
+    # copied into the frame, so a frame costs the same however many impacts
+    # there are. The bitmap covers the view plus PAD of the axes' size on
+    # each side, at the scale of the moment; until the impacts change, the
+    # view leaves it or the scale drifts by more than RESCALE, pans and zooms
+    # only pick its pixels again (nearest neighbour)
+    PAD = 0.25
+    RESCALE = 0.02
+
+    def __init__(self, max_labels):
+        super().__init__()
+        self.max_labels = max_labels
+        self.xy = np.empty((0, 2))
+        self.recent = (np.empty((0, 2)), np.empty(0, dtype=int))
+        self.version = 0
+        # (version, dpi, extent, (sx, sy) in px per metre, bottom-up RGBA,
+        # (r0, r1, c0, c1) rows and columns holding anything), or None
+        self.bitmap = None
+        self.figure_off = None
+        self.renders = 0
+
+    def set_impacts(self, xy, recent_xy, numbers):
+        # copies: the store keeps changing while a worker may be drawing
+        self.xy = np.array(xy)
+        self.recent = (np.array(recent_xy), np.array(numbers))
+        self.version += 1
+        self.stale = True
+
+    def create_offscreen(self):
+        # a bare figure filled by one axes with nothing but the impacts
+        fig = self.figure_off = Figure()
+        fig.patch.set_alpha(0.0)
+        FigureCanvasAgg(fig)
+        ax = fig.add_axes((0, 0, 1, 1))
+        ax.set_axis_off()
+        ax.set_autoscale_on(False)
+        self.markers = ax.scatter([], [], marker='D', color='yellow')
+        self.labels = [ax.text(0, 0, '', color='black', ha='center', va='center',
+                               visible=False)
+                       for _ in range(self.max_labels)]
+
+    def render(self, view, box, dpi):
+        # the bitmap covers whole screen pixels, PAD of the axes' size past
+        # each side, so at this scale its pixels are the screen's
+        if self.figure_off is None:
+            self.create_offscreen()
+        vx0, vx1, vy0, vy1 = view
+        sx, sy = box.width / (vx1 - vx0), box.height / (vy1 - vy0)
+        pad_x, pad_y = math.ceil(self.PAD * box.width), math.ceil(self.PAD * box.height)
+        p0, p1 = math.floor(box.x0) - pad_x, math.ceil(box.x1) + pad_x
+        q0, q1 = math.floor(box.y0) - pad_y, math.ceil(box.y1) + pad_y
+        extent = (vx0 + (p0 - box.x0) / sx, vx0 + (p1 - box.x0) / sx,
+                  vy0 + (q0 - box.y0) / sy, vy0 + (q1 - box.y0) / sy)
+        fig, ax = self.figure_off, self.figure_off.axes[0]
+        fig.set_dpi(dpi)
+        fig.set_size_inches((p1 - p0) / dpi, (q1 - q0) / dpi)
+        ax.set_xlim(*extent[:2])
+        ax.set_ylim(*extent[2:])
+        margin = marker_margin(extent)
+        self.markers.set_offsets(self.xy[points_visible(self.xy, extent, margin)])
+        xy, numbers = self.recent
+        seen = points_visible(xy, extent, margin)
+        for label, (ix, iy), n in zip(self.labels, xy[seen].tolist(), numbers[seen].tolist()):
+            label.set_position((ix, iy))
+            label.set_text(str(n))
+            label.set_visible(True)
+        for label in self.labels[int(seen.sum()):]:
+            label.set_visible(False)
+        fig.canvas.draw()
+        image = np.asarray(fig.canvas.buffer_rgba())[::-1].copy()
+        rows, = np.nonzero(image[..., 3].any(axis=1))
+        cols, = np.nonzero(image[..., 3].any(axis=0))
+        content = (rows[0], rows[-1] + 1, cols[0], cols[-1] + 1) if len(rows) else None
+        self.bitmap = (self.version, dpi, extent, (sx, sy), image, content)
+        self.renders += 1
+
+    def current(self, view, sx, sy, dpi):
+        if self.bitmap is None:
+            return False
+        version, bitmap_dpi, (x0, x1, y0, y1), (bx, by), _, _ = self.bitmap
+        vx0, vx1, vy0, vy1 = view
+        return (version == self.version and bitmap_dpi == dpi
+                and abs(sx / bx - 1) <= self.RESCALE and abs(sy / by - 1) <= self.RESCALE
+                and x0 <= vx0 and vx1 <= x1 and y0 <= vy0 and vy1 <= y1)
+
+    def draw(self, renderer):
+        if not self.get_visible() or not len(self.xy):
+            return
+        box = self.axes.bbox
+        (vx0, vx1), (vy0, vy1) = self.axes.get_xlim(), self.axes.get_ylim()
+        sx, sy = box.width / (vx1 - vx0), box.height / (vy1 - vy0)
+        dpi = self.axes.figure.dpi
+        if not self.current((vx0, vx1, vy0, vy1), sx, sy, dpi):
+            self.render((vx0, vx1, vy0, vy1), box, dpi)
+        _, _, (x0, _, y0, _), (bx, by), image, content = self.bitmap
+        if content is None:
+            return
+        r0, r1, c0, c1 = content
+        # the screen pixels over the bitmap's non-empty part, and for each
+        # the bitmap pixel under its centre
+        p0 = max(math.floor(box.x0 + (x0 + c0 / bx - vx0) * sx), math.floor(box.x0))
+        p1 = min(math.ceil(box.x0 + (x0 + c1 / bx - vx0) * sx), math.ceil(box.x1))
+        q0 = max(math.floor(box.y0 + (y0 + r0 / by - vy0) * sy), math.floor(box.y0))
+        q1 = min(math.ceil(box.y0 + (y0 + r1 / by - vy0) * sy), math.ceil(box.y1))
+        if p0 >= p1 or q0 >= q1:
+            return
+        cols = ((vx0 + (np.arange(p0, p1) + 0.5 - box.x0) / sx - x0) * bx).astype(np.intp)
+        rows = ((vy0 + (np.arange(q0, q1) + 0.5 - box.y0) / sy - y0) * by).astype(np.intp)
+        np.clip(cols, 0, image.shape[1] - 1, out=cols)
+        np.clip(rows, 0, image.shape[0] - 1, out=rows)
+        gc = renderer.new_gc()
+        gc.set_clip_rectangle(box)
+        renderer.draw_image(gc, p0, q0, image[rows[:, None], cols])
+        gc.restore()
+        self.stale = False
+
+
+class ImpactsElement(Element):
+    # every impact goes into one ImpactLayer, which follows the view by
+    # itself; only the most recent impacts get a number label
+    def __init__(self, scene, max_labels=20):
+        self.max_labels = max_labels
+        super().__init__(scene)
+
+    def create(self):
+        self.layer = self.scene.add(self.scene.ax.add_artist(ImpactLayer(self.max_labels)))
+        self.layer.set_zorder(2.5)
+        self.version = None
+
+    def update(self, store, version, view):
+        if version == self.version:
+            return
+        self.version = version
+        xy, numbers = store.recent(self.max_labels)
+        self.layer.set_impacts(store.xy, xy, numbers)
+        self.scene.touched(1 + len(xy))
+
+
+class DispersionElement(Element):
+    # mean point of impact, 50% dispersion ellipse and CEP readout
+    def create(self):
+        ax = self.scene.ax
+        self.ellipse = self.scene.add(ax.add_patch(patches.Ellipse(
+            (0, 0), 1, 1, edgecolor='white', facecolor='none', linestyle='--',
+            visible=False)))
+        self.marker = self.scene.add(ax.plot(
+            0, 0, '+', color='white', markersize=12, label='MPI', visible=False)[0])
+        self.label = self.scene.add(ax.text(
+            0, 0, '', color='white', fontsize=8, ha='left', va='top', visible=False))
+
+    def update(self, visible, mx, my, width, height, angle, cep):
+        for artist in (self.ellipse, self.marker, self.label):
+            artist.set_visible(visible)
+        if visible:
+            self.marker.set_data([mx], [my])
+            self.ellipse.set_center((mx, my))
+            self.ellipse.set_width(width)
+            self.ellipse.set_height(height)
+            self.ellipse.set_angle(angle)
+            self.label.set_position((mx, my))
+            self.label.set_text(f" CEP {cep:.1f} m")
+        self.scene.touched(3)
+
+
+class LegendElement(Element):
+    # rebuilt only when the set of labelled, visible artists changes
+    def create(self):
+        self.legend = None
+
+    def update(self, labels):
+        if self.legend is not None:
+            self.legend.remove()
+        handles = self.scene.legend_handles()
+        self.legend = self.scene.add(self.scene.ax.legend(
+            handles, labels, loc='upper right', fontsize='small'))
+        for t in self.legend.get_texts():
+            t.set_color('white')
+
+
+class Scene(RetainedScene):
+    def __init__(self, ax):
+        super().__init__()
+        self.ax = ax
+
+    def add(self, artist):
+        self.created += 1
+        return artist
+
+    def legend_handles(self):
+        return [a for a in self.ax.get_lines() + self.ax.collections
+                if a.get_visible() and not a.get_label().startswith('_')]
+
+    def sync_legend(self):
+        labels = tuple(a.get_label() for a in self.legend_handles())
+        self.sync('legend', LegendElement, (labels,))
@@ -0,0 +1,64 @@
+"""Coalescing redraw scheduler.
+
+Variable traces and buttons only mark the view dirty. One Tk callback per
+frame then does a single recompute and render, at most max_fps times per
+second.
+"""
+import time
+from collections import deque
+
+
+class RedrawScheduler:
+    def __init__(self, root, render, max_fps=60, history=256):
+        self.root = root
+        self.render = render
+        self.min_interval = 1.0 / max_fps if max_fps else 0.0
+        self.after_id = None
+        self.last_render = float('-inf')
+        # invalidations since the last render, and per-render history of them
+        self.pending = 0
+        self.coalesced = deque(maxlen=history)
+        self.requests = 0
+        self.renders = 0
+
+    def invalidate(self, *args):
+        # signature fits trace_add, Tk commands and mpl callbacks alike
+        self.pending += 1
+        self.requests += 1
+        if self.after_id is not None:
+            return
+        wait = self.last_render + self.min_interval - time.perf_counter()
+        if wait > 0:
+            self.after_id = self.root.after(max(1, int(wait * 1000)), self.run)
+        else:
+            self.after_id = self.root.after_idle(self.run)
+
+    def run(self):
+        self.after_id = None
+        count, self.pending = self.pending, 0
+        self.last_render = time.perf_counter()
+        # recorded first so the render itself can read last_coalesced
+        self.coalesced.append(count)
+        self.render()
+        self.renders += 1
+
+    def flush(self):
+        # render now if anything is pending, e.g. before reading results back
+        if self.after_id is not None:
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+        if self.pending:
+            self.run()
+
+    @property
+    def last_coalesced(self):
+        return self.coalesced[-1] if self.coalesced else 0
+
+    def stats(self):
+        return {
+            'requests': self.requests,
+            'renders': self.renders,
+            'last_coalesced': self.last_coalesced,
+            'mean_coalesced': (sum(self.coalesced) / len(self.coalesced)
+                               if self.coalesced else 0.0),
+        }
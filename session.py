@@ -0,0 +1,216 @@
+"""Session recording and replay.
+
+    python app.py --record session.jsonl          # record while playing
+    python app.py replay session.jsonl --check    # replay headless, verify
+
+The log is append-only JSONL, one compact object per input event: `t`
+(seconds since the session started), `e` (event kind) and its fields. Each
+rendered frame adds a `frame` line with the firing solutions on screen, so a
+replay can check that the same inputs still give the same solutions. A new
+session appended to an existing log starts with its own `start` line.
+"""
+import json
+import os
+import sys
+import time
+
+# solutions are compared at the precision they are logged with
+PRECISION = 3
+TOLERANCE = 2 * 10 ** -PRECISION
+
+
+class SessionRecorder:
+    def __init__(self, path):
+        # line buffered: a crash loses at most the event being handled
+        self.file = open(path, 'a', buffering=1)
+        self.t0 = time.perf_counter()
+        self.events = 0
+
+    def start(self, app):
+        # everything a replay needs to build an identical app; the weapons
+        # file is null for the built-in table
+        self.t0 = time.perf_counter()
+        catalog = app.artillery_ranges
+        self.write('start', weapon=app.artillery_type.get(), teams=len(app.team_rows),
+                   history=app.impacts.history, labels=app.impact_labels,
+                   window=app.mpi.window, decay=app.mpi.decay,
+                   weapons=os.path.abspath(catalog.source) if catalog.digest else None,
+                   weapons_sha256=catalog.digest)
+
+    def write(self, event, **fields):
+        rec = {'t': round(time.perf_counter() - self.t0, 4), 'e': event}
+        rec.update(fields)
+        self.file.write(json.dumps(rec, separators=(',', ':')) + '\n')
+        self.events += 1
+
+    def close(self):
+        self.file.close()
+
+
+def round_solutions(sol):
+    # spotter row first, then each team, as [distance, azimuth]
+    return [[round(d, PRECISION), round(a, PRECISION)]
+            for d, a in zip(sol.distance[:, 0].tolist(), sol.azimuth[:, 0].tolist())]
+
+
+def read_log(path):
+    with open(path) as f:
+        for n, line in enumerate(f, 1):
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    raise ValueError(f"{path}:{n}: {e}") from None
+
+
+class Replay:
+    # feeds logged events back into a headless FoxholeArtilleryApp, built
+    # with `weapons` (a catalog.Catalog), which must be the recorded one
+    def __init__(self, weapons, realtime=False, check=False, max_fps=0, trace=False,
+                 out=None):
+        self.weapons = weapons
+        self.realtime = realtime
+        self.check = check
+        self.trace = trace
+        self.max_fps = max_fps
+        self.out = out or sys.stderr
+        self.app = self.root = None
+        self.events = self.frames = 0
+        self.mismatches = []
+        self.t_start = self.t_log = 0.0
+
+    def run(self, records):
+        for rec in records:
+            if rec['e'] == 'start':
+                self.begin(rec)
+            elif self.app is None:
+                raise ValueError("log does not begin with a 'start' event")
+            else:
+                if self.realtime:
+                    delay = rec['t'] - (time.perf_counter() - self.t_start)
+                    if delay > 0:
+                        self.root.pump()
+                        time.sleep(delay)
+                self.t_log = rec['t']
+                getattr(self, 'on_' + rec['e'])(rec)
+                self.events += 1
+            # as fast as possible: Tk gets idle time after every event
+            self.root.pump()
+        if self.app:
+            self.app.redraw.flush()
+            # background results, and the frame they ask for
+            self.app.worker.wait()
+            self.root.pump(wait=True)
+        return not self.mismatches
+
+    def begin(self, rec):
+        import headless
+        # logs from before weapons were recorded are taken on trust
+        if 'weapons_sha256' in rec and rec['weapons_sha256'] != self.weapons.digest:
+            recorded = rec['weapons'] or 'the built-in weapon table'
+            raise ValueError(f"recorded with {recorded} (sha256 {rec['weapons_sha256']}), "
+                             f"but the loaded weapons differ; replay with --weapons set to that file")
+        if self.app:
+            self.app.redraw.flush()
+        self.app, self.root = headless.make_app(
+            real=False, max_fps=self.max_fps, initial_teams=rec['teams'],
+            impact_history=rec['history'], impact_labels=rec['labels'],
+            mpi_window=rec['window'], mpi_decay=rec['decay'], weapons=self.weapons)
+        if self.trace:
+            self.app.profiler.start_trace()
+        self.app.artillery_type.set(rec['weapon'])
+        self.app.redraw.flush()
+        self.t_start = time.perf_counter()
+
+    def event(self, rec, button=1):
+        from headless import MouseEvent
+        return MouseEvent(self.app.renderer, rec['x'], rec['y'], button=button)
+
+    def on_target(self, rec):
+        self.app.target_distance.set(rec['d'])
+        self.app.target_azimuth.set(rec['a'])
+
+    def on_hit_params(self, rec):
+        self.app.target_radius.set(rec['r'])
+        self.app.hits_to_kill.set(rec['k'])
+
+    def on_weapon(self, rec):
+        self.app.artillery_type.set(rec['name'])
+
+    def on_add_team(self, rec):
+        self.app.add_team()
+
+    def on_remove_team(self, rec):
+        self.app.remove_team(self.app.team_rows[rec['i']])
+
+    def on_add_queue(self, rec):
+        self.app.add_queue_target(rec['d'], rec['a'])
+
+    def on_remove_queue(self, rec):
+        self.app.remove_queue_target(self.app.target_rows[rec['i']])
+
+    def on_queue(self, rec):
+        row = self.app.target_rows[rec['i']]
+        row['distance'].set(rec['d'])
+        row['azimuth'].set(rec['a'])
+
+    def on_team(self, rec):
+        row = self.app.team_rows[rec['i']]
+        row['distance'].set(rec['d'])
+        row['azimuth'].set(rec['a'])
+        row['show'].set(rec['show'])
+        self.app.on_team_edit(row)
+
+    def on_click(self, rec):
+        self.app.on_click(self.event(rec))
+
+    def on_move(self, rec):
+        self.app.on_mouse_move(self.event(rec))
+
+    def on_zoom(self, rec):
+        self.app.view.zoom(rec['f'], rec['x'], rec['y'])
+        self.app.request_redraw()
+
+    def on_pan(self, rec):
+        self.app.view.pan_to(rec['cx'], rec['cy'])
+        self.app.request_redraw()
+
+    def on_fit(self, rec):
+        self.app.fit_view()
+
+    def on_coverage(self, rec):
+        self.app.show_coverage.set(rec['on'])
+        self.app.on_coverage_toggle()
+
+    def on_leave(self, rec):
+        self.app.hide_hover()
+
+    def on_reset_impacts(self, rec):
+        self.app.reset_impacts()
+
+    def on_total_reset(self, rec):
+        self.app.total_reset()
+
+    def on_frame(self, rec):
+        self.frames += 1
+        if not self.check:
+            return
+        # the logged frame saw every input logged before it; a background
+        # raster still running would defer that frame
+        self.app.worker.wait()
+        self.app.redraw.flush()
+        got = round_solutions(self.app.solution)
+        want = rec['sol']
+        if len(got) != len(want) or any(
+                abs(g - w) > TOLERANCE for gs, ws in zip(got, want) for g, w in zip(gs, ws)):
+            self.mismatches.append((self.t_log, want, got))
+
+    def report(self, wall):
+        print(f"replayed {self.events} events, {self.frames} logged frames "
+              f"in {wall:.2f} s", file=self.out)
+        if self.app:
+            print(self.app.profiler.hud_text(), file=self.out)
+        if self.check:
+            print(f"solution mismatches: {len(self.mismatches)}", file=self.out)
+            for t, want, got in self.mismatches[:5]:
+                print(f"  t={t:.3f}s logged {want} replayed {got}", file=self.out)
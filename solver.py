@@ -0,0 +1,93 @@
+"""Headless fire-solution engine.
+
+Pure NumPy: no tkinter or matplotlib import, so it can be reused by tools
+that never open a window. All functions broadcast, so one call solves any
+number of teams against any number of targets.
+
+Conventions match the map: positions are spotter-relative metres with
+x = east and y = north, and azimuths are degrees clockwise from north.
+A weapon is a ((min_d, max_d), (min_r, max_r)) tuple as in ARTILLERY_RANGES,
+or a catalog.Weapon, which is one too.
+"""
+from typing import NamedTuple
+
+import numpy as np
+
+
+# weapon → ((min_d, max_d), (min_r, max_r)): effective range and spread radius, metres
+ARTILLERY_RANGES = {
+    "Mortar": ((45, 80), (5.5, 12)),
+    "Gunship": ((75, 100), (2.5, 14.5)),
+    "Devitt-Caine": ((45, 80), (2.5, 9.45)),
+    "Peltast": ((45, 80), (2.5, 9.45)),
+    "Skycaller": ((275, 350), (37.5, 60)),
+    "Rocket Battery": ((350, 400), (41.5, 57.7)),
+    "Wasp Nest": ((375, 450), (37.5, 60)),
+    "Hades' Net": ((300, 575), (35, 52)),
+    "O'Brien Squire": ((375, 500), (39, 51)),
+    "r-17 Skirmisher": ((375, 500), (37, 51)),
+}
+
+
+class FireSolution(NamedTuple):
+    distance: np.ndarray
+    azimuth: np.ndarray
+    in_range: np.ndarray
+    spread: np.ndarray
+
+
+def polar_to_xy(distance, azimuth):
+    a = np.deg2rad(azimuth)
+    d = np.asarray(distance, dtype=float)
+    return d * np.sin(a), d * np.cos(a)
+
+
+def xy_to_polar(x, y):
+    return np.hypot(x, y), np.degrees(np.arctan2(x, y)) % 360
+
+
+def spread_radius(distance, weapon):
+    # linear interpolation of the spread between min_d and max_d, clamped; a
+    # catalog weapon (catalog.py) reads its precomputed table instead
+    (min_d, max_d), (min_r, max_r) = weapon
+    lut = getattr(weapon, 'lut', None)
+    if lut is not None:
+        if weapon.table is not None and isinstance(distance, float) and distance == distance:
+            # one weapon, one distance (the per-frame case): skip NumPy's call overhead
+            return weapon.table[round((min(max(distance, min_d), max_d) - min_d) / weapon.step)]
+        i = np.clip(np.rint((np.asarray(distance, dtype=float) - min_d) / weapon.step),
+                    0, lut.shape[1] - 1)
+        nan = np.isnan(i)
+        if nan.any():
+            # no spread for an unknown distance, as on the linear path
+            return np.where(nan, np.nan, lut[weapon.row, np.where(nan, 0, i).astype(np.intp)])
+        return lut[weapon.row, i.astype(np.intp)]
+    span = np.asarray(max_d - min_d, dtype=float)
+    d0 = np.clip(distance, min_d, max_d)
+    frac = np.divide(d0 - min_d, span, out=np.zeros(np.broadcast(d0, span).shape),
+                     where=span > 0)
+    return min_r + frac * (max_r - min_r)
+
+
+def in_range(distance, weapon):
+    (min_d, max_d), _ = weapon
+    return (distance >= min_d) & (distance <= max_d)
+
+
+def solve_pairs(team_xy, target_xy, weapon, correction=(0.0, 0.0)):
+    # row i of team_xy against row i of target_xy (numpy broadcasting applies),
+    # e.g. one streamed record per row; the weapon may also be per row
+    team_xy = np.asarray(team_xy, dtype=float)
+    aim = np.asarray(target_xy, dtype=float) + np.asarray(correction, dtype=float)
+    delta = aim - team_xy
+    dist, az = xy_to_polar(delta[..., 0], delta[..., 1])
+    return FireSolution(dist, az, in_range(dist, weapon), spread_radius(dist, weapon))
+
+
+def solve(team_xy, target_xy, weapon, correction=(0.0, 0.0)):
+    # team_xy (N, 2) against target_xy (M, 2) → every field is (N, M);
+    # a single team or target may be passed as a plain (2,) pair
+    team_xy = np.atleast_2d(np.asarray(team_xy, dtype=float))
+    target_xy = np.atleast_2d(np.asarray(target_xy, dtype=float))
+    return solve_pairs(team_xy[:, None, :], target_xy[None, :, :], weapon, correction)
+
@@ -0,0 +1,92 @@
+"""Grid-hash spatial index over map objects, for hover snapping.
+
+Objects are keyed by (kind, id) tuples, e.g. ('impact', 12) or
+('team', 'Team 3'), and bucketed into square cells. Insert, move and
+remove are O(1). A nearest query walks rings of cells outwards from the
+query point and stops once no closer object can remain, so its cost depends
+on the search radius, not on how many objects are indexed.
+"""
+import math
+
+
+class SpatialIndex:
+    def __init__(self, cell=5.0):
+        self.cell = cell
+        self.cells = {}
+        # key -> (x, y, cell)
+        self.items = {}
+        self.kinds = {}
+
+    def __len__(self):
+        return len(self.items)
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def cell_of(self, x, y):
+        return math.floor(x / self.cell), math.floor(y / self.cell)
+
+    def insert(self, key, x, y):
+        # also moves an existing key
+        c = self.cell_of(x, y)
+        old = self.items.get(key)
+        if old is not None:
+            if old[2] != c:
+                self.cells[old[2]].discard(key)
+        self.items[key] = (x, y, c)
+        self.cells.setdefault(c, set()).add(key)
+        self.kinds.setdefault(key[0], set()).add(key)
+
+    def remove(self, key):
+        x, y, c = self.items.pop(key)
+        self.cells[c].discard(key)
+        self.kinds[key[0]].discard(key)
+
+    def remove_kind(self, kind):
+        for key in list(self.kinds.get(kind, ())):
+            self.remove(key)
+
+    def position(self, key):
+        x, y, _ = self.items[key]
+        return x, y
+
+    def radius(self, x, y, r):
+        # keys within r of (x, y)
+        (i0, j0), (i1, j1) = self.cell_of(x - r, y - r), self.cell_of(x + r, y + r)
+        r2, found = r * r, []
+        for i in range(i0, i1 + 1):
+            for j in range(j0, j1 + 1):
+                for key in self.cells.get((i, j), ()):
+                    kx, ky, _ = self.items[key]
+                    if (kx - x) ** 2 + (ky - y) ** 2 <= r2:
+                        found.append(key)
+        return found
+
+    def nearest(self, x, y, max_dist):
+        # (key, distance) of the closest object within max_dist, or None
+        ci, cj = self.cell_of(x, y)
+        best, best_d2 = None, max_dist * max_dist
+        rings = int(math.ceil(max_dist / self.cell)) + 1
+        for ring in range(rings + 1):
+            # every cell of this ring is at least (ring - 1) cells away
+            if ring > 1 and ((ring - 1) * self.cell) ** 2 > best_d2:
+                break
+            for c in ring_cells(ci, cj, ring):
+                for key in self.cells.get(c, ()):
+                    kx, ky, _ = self.items[key]
+                    d2 = (kx - x) ** 2 + (ky - y) ** 2
+                    if d2 <= best_d2:
+                        best, best_d2 = key, d2
+        return None if best is None else (best, math.sqrt(best_d2))
+
+
+def ring_cells(ci, cj, ring):
+    if ring == 0:
+        yield ci, cj
+        return
+    for i in range(ci - ring, ci + ring + 1):
+        yield i, cj - ring
+        yield i, cj + ring
+    for j in range(cj - ring + 1, cj + ring):
+        yield ci - ring, j
+        yield ci + ring, j
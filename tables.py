@@ -0,0 +1,67 @@
+"""Columnar NumPy stores with a change counter.
+
+Versioned is the base of every store the scene and the background jobs watch
+(teams, queued targets, impacts). PolarTable holds named rows of
+spotter-relative positions, distance/azimuth like the GUI entries. A row at
+0 m / 0° has not been entered yet and counts as inactive.
+"""
+import numpy as np
+
+from solver import polar_to_xy
+
+
+class Versioned:
+    def __init__(self):
+        # bumped on every change; cheap dirty key for the scene
+        self.version = 0
+
+
+class PolarTable(Versioned):
+    # extra columns of a subclass: name -> default (which sets the dtype)
+    columns = {}
+
+    def __init__(self, capacity=8):
+        super().__init__()
+        self.names = []
+        self.defaults = dict(distance=0.0, azimuth=0.0, **self.columns)
+        for col, default in self.defaults.items():
+            setattr(self, col, np.full(capacity, default))
+
+    def __len__(self):
+        return len(self.names)
+
+    def add(self, name, distance=0.0, azimuth=0.0, **columns):
+        i = len(self.names)
+        values = dict(self.defaults, distance=distance, azimuth=azimuth, **columns)
+        if i == len(self.distance):
+            grow = max(i, 8)
+            for col, default in self.defaults.items():
+                setattr(self, col, np.concatenate((getattr(self, col), np.full(grow, default))))
+        self.names.append(name)
+        for col, value in values.items():
+            getattr(self, col)[i] = value
+        self.version += 1
+        return i
+
+    def remove(self, i):
+        n = len(self.names)
+        for col in self.defaults:
+            data = getattr(self, col)
+            data[i:n - 1] = data[i + 1:n]
+        del self.names[i]
+        self.version += 1
+
+    def set(self, i, **columns):
+        # columns passed as None are left as they are
+        for col, value in columns.items():
+            if value is not None:
+                getattr(self, col)[i] = value
+        self.version += 1
+
+    def xy(self):
+        n = len(self.names)
+        return np.stack(polar_to_xy(self.distance[:n], self.azimuth[:n]), axis=-1)
+
+    def active(self):
+        n = len(self.names)
+        return (self.distance[:n] != 0) | (self.azimuth[:n] != 0)
@@ -0,0 +1,21 @@
+"""Firing teams held as columnar NumPy arrays (see tables.PolarTable)."""
+from tables import PolarTable
+
+
+class TeamTable(PolarTable):
+    columns = {'show_range': True}
+
+    def __init__(self, capacity=8):
+        super().__init__(capacity)
+        self.colors = []
+
+    def add(self, name, color, distance=0.0, azimuth=0.0, show_range=True):
+        self.colors.append(color)
+        return super().add(name, distance, azimuth, show_range=show_range)
+
+    def remove(self, i):
+        del self.colors[i]
+        super().remove(i)
+
+    def ranges_shown(self):
+        return self.show_range[:len(self.names)]
@@ -0,0 +1,150 @@
+"""Tiled, memory-mapped map background with a level-of-detail pyramid.
+
+    python app.py tiles deadlands.png maps/deadlands --mpp 1.5
+    python app.py --map maps/deadlands --map-spotter 812 -430
+
+`tiles` slices a region image once into a pyramid: level 0 is full
+resolution and every further level halves it, down to a single tile. Each
+level is one .npy file of RGBA tiles laid out tile by tile, (rows, cols,
+tile, tile, 4), so a tile is one contiguous read. The GUI memory-maps the
+levels and only copies out the tiles under the current view, at the level
+closest to the screen resolution, through an LRU cache with a byte cap.
+
+Map coordinates are metres, x east and y north, with the image's top-left
+corner at --origin. The spotter's map position turns them into the
+spotter-relative frame of the plot.
+"""
+import json
+import math
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+TILE = 256
+META = 'pyramid.json'
+
+
+def tile_grid(height, width, tile):
+    return -(-height // tile), -(-width // tile)
+
+
+def build(image_path, out_dir, mpp, origin=(0.0, 0.0), tile=TILE):
+    # reads the source image once; every level after the first is built
+    # from the previous memory-mapped level, one row of tiles at a time
+    from PIL import Image
+    Image.MAX_IMAGE_PIXELS = None
+    with Image.open(image_path) as img:
+        src = np.asarray(img.convert('RGBA'))
+    os.makedirs(out_dir, exist_ok=True)
+
+    height, width = src.shape[:2]
+    rows, cols = tile_grid(height, width, tile)
+    level = np.lib.format.open_memmap(os.path.join(out_dir, 'level0.npy'), mode='w+',
+                                      dtype=np.uint8, shape=(rows, cols, tile, tile, 4))
+    for r in range(rows):
+        band = src[r * tile:(r + 1) * tile]
+        for c in range(cols):
+            block = band[:, c * tile:(c + 1) * tile]
+            level[r, c] = 0
+            level[r, c, :block.shape[0], :block.shape[1]] = block
+    del src
+    levels = [(height, width)]
+
+    while rows > 1 or cols > 1:
+        height, width = -(-height // 2), -(-width // 2)
+        prev, (rows, cols) = level, tile_grid(height, width, tile)
+        path = os.path.join(out_dir, f'level{len(levels)}.npy')
+        level = np.lib.format.open_memmap(path, mode='w+', dtype=np.uint8,
+                                          shape=(rows, cols, tile, tile, 4))
+        block = np.zeros((2 * tile, 2 * tile, 4), dtype=np.uint16)
+        for r in range(rows):
+            for c in range(cols):
+                # 2x2 parent tiles → one tile, by averaging 2x2 pixel blocks
+                block[:] = 0
+                for dr in range(2):
+                    for dc in range(2):
+                        pr, pc = 2 * r + dr, 2 * c + dc
+                        if pr < prev.shape[0] and pc < prev.shape[1]:
+                            block[dr * tile:(dr + 1) * tile, dc * tile:(dc + 1) * tile] = prev[pr, pc]
+                level[r, c] = ((block[0::2, 0::2] + block[1::2, 0::2] + block[0::2, 1::2]
+                                + block[1::2, 1::2] + 2) // 4).astype(np.uint8)
+        prev.flush()
+        levels.append((height, width))
+    level.flush()
+
+    meta = {'tile': tile, 'mpp': mpp, 'origin': list(origin), 'levels': levels}
+    with open(os.path.join(out_dir, META), 'w') as f:
+        json.dump(meta, f, indent=1)
+    return meta
+
+
+class TileCache:
+    # least recently used tiles, evicted once their total size passes max_bytes
+    def __init__(self, max_bytes=64 << 20):
+        self.max_bytes = max_bytes
+        self.tiles = OrderedDict()
+        self.bytes = 0
+        self.hits = self.misses = 0
+
+    def get(self, key, load):
+        tile = self.tiles.get(key)
+        if tile is not None:
+            self.tiles.move_to_end(key)
+            self.hits += 1
+            return tile
+        self.misses += 1
+        tile = self.tiles[key] = load()
+        self.bytes += tile.nbytes
+        while self.bytes > self.max_bytes and len(self.tiles) > 1:
+            _, old = self.tiles.popitem(last=False)
+            self.bytes -= old.nbytes
+        return tile
+
+
+class TilePyramid:
+    def __init__(self, path, cache_bytes=64 << 20):
+        with open(os.path.join(path, META)) as f:
+            meta = json.load(f)
+        self.tile = meta['tile']
+        self.mpp = meta['mpp']
+        self.x0, self.y0 = meta['origin']
+        self.sizes = [tuple(s) for s in meta['levels']]
+        # memory-mapped: nothing is read until a tile is copied out
+        self.levels = [np.load(os.path.join(path, f'level{i}.npy'), mmap_mode='r')
+                       for i in range(len(self.sizes))]
+        self.cache = TileCache(cache_bytes)
+
+    def level_for(self, m_per_px):
+        # the level whose resolution is nearest the screen's
+        level = math.floor(math.log2(max(m_per_px / self.mpp, 1.0)) + 0.5)
+        return min(level, len(self.levels) - 1)
+
+    def visible(self, bounds, px_width, spotter=(0.0, 0.0)):
+        # (level, rows, cols) of the tiles under the view; bounds are
+        # spotter-relative (x0, x1, y0, y1), rows/cols half-open ranges
+        x0, x1, y0, y1 = bounds
+        level = self.level_for((x1 - x0) / max(px_width, 1.0))
+        span = self.mpp * 2 ** level * self.tile
+        n_rows, n_cols = self.levels[level].shape[:2]
+        sx, sy = spotter
+        c0 = max(int((x0 + sx - self.x0) // span), 0)
+        c1 = min(int((x1 + sx - self.x0) // span) + 1, n_cols)
+        r0 = max(int((self.y0 - (y1 + sy)) // span), 0)
+        r1 = min(int((self.y0 - (y0 + sy)) // span) + 1, n_rows)
+        return level, (r0, max(r1, r0)), (c0, max(c1, c0))
+
+    def mosaic(self, level, rows, cols):
+        # the tiles as one RGBA image, and its extent (left, right, bottom, top)
+        # in map metres
+        (r0, r1), (c0, c1), t = rows, cols, self.tile
+        out = np.zeros(((r1 - r0) * t, (c1 - c0) * t, 4), dtype=np.uint8)
+        tiles = self.levels[level]
+        for r in range(r0, r1):
+            for c in range(c0, c1):
+                out[(r - r0) * t:(r - r0 + 1) * t, (c - c0) * t:(c - c0 + 1) * t] = \
+                    self.cache.get((level, r, c), lambda: np.array(tiles[r, c]))
+        span = self.mpp * 2 ** level * t
+        extent = (self.x0 + c0 * span, self.x0 + c1 * span,
+                  self.y0 - r1 * span, self.y0 - r0 * span)
+        return out, extent
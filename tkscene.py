@@ -0,0 +1,516 @@
+"""Retained-mode map scene drawn with native tk.Canvas items.
+
+The same elements and inputs as scene.py, on the same retained core
+(retained.py), but instead of matplotlib artists each element owns canvas
+items that it moves with `coords` and restyles with `itemconfig`. Tk
+repaints only the damaged regions, so there is no Agg raster and no
+full-image copy per frame.
+
+Items placed in map metres are tagged 'world'. When the view zooms or pans,
+one `scale`/`move` on that tag re-projects all of them inside Tk; elements
+only touch the items whose data changed. Markers are small images and labels
+are text, so they keep their pixel size while their anchors move. Raster
+layers (map tiles, coverage) are resampled to the canvas whenever the view
+changes.
+"""
+import base64
+import math
+import struct
+import zlib
+
+import numpy as np
+
+from retained import Element as RetainedElement, Scene as RetainedScene
+
+WORLD = 'world'
+# stacking order, bottom to top
+LAYERS = ('map', 'coverage', 'grid', 'areas', 'lines', 'markers', 'labels', 'legend', 'overlay')
+# marker images: (shape, size in px)
+SPOTTER = ('o', 10)
+TARGET = ('X', 13)
+TEAM = ('^', 10)
+QUEUED = ('x', 9)
+IMPACT = ('D', 8)
+MPI = ('+', 14)
+# coverage colour ramp (viridis stops) and opacity
+RAMP = np.array([(68, 1, 84), (59, 82, 139), (33, 145, 140), (94, 201, 98), (253, 231, 37)])
+COVERAGE_ALPHA = 89
+
+
+def png(rgba):
+    # RGBA PNG without row filters; Tk 8.6 reads it natively, alpha included
+    h, w = rgba.shape[:2]
+    raw = np.zeros((h, w * 4 + 1), dtype=np.uint8)
+    raw[:, 1:] = rgba.reshape(h, -1)
+
+    def chunk(tag, data):
+        return (struct.pack('>I', len(data)) + tag + data
+                + struct.pack('>I', zlib.crc32(tag + data) & 0xffffffff))
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', w, h, 8, 6, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(raw.tobytes(), 1)) + chunk(b'IEND', b''))
+
+
+def png_photo(master, rgba):
+    import tkinter
+    return tkinter.PhotoImage(master=master, data=base64.b64encode(png(rgba)).decode('ascii'),
+                              format='png')
+
+
+def marker_mask(shape, size):
+    # boolean (size, size) mask of a marker, v pointing up
+    c = (np.arange(size) + 0.5) / size * 2 - 1
+    u, v = c[None, :], -c[:, None]
+    if shape == 'o':
+        return u * u + v * v <= 1
+    if shape == '^':
+        return v <= 1 - 2 * np.abs(u)
+    if shape == 'D':
+        return np.abs(u) + np.abs(v) <= 1
+    if shape in ('X', 'x'):
+        width = 0.35 if shape == 'X' else 0.2
+        return (np.abs(u - v) <= width) | (np.abs(u + v) <= width)
+    if shape == '+':
+        return (np.abs(u) <= 0.12) | (np.abs(v) <= 0.12)
+    raise ValueError(f'unknown marker {shape!r}')
+
+
+def nice_step(span, ticks=6):
+    # grid spacing of 1, 2, 2.5 or 5 × 10^k giving about `ticks` lines
+    raw = span / ticks
+    base = 10 ** math.floor(math.log10(raw))
+    return next(base * m for m in (1, 2, 2.5, 5, 10) if base * m >= raw)
+
+
+class Element(RetainedElement):
+    # set on elements drawn in pixels over the whole view, which must be
+    # redone whenever the view moves
+    raster = False
+
+
+def pool(scene, items, n, factory):
+    # grow a list of canvas items to at least n, hiding the ones past n
+    canvas = scene.canvas
+    while len(items) < n:
+        items.append(factory())
+    for item in items[n:]:
+        canvas.itemconfig(item, state='hidden')
+    return items[:n]
+
+
+class ViewElement(Element):
+    # re-projects the world items, then redraws the grid and its labels
+    def create(self):
+        self.lines = []
+        self.labels = []
+
+    def update(self, x0, x1, y0, y1):
+        scene, canvas = self.scene, self.scene.canvas
+        scene.set_view((x0, x1, y0, y1))
+        for el in scene.elements.values():
+            if el.raster:
+                el.inputs = None
+        w, h = scene.size
+        step = nice_step(max(x1 - x0, y1 - y0))
+        xs = np.arange(math.ceil(x0 / step), math.floor(x1 / step) + 1) * step
+        ys = np.arange(math.ceil(y0 / step), math.floor(y1 / step) + 1) * step
+        px, _ = scene.to_px(xs, np.zeros_like(xs))
+        _, py = scene.to_px(np.zeros_like(ys), ys)
+        ends = [(x, 0, x, h) for x in px.tolist()] + [(0, y, w, y) for y in py.tolist()]
+        texts = ([(x, h - 2, 's', f'{v:g}') for x, v in zip(px.tolist(), xs.tolist())]
+                 + [(2, y, 'w', f'{v:g}') for y, v in zip(py.tolist(), ys.tolist())])
+        lines = pool(scene, self.lines, len(ends), lambda: scene.add(canvas.create_line(
+            0, 0, 0, 0, fill='gray', dash=(4, 4)), 'grid'))
+        for item, coords in zip(lines, ends):
+            canvas.coords(item, *coords)
+            canvas.itemconfig(item, state='normal')
+        labels = pool(scene, self.labels, len(texts), lambda: scene.add(canvas.create_text(
+            0, 0, fill='white', font=('TkDefaultFont', 8)), 'grid'))
+        for item, (x, y, anchor, text) in zip(labels, texts):
+            canvas.coords(item, x, y)
+            canvas.itemconfig(item, text=text, anchor=anchor, state='normal')
+        scene.touched(len(ends) + len(texts))
+
+
+class MapElement(Element):
+    # tiled background resampled to the canvas; the mosaic itself is only
+    # rebuilt when the set of tiles changes
+    raster = True
+
+    def create(self):
+        self.item = self.scene.add(self.scene.canvas.create_image(
+            0, 0, anchor='nw', state='hidden'), 'map')
+        self.photo = None
+        self.key = self.mosaic = None
+
+    def update(self, pyramid, level, rows, cols, spotter):
+        scene = self.scene
+        if (level, rows, cols) != self.key:
+            self.key = (level, rows, cols)
+            self.mosaic = pyramid.mosaic(level, rows, cols)
+        data, (left, right, bottom, top) = self.mosaic
+        if not data.size:
+            scene.canvas.itemconfig(self.item, state='hidden')
+            scene.touched()
+            return
+        # nearest-neighbour lookup of every canvas pixel in the mosaic
+        (x0, x1, y0, y1), (w, h), (sx, sy) = scene.bounds, scene.size, spotter
+        xs = x0 + sx + (np.arange(w) + 0.5) * (x1 - x0) / w
+        ys = y1 + sy - (np.arange(h) + 0.5) * (y1 - y0) / h
+        c = np.floor((xs - left) / (right - left) * data.shape[1]).astype(int)
+        r = np.floor((top - ys) / (top - bottom) * data.shape[0]).astype(int)
+        cv, rv = (c >= 0) & (c < data.shape[1]), (r >= 0) & (r < data.shape[0])
+        out = np.zeros((h, w, 4), dtype=np.uint8)
+        out[np.ix_(rv, cv)] = data[r[rv]][:, c[cv]]
+        self.photo = scene.photo(out)
+        scene.canvas.itemconfig(self.item, image=self.photo, state='normal')
+        scene.touched()
+
+
+class CoverageElement(Element):
+    # optional heatmap of how many teams reach each cell of the view
+    raster = True
+
+    def create(self):
+        self.item = self.scene.add(self.scene.canvas.create_image(
+            0, 0, anchor='nw', state='hidden'), 'coverage')
+        self.photo = None
+
+    def update(self, visible, serial, shown):
+        # shown: the app's latest finished (grid, extent, teams), as in scene.py
+        scene = self.scene
+        if not visible or shown is None:
+            scene.canvas.itemconfig(self.item, state='hidden')
+            scene.touched()
+            return
+        grid, extent, n_teams = shown
+        # same colour limits as the matplotlib overlay; cells no team reaches
+        # stay see-through
+        t = (np.arange(n_teams + 1) - 0.5) / max(n_teams, 1)
+        stops = np.linspace(0, 1, len(RAMP))
+        lut = np.zeros((len(t), 4), dtype=np.uint8)
+        for k in range(3):
+            lut[:, k] = np.interp(t, stops, RAMP[:, k])
+        lut[1:, 3] = COVERAGE_ALPHA
+        # placed where its cells lie in the current view: the grid can be a
+        # frame or two older than the view while the next one is computed
+        x0, x1, y0, y1 = extent
+        (left, top), (right, bottom) = scene.to_px(x0, y1), scene.to_px(x1, y0)
+        w, h = int(round(right - left)), int(round(bottom - top))
+        if not (0 < w <= 4 * scene.size[0] and 0 < h <= 4 * scene.size[1]):
+            scene.canvas.itemconfig(self.item, state='hidden')
+            scene.touched()
+            return
+        cols = np.arange(w) * grid.shape[1] // w
+        rows = np.arange(h) * grid.shape[0] // h
+        self.photo = scene.photo(lut[grid[::-1][rows][:, cols]])
+        scene.canvas.coords(self.item, left, top)
+        scene.canvas.itemconfig(self.item, image=self.photo, state='normal')
+        scene.touched()
+
+
+class SpotterElement(Element):
+    def create(self):
+        scene = self.scene
+        self.marker = scene.add(scene.canvas.create_image(
+            *scene.to_px(0.0, 0.0), image=scene.sprite(*SPOTTER, 'white'), tags=WORLD),
+            'markers')
+        scene.legend('Spotter', SPOTTER, 'white', True)
+
+
+class TargetElement(Element):
+    def create(self):
+        scene, canvas = self.scene, self.scene.canvas
+        self.line = scene.add(canvas.create_line(
+            0, 0, 0, 0, fill='white', dash=(2, 4), tags=WORLD), 'lines')
+        self.marker = scene.add(canvas.create_image(
+            0, 0, image=scene.sprite(*TARGET, 'red'), tags=WORLD), 'markers')
+        scene.legend('Target', TARGET, 'red', True)
+
+    def update(self, tx, ty):
+        scene = self.scene
+        (ox, oy), (px, py) = scene.to_px(0.0, 0.0), scene.to_px(tx, ty)
+        scene.canvas.coords(self.line, ox, oy, px, py)
+        scene.canvas.coords(self.marker, px, py)
+        scene.touched(2)
+
+
+class TeamsElement(Element):
+    # per team: a marker, a label, an aim line to the target and two dashed
+    # circles for the min_d→max_d band. Off-canvas items cost Tk nothing, so
+    # there is no culling; each part is redone only when its inputs change
+    def create(self):
+        self.markers, self.labels, self.lines, self.annuli = [], [], [], []
+        self.keys = (None, None, None)
+        self.scene.legend('Teams', TEAM, 'white', False)
+
+    def update(self, teams, version, tx, ty, min_d, max_d, view):
+        scene, canvas = self.scene, self.scene.canvas
+        old_version, old_target, old_weapon = self.keys
+        self.keys = (version, (tx, ty), (min_d, max_d))
+        active = teams.active()
+        xy = teams.xy()[active]
+        colors = [c for c, a in zip(teams.colors, active) if a]
+        px, py = scene.to_px(xy[:, 0], xy[:, 1])
+        px, py = px.tolist(), py.tolist()
+
+        if version != old_version:
+            names = [n for n, a in zip(teams.names, active) if a]
+            markers = pool(scene, self.markers, len(xy), lambda: scene.add(canvas.create_image(
+                0, 0, tags=WORLD), 'markers'))
+            labels = pool(scene, self.labels, len(xy), lambda: scene.add(canvas.create_text(
+                0, 0, anchor='sw', font=('TkDefaultFont', 7), tags=WORLD), 'labels'))
+            for marker, label, x, y, name, color in zip(markers, labels, px, py, names, colors):
+                canvas.coords(marker, x, y)
+                canvas.itemconfig(marker, image=scene.sprite(*TEAM, color), state='normal')
+                canvas.coords(label, x, y)
+                canvas.itemconfig(label, text=' ' + name.split()[-1], fill=color, state='normal')
+            scene.legend('Teams', TEAM, colors[0] if colors else 'white', len(xy) > 0)
+            scene.touched(2 * len(xy))
+
+        if version != old_version or (tx, ty) != old_target:
+            lines = pool(scene, self.lines, len(xy), lambda: scene.add(canvas.create_line(
+                0, 0, 0, 0, dash=(2, 4), tags=WORLD), 'lines'))
+            gx, gy = scene.to_px(tx, ty)
+            for line, x, y, color in zip(lines, px, py, colors):
+                canvas.coords(line, x, y, gx, gy)
+                canvas.itemconfig(line, fill=color, state='normal')
+            scene.touched(len(xy))
+
+        if version != old_version or (min_d, max_d) != old_weapon:
+            shown = teams.ranges_shown()[active]
+            rings = [(x, y, c) for (x, y), c, s in zip(xy.tolist(), colors, shown) if s]
+            annuli = pool(scene, self.annuli, 2 * len(rings), lambda: scene.add(canvas.create_oval(
+                0, 0, 0, 0, dash=(6, 4), tags=WORLD), 'areas'))
+            for k, (x, y, color) in enumerate(rings):
+                for item, r in zip(annuli[2 * k:2 * k + 2], (max_d, min_d)):
+                    canvas.coords(item, *scene.circle(x, y, r))
+                    canvas.itemconfig(item, outline=color, state='normal' if r > 0 else 'hidden')
+            scene.touched(2 * len(rings))
+
+
+class MissionsElement(Element):
+    # queued target markers, and a line from each to its assigned team
+    def create(self):
+        self.markers, self.lines = [], []
+        self.scene.legend('Queued targets', QUEUED, 'red', False)
+
+    def update(self, targets, version, teams, teams_version, assigned):
+        scene, canvas = self.scene, self.scene.canvas
+        target_xy = targets.xy()[targets.active()]
+        px, py = scene.to_px(target_xy[:, 0], target_xy[:, 1])
+        markers = pool(scene, self.markers, len(target_xy), lambda: scene.add(canvas.create_image(
+            0, 0, image=scene.sprite(*QUEUED, 'red'), tags=WORLD), 'markers'))
+        for item, x, y in zip(markers, px.tolist(), py.tolist()):
+            canvas.coords(item, x, y)
+            canvas.itemconfig(item, state='normal')
+        team_xy, xy = teams.xy(), targets.xy()
+        pairs = [(t, i) for i, t in enumerate(assigned) if t >= 0]
+        lines = pool(scene, self.lines, len(pairs), lambda: scene.add(canvas.create_line(
+            0, 0, 0, 0, tags=WORLD), 'lines'))
+        for item, (t, i) in zip(lines, pairs):
+            canvas.coords(item, *scene.to_px(*team_xy[t]), *scene.to_px(*xy[i]))
+            canvas.itemconfig(item, fill=teams.colors[t], state='normal')
+        scene.legend('Queued targets', QUEUED, 'red', len(target_xy) > 0)
+        scene.touched(len(target_xy) + len(pairs))
+
+
+class RingsElement(Element):
+    # green/orange rings at the target; stipple stands in for transparency
+    def create(self):
+        scene, canvas = self.scene, self.scene.canvas
+        self.outer = scene.add(canvas.create_oval(
+            0, 0, 0, 0, fill='orange', stipple='gray25', outline='', tags=WORLD), 'areas')
+        self.inner = scene.add(canvas.create_oval(
+            0, 0, 0, 0, fill='green', stipple='gray50', outline='', tags=WORLD), 'areas')
+
+    def update(self, tx, ty, inner_r, outer_r, visible=True):
+        scene, canvas = self.scene, self.scene.canvas
+        state = 'normal' if visible else 'hidden'
+        canvas.coords(self.outer, *scene.circle(tx, ty, outer_r))
+        canvas.coords(self.inner, *scene.circle(tx, ty, inner_r))
+        canvas.itemconfig(self.outer, state=state)
+        canvas.itemconfig(self.inner, state=state)
+        scene.touched(2)
+
+
+class ImpactsElement(Element):
+    # one marker per impact, added as shots arrive and deleted as the ring
+    # buffer drops them; only the most recent impacts get a number label
+    def __init__(self, scene, max_labels=20):
+        self.max_labels = max_labels
+        super().__init__(scene)
+
+    def create(self):
+        # (shot number, item), oldest first
+        self.items = []
+        self.labels = []
+        self.seen = (None, 0)
+
+    def update(self, store, version, view):
+        scene, canvas = self.scene, self.scene.canvas
+        generation, done = self.seen
+        if generation != store.generation:
+            for _, item in self.items:
+                canvas.delete(item)
+            self.items = []
+            done = 0
+        total, kept = store.total, len(store)
+        if total == done and generation == store.generation:
+            return
+        self.seen = (store.generation, total)
+        sprite = scene.sprite(*IMPACT, 'yellow')
+        xy, numbers = store.recent(min(total - done, kept))
+        added = len(xy)
+        px, py = scene.to_px(xy[:, 0], xy[:, 1])
+        for x, y, n in zip(px.tolist(), py.tolist(), numbers.tolist()):
+            self.items.append((n, scene.add(canvas.create_image(
+                x, y, image=sprite, tags=WORLD), 'markers')))
+        # shots the ring buffer has dropped
+        drop = next((k for k, (n, _) in enumerate(self.items) if n > total - kept), len(self.items))
+        for _, item in self.items[:drop]:
+            canvas.delete(item)
+        del self.items[:drop]
+
+        xy, numbers = store.recent(self.max_labels)
+        px, py = scene.to_px(xy[:, 0], xy[:, 1])
+        labels = pool(scene, self.labels, len(xy), lambda: scene.add(canvas.create_text(
+            0, 0, fill='black', font=('TkDefaultFont', 8), tags=WORLD), 'labels'))
+        for label, x, y, n in zip(labels, px.tolist(), py.tolist(), numbers.tolist()):
+            canvas.coords(label, x, y)
+            canvas.itemconfig(label, text=str(n), state='normal')
+        scene.touched(added + len(xy))
+
+
+class DispersionElement(Element):
+    # mean point of impact, 50% dispersion ellipse and CEP readout
+    def create(self):
+        scene, canvas = self.scene, self.scene.canvas
+        self.ellipse = scene.add(canvas.create_polygon(
+            0, 0, 0, 0, 0, 0, fill='', outline='white', dash=(6, 4), smooth=True,
+            state='hidden', tags=WORLD), 'areas')
+        self.marker = scene.add(canvas.create_image(
+            0, 0, image=scene.sprite(*MPI, 'white'), state='hidden', tags=WORLD), 'markers')
+        self.label = scene.add(canvas.create_text(
+            0, 0, fill='white', anchor='nw', font=('TkDefaultFont', 8), state='hidden',
+            tags=WORLD), 'labels')
+        scene.legend('MPI', MPI, 'white', False)
+
+    def update(self, visible, mx, my, width, height, angle, cep):
+        scene, canvas = self.scene, self.scene.canvas
+        for item in (self.ellipse, self.marker, self.label):
+            canvas.itemconfig(item, state='normal' if visible else 'hidden')
+        scene.legend('MPI', MPI, 'white', visible)
+        if visible:
+            t = np.linspace(0, 2 * np.pi, 48, endpoint=False)
+            a = np.radians(angle)
+            ex, ey = width / 2 * np.cos(t), height / 2 * np.sin(t)
+            px, py = scene.to_px(mx + ex * np.cos(a) - ey * np.sin(a),
+                                 my + ex * np.sin(a) + ey * np.cos(a))
+            canvas.coords(self.ellipse, *np.column_stack((px, py)).ravel().tolist())
+            x, y = scene.to_px(mx, my)
+            canvas.coords(self.marker, x, y)
+            canvas.coords(self.label, x, y)
+            canvas.itemconfig(self.label, text=f" CEP {cep:.1f} m")
+        scene.touched(3)
+
+
+class LegendElement(Element):
+    # rebuilt only when the set of visible labelled elements changes
+    def create(self):
+        self.items = []
+
+    def update(self, labels):
+        scene, canvas = self.scene, self.scene.canvas
+        for item in self.items:
+            canvas.delete(item)
+        self.items = []
+        if not labels:
+            return
+        right, top, row = scene.size[0] - 8, 8, 16
+        box = scene.add(canvas.create_rectangle(
+            right - 110, top, right, top + 6 + row * len(labels),
+            fill='#2b2b2b', outline='gray'), 'legend')
+        self.items.append(box)
+        for k, label in enumerate(labels):
+            (shape, size), color, _ = scene.legend_entries[label]
+            y = top + 3 + row * (k + 0.5)
+            self.items.append(scene.add(canvas.create_image(
+                right - 98, y, image=scene.sprite(shape, size, color)), 'legend'))
+            self.items.append(scene.add(canvas.create_text(
+                right - 86, y, text=label, anchor='w', fill='white',
+                font=('TkDefaultFont', 8)), 'legend'))
+
+
+class Scene(RetainedScene):
+    def __init__(self, canvas, size, photo=None):
+        super().__init__()
+        self.canvas = canvas
+        # image factory for RGBA arrays; canvas stand-ins may bring their own
+        self.photo = photo or (lambda rgba: png_photo(canvas, rgba))
+        self.size = size
+        self.bounds = (-1.0, 1.0, -1.0, 1.0)
+        self.sprites = {}
+        # label -> (marker, colour, visible), in legend order
+        self.legend_entries = {}
+        # one hidden item on top of each layer; new items go just below it
+        self.tops = {layer: canvas.create_line(0, 0, 0, 0, state='hidden') for layer in LAYERS}
+
+    def add(self, item, layer):
+        self.canvas.tag_lower(item, self.tops[layer])
+        self.created += 1
+        return item
+
+    def scale(self):
+        x0, x1, y0, y1 = self.bounds
+        w, h = self.size
+        return w / (x1 - x0), h / (y1 - y0)
+
+    def to_px(self, x, y):
+        # map metres to canvas pixels (y down); scalars or arrays
+        x0, _, _, y1 = self.bounds
+        kx, ky = self.scale()
+        return (x - x0) * kx, (y1 - y) * ky
+
+    def to_world(self, px, py):
+        x0, _, _, y1 = self.bounds
+        kx, ky = self.scale()
+        return x0 + px / kx, y1 - py / ky
+
+    def circle(self, x, y, r):
+        # bounding box of a circle, for create_oval/coords
+        (px, py), (kx, ky) = self.to_px(x, y), self.scale()
+        return px - r * kx, py - r * ky, px + r * kx, py + r * ky
+
+    def set_view(self, bounds, size=None):
+        # move every world item from the old projection to the new one
+        (ox0, _, _, oy1), (okx, oky) = self.bounds, self.scale()
+        self.bounds, self.size = bounds, size or self.size
+        (nx0, _, _, ny1), (nkx, nky) = self.bounds, self.scale()
+        if (ox0, oy1, okx, oky) != (nx0, ny1, nkx, nky):
+            self.canvas.scale(WORLD, 0, 0, nkx / okx, nky / oky)
+            self.canvas.move(WORLD, (ox0 - nx0) * nkx, (ny1 - oy1) * nky)
+
+    def resize(self, width, height):
+        # world items follow at once; everything else is redone next frame
+        self.set_view(self.bounds, (max(width, 1), max(height, 1)))
+        for el in self.elements.values():
+            el.inputs = None
+
+    def sprite(self, shape, size, color):
+        # marker image, cached per shape, size and colour
+        key = (shape, size, color)
+        image = self.sprites.get(key)
+        if image is None:
+            rgb = [c >> 8 for c in self.canvas.winfo_rgb(color)]
+            rgba = np.zeros((size, size, 4), dtype=np.uint8)
+            mask = marker_mask(shape, size)
+            rgba[mask] = rgb + [255]
+            image = self.sprites[key] = self.photo(rgba)
+        return image
+
+    def legend(self, label, marker, color, visible):
+        self.legend_entries[label] = (marker, color, bool(visible))
+
+    def sync_legend(self):
+        labels = tuple(label for label, (_, _, visible) in self.legend_entries.items() if visible)
+        self.sync('legend', LegendElement, (labels,))
@@ -0,0 +1,80 @@
+"""Map viewport: auto-fit, zoom and pan, plus visibility tests for culling.
+
+The view is a square in map metres, kept as a centre and a half-size. Until
+the user zooms or pans it follows the spotter, target and teams; Fit view
+turns that back on. Bounds are (x0, x1, y0, y1) tuples, cheap to compare as
+scene dirty keys.
+"""
+import numpy as np
+
+
+class Viewport:
+    def __init__(self, default_half=110.0, min_half=5.0, max_half=2000.0):
+        self.default_half = default_half
+        self.min_half = min_half
+        self.max_half = max_half
+        self.cx = self.cy = 0.0
+        self.half = default_half
+        self.auto = True
+
+    def bounds(self):
+        return (self.cx - self.half, self.cx + self.half,
+                self.cy - self.half, self.cy + self.half)
+
+    def fit(self, xy, pad=10.0, min_half=30.0):
+        # smallest square around the points with a margin; the default view
+        # while nothing but the spotter is on the map
+        xy = np.asarray(xy, dtype=float).reshape(-1, 2)
+        if not np.any(xy):
+            self.cx = self.cy = 0.0
+            self.half = self.default_half
+            return
+        lo, hi = xy.min(axis=0), xy.max(axis=0)
+        self.cx, self.cy = ((lo + hi) / 2).tolist()
+        half = float((hi - lo).max()) / 2
+        self.half = min(max(half * 1.1 + pad, min_half), self.max_half)
+
+    def zoom(self, factor, x, y):
+        # scale about (x, y) so the point under the cursor stays put
+        half = min(max(self.half * factor, self.min_half), self.max_half)
+        factor = half / self.half
+        self.cx = x + (self.cx - x) * factor
+        self.cy = y + (self.cy - y) * factor
+        self.half = half
+        self.auto = False
+
+    def pan_to(self, cx, cy):
+        self.cx, self.cy = cx, cy
+        self.auto = False
+
+
+def rect_distance(x, y, bounds):
+    # distance from each point to the nearest point of the view (0 inside)
+    x0, x1, y0, y1 = bounds
+    dx = np.maximum(np.maximum(x0 - x, x - x1), 0.0)
+    dy = np.maximum(np.maximum(y0 - y, y - y1), 0.0)
+    return np.hypot(dx, dy)
+
+
+def corner_distance(x, y, bounds):
+    # distance from each point to the farthest corner of the view
+    x0, x1, y0, y1 = bounds
+    return np.hypot(np.maximum(np.abs(x - x0), np.abs(x - x1)),
+                    np.maximum(np.abs(y - y0), np.abs(y - y1)))
+
+
+def circles_visible(x, y, r, bounds):
+    return rect_distance(x, y, bounds) <= r
+
+
+def annuli_visible(x, y, r_in, r_out, bounds):
+    # the ring crosses the view unless the view is wholly outside the outer
+    # circle or wholly inside the hole
+    return (rect_distance(x, y, bounds) <= r_out) & (corner_distance(x, y, bounds) >= r_in)
+
+
+def points_visible(xy, bounds, margin=0.0):
+    x0, x1, y0, y1 = bounds
+    x, y = xy[:, 0], xy[:, 1]
+    return ((x >= x0 - margin) & (x <= x1 + margin) &
+            (y >= y0 - margin) & (y <= y1 + margin))
@@ -0,0 +1,135 @@
+"""Background jobs: heavy analyses and the Agg raster off the Tk thread.
+
+    python app.py --workers 0     # compute everything on the Tk thread
+
+Every job has a key ('hitprob', 'coverage', ...). Jobs with the same key run
+one at a time on a thread pool. A job submitted while its key is busy waits
+for it, replacing any job already waiting, so a burst of edits computes the
+first and the newest input only. A finished job's result is handed to its
+callback on the Tk thread, through a queue polled with root.after, unless a
+newer job with the same key was submitted meanwhile; stale results are
+dropped. Since a key's jobs never overlap, the state they use (a cache, an
+incremental solver) needs no lock as long as only that key's jobs touch it.
+
+NumPy releases the GIL inside its array loops, so most of a job runs in
+parallel with the Tk thread, which keeps handling input meanwhile.
+"""
+import queue
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Worker:
+    def __init__(self, root, threads=2, profiler=None, poll_ms=4):
+        # threads=0 runs every job inline, inside submit()
+        self.root = root
+        self.threads = threads
+        self.pool = ThreadPoolExecutor(threads, thread_name_prefix='worker') if threads else None
+        self.profiler = profiler
+        self.poll_ms = poll_ms
+        # key -> newest submitted generation, running job, its pool future,
+        # job waiting on it
+        self.generation = {}
+        self.running = {}
+        self.futures = {}
+        self.waiting = {}
+        # (key, job, result, error, t0, t1) from the pool threads
+        self.finished = queue.SimpleQueue()
+        self.after_id = None
+        self.delivered = 0
+        self.dropped = 0
+
+    def submit(self, key, func, *args, done=None, phase=None):
+        # run func(*args) and call done(result) on the Tk thread; `phase`
+        # names the job's time in the profiler
+        gen = self.generation[key] = self.generation.get(key, 0) + 1
+        job = (gen, func, args, done, phase)
+        if self.pool is None:
+            t0 = time.perf_counter()
+            result = func(*args)
+            self.deliver(key, job, result, None, t0, time.perf_counter())
+        elif key in self.running:
+            if key in self.waiting:
+                self.dropped += 1
+            self.waiting[key] = job
+        else:
+            self.start(key, job)
+
+    def start(self, key, job):
+        self.running[key] = job
+        self.futures[key] = self.pool.submit(self.execute, key, job)
+        if self.after_id is None:
+            self.after_id = self.root.after(self.poll_ms, self.poll)
+
+    def execute(self, key, job):
+        # pool thread
+        _, func, args, _, _ = job
+        t0 = time.perf_counter()
+        try:
+            result, error = func(*args), None
+        except Exception as e:
+            result, error = None, e
+        self.finished.put((key, job, result, error, t0, time.perf_counter()))
+
+    def poll(self, block=False):
+        # Tk thread: deliver finished jobs and start the ones waiting on them;
+        # polls again only while something is running, so an idle app has no
+        # timer ticking. block=True waits for at least one job to finish
+        self.after_id = None
+        try:
+            while True:
+                try:
+                    item = self.finished.get(timeout=1.0) if block else self.finished.get_nowait()
+                except queue.Empty:
+                    break
+                block = False
+                key, job, result, error, t0, t1 = item
+                del self.running[key], self.futures[key]
+                waiting = self.waiting.pop(key, None)
+                if waiting:
+                    self.start(key, waiting)
+                self.deliver(key, job, result, error, t0, t1)
+        finally:
+            if self.running and self.after_id is None:
+                self.after_id = self.root.after(self.poll_ms, self.poll)
+
+    def deliver(self, key, job, result, error, t0, t1):
+        gen, _, _, done, phase = job
+        if phase and self.profiler:
+            self.profiler.record(phase, t0, t1, tid=1 if self.pool else 0)
+        if error is not None:
+            # like an exception in a Tk callback: reported, the app goes on
+            traceback.print_exception(type(error), error, error.__traceback__)
+            return
+        if gen != self.generation[key]:
+            self.dropped += 1
+            return
+        self.delivered += 1
+        if done:
+            try:
+                done(result)
+            except Exception:
+                # one failing callback must not hold up the other results
+                traceback.print_exc()
+
+    def wait(self):
+        # deliver everything submitted so far, including what that starts;
+        # for replays and benchmarks
+        while self.running:
+            self.cancel_poll()
+            self.poll(block=True)
+        self.cancel_poll()
+
+    def cancel_poll(self):
+        if self.after_id is not None:
+            self.root.after_cancel(self.after_id)
+            self.after_id = None
+
+    def close(self):
+        if self.pool:
+            # jobs not started yet are dropped, running ones finish
+            self.waiting.clear()
+            for future in self.futures.values():
+                future.cancel()
+            self.pool.shutdown(wait=True)